@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+#
+# End-to-end latencies, from an oFono event to the matching ModemManager
+# signal, with ofono2mm running against the fake oFono service.
+#
+# Usage: bench_e2e.py [-n ITERATIONS] [-m MODEMS] [-o FILE]
+#
+# Results are written as JSON, tagged with the current commit, so runs
+# can be compared across commits. Times are in milliseconds.
+# Simple.Connect timings include the fake oFono activation delay
+# (FakeContext.activation_delay).
+
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from dbus_next.aio import MessageBus
+from dbus_next.constants import MessageType
+from dbus_next import Message, Variant
+
+from fake_ofono import FakeOfono, spawn_dbus_daemon
+
+MM = 'org.freedesktop.ModemManager1'
+MM_PATH = '/org/freedesktop/ModemManager1'
+
+class Watcher:
+    """
+    Resolves futures on the first signal matching their predicate.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.waiters = []
+        bus.add_message_handler(self.on_message)
+
+    async def add_match(self, rule):
+        await self.bus.call(Message(destination='org.freedesktop.DBus', path='/org/freedesktop/DBus',
+                                    interface='org.freedesktop.DBus', member='AddMatch',
+                                    signature='s', body=[rule]))
+
+    def on_message(self, msg):
+        if msg.message_type != MessageType.SIGNAL:
+            return
+
+        for waiter in list(self.waiters):
+            predicate, future = waiter
+            if not future.done() and predicate(msg):
+                future.set_result(time.perf_counter())
+                self.waiters.remove(waiter)
+
+    def expect(self, predicate):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((predicate, future))
+        return future
+
+def properties_changed(interface, name, value=None):
+    def predicate(msg):
+        return msg.member == 'PropertiesChanged' and msg.body[0] == interface and \
+               name in msg.body[1] and (value is None or msg.body[1][name].value == value)
+    return predicate
+
+def signal(interface, member):
+    def predicate(msg):
+        return msg.interface == interface and msg.member == member
+    return predicate
+
+def name_acquired(name):
+    def predicate(msg):
+        return msg.member == 'NameOwnerChanged' and msg.body[0] == name and msg.body[2] != ''
+    return predicate
+
+async def timed(future, start, timeout=10):
+    return (await asyncio.wait_for(future, timeout) - start) * 1000
+
+def summary(samples):
+    if not samples:
+        return {'count': 0}
+
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'min': samples[0],
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'p90': samples[min(len(samples) - 1, int(len(samples) * 0.9))],
+        'max': samples[-1],
+    }
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT) != 0
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def find_modem(bus, device):
+    reply = await bus.call(Message(destination=MM, path=MM_PATH,
+                                   interface='org.freedesktop.DBus.ObjectManager',
+                                   member='GetManagedObjects'))
+    for path, interfaces in reply.body[0].items():
+        modem = interfaces.get(f'{MM}.Modem')
+        if modem is not None and modem['Device'].value == device:
+            return path
+
+async def call(bus, path, interface, member, signature='', body=[]):
+    reply = await bus.call(Message(destination=MM, path=path, interface=interface,
+                                   member=member, signature=signature, body=body))
+    if reply.message_type == MessageType.ERROR:
+        raise RuntimeError(f'{member}: {reply.body}')
+    return reply
+
+async def run(args):
+    daemon, address = spawn_dbus_daemon()
+    results = {}
+    ofono = FakeOfono(address)
+    main = None
+
+    try:
+        bus = await MessageBus(bus_address=address).connect()
+        watcher = Watcher(bus)
+        await watcher.add_match("type='signal',sender='org.freedesktop.DBus',member='NameOwnerChanged'")
+        await watcher.add_match(f"type='signal',path_namespace='{MM_PATH}'")
+
+        # ofono2mm first, waiting for oFono
+        main = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py'), '--bus-address', address],
+                                stdout=subprocess.DEVNULL if not args.verbose else None,
+                                stderr=subprocess.DEVNULL if not args.verbose else None)
+        await asyncio.sleep(args.startup_delay)
+
+        acquired = watcher.expect(name_acquired(MM))
+        start = time.perf_counter()
+        await ofono.start()
+        modems = [ofono.add_modem() for i in range(args.modems)]
+        results['ofono_start_to_name_acquired'] = [await timed(acquired, start, 30)]
+
+        modem = modems[0]
+        modem_path = await find_modem(bus, modem.path)
+
+        samples = []
+        for i in range(args.iterations):
+            strength = 20 + i % 60
+            changed = watcher.expect(properties_changed(f'{MM}.Modem', 'SignalQuality', [strength, True]))
+            start = time.perf_counter()
+            modem.set_strength(strength)
+            samples.append(await timed(changed, start))
+        results['strength_to_signal_quality'] = samples
+
+        samples = []
+        for i in range(args.iterations):
+            start = time.perf_counter()
+            await call(bus, modem_path, f'{MM}.Modem.Simple', 'GetStatus')
+            samples.append((time.perf_counter() - start) * 1000)
+        results['simple_get_status'] = samples
+
+        samples = []
+        for i in range(args.iterations):
+            added = watcher.expect(signal(f'{MM}.Modem.Voice', 'CallAdded'))
+            start = time.perf_counter()
+            call_path = modem.incoming_call(f'+1555{i:07d}')
+            samples.append(await timed(added, start))
+
+            deleted = watcher.expect(signal(f'{MM}.Modem.Voice', 'CallDeleted'))
+            modem.end_call(call_path)
+            await asyncio.wait_for(deleted, 10)
+        results['call_added_to_call_added'] = samples
+
+        samples = []
+        for i in range(args.iterations):
+            added = watcher.expect(signal(f'{MM}.Modem.Messaging', 'Added'))
+            start = time.perf_counter()
+            modem.incoming_message(f'Benchmark message {i}')
+            samples.append(await timed(added, start))
+        results['incoming_message_to_messaging_added'] = samples
+
+        # Hanging up reactivates the data context 2 s later, let it happen
+        # and start from a disconnected bearer
+        await asyncio.sleep(2.5)
+        disconnected = watcher.expect(properties_changed(f'{MM}.Bearer', 'Connected', False))
+        await call(bus, modem_path, f'{MM}.Modem.Simple', 'Disconnect', 'o', ['/'])
+        try:
+            await asyncio.wait_for(disconnected, 2)
+        except asyncio.TimeoutError:
+            pass
+
+        samples = []
+        for i in range(args.iterations):
+            connected = watcher.expect(properties_changed(f'{MM}.Bearer', 'Connected', True))
+            start = time.perf_counter()
+            await call(bus, modem_path, f'{MM}.Modem.Simple', 'Connect', 'a{sv}',
+                       [{'apn': Variant('s', 'internet')}])
+            samples.append(await timed(connected, start))
+
+            disconnected = watcher.expect(properties_changed(f'{MM}.Bearer', 'Connected', False))
+            await call(bus, modem_path, f'{MM}.Modem.Simple', 'Disconnect', 'o', ['/'])
+            await asyncio.wait_for(disconnected, 10)
+        results['simple_connect_to_bearer_connected'] = samples
+
+        bus.disconnect()
+    finally:
+        if main is not None:
+            main.terminate()
+            main.wait()
+        if ofono.bus is not None:
+            ofono.bus.disconnect()
+        daemon.kill()
+
+    return {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'modems': args.modems,
+        'iterations': args.iterations,
+        'unit': 'ms',
+        'results': {name: summary(samples) for name, samples in results.items()},
+    }
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="ofono2mm end-to-end benchmark.")
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='Iterations per measurement.')
+    parser.add_argument('-m', '--modems', type=int, default=1, help='Number of fake modems.')
+    parser.add_argument('-o', '--output', metavar='FILE', help='Write JSON results to FILE instead of stdout.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show ofono2mm output.')
+    parser.add_argument('--startup-delay', type=float, default=1, metavar='SECONDS', help='Time given to ofono2mm to start.')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Memory held by the ModemManager properties of a modem: retained bytes,
+# live Variant objects and the time of a full property recompute, for the
+# Modem, 3GPP, SIM and Signal interfaces.
+#
+# Usage: bench_props_memory.py [-m MODEMS] [-n COUNT]
+#
+# A private dbus-daemon is spawned, no oFono instance is needed: the
+# modems are fed with the fake oFono service properties.
+
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from dbus_next.aio import MessageBus
+from dbus_next import Message, Variant
+
+from ofono2mm.mm_modem import MMModemInterface
+from ofono2mm.mm_modem_signal import MMModemSignalInterface
+from ofono2mm.ofono import Ofono
+
+from fake_ofono import FakeModem, FakeSimManager, FakeNetworkRegistration, FakeRadioSettings
+
+async def ping(bus):
+    await bus.call(Message(destination='org.freedesktop.DBus', path='/org/freedesktop/DBus',
+                           interface='org.freedesktop.DBus.Peer', member='Ping'))
+
+def count_variants():
+    return sum(1 for obj in gc.get_objects() if type(obj) is Variant)
+
+async def create_modem(bus, ofono, index):
+    modem = MMModemInterface(asyncio.get_running_loop(), index, bus, ofono, f'/ril_{index}')
+    modem.ofono_props.update(FakeModem(index, []).props)
+    for fake in [FakeSimManager(index), FakeNetworkRegistration(index), FakeRadioSettings()]:
+        modem.ofono_state.add_interface(fake.name, None, fake.props.copy())
+    modem.set_props()
+    await modem.init_mm_3gpp_interface()
+    await modem.init_mm_sim_interface()
+    modem.mm_modem_signal_interface = MMModemSignalInterface(modem)
+    return modem
+
+def recompute(modem):
+    modem.set_props()
+    modem.mm_modem3gpp_interface.set_props()
+    modem.mm_sim_interface.set_props()
+    modem.mm_modem_signal_interface.set_props()
+
+async def run(args):
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        address = daemon.stdout.readline().decode().strip()
+        bus = await MessageBus(bus_address=address).connect()
+        ofono = Ofono(bus)
+
+        # A first modem warms up imports and caches
+        modems = [await create_modem(bus, ofono, 0)]
+        await ping(bus)
+
+        gc.collect()
+        variants = count_variants()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(1, args.modems + 1):
+            modems.append(await create_modem(bus, ofono, i))
+        await ping(bus)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        print(f"{'retained per modem':<32} {retained / args.modems:10.0f} bytes")
+        print(f"{'live Variants per modem':<32} {(count_variants() - variants) / args.modems:10.1f}")
+
+        start = time.perf_counter()
+        for i in range(args.count):
+            recompute(modems[i % len(modems)])
+        print(f"{'full recompute':<32} {(time.perf_counter() - start) / args.count * 1e6:10.1f} us")
+
+        bus.disconnect()
+    finally:
+        daemon.kill()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Modem properties memory benchmark.")
+    parser.add_argument('-m', '--modems', type=int, default=50, help='Number of modems created.')
+    parser.add_argument('-n', '--count', type=int, default=5000, help='Number of full recomputes timed.')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
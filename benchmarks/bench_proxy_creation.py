@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Measures the cost of getting an oFono proxy interface for a new object
+# path, as happens for every new context, operator and voice call.
+#
+# Usage: bench_proxy_creation.py [-n COUNT]
+#
+# A private dbus-daemon is spawned, no oFono instance is needed.
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbus_next.aio import MessageBus
+from dbus_next import Message
+
+from ofono2mm.ofono import Ofono, DATA_DIR
+
+def report(name, count, elapsed):
+    print(f"{name:<24} {elapsed / count * 1e6:10.1f} us/path")
+
+async def ping(bus):
+    await bus.call(Message(destination='org.freedesktop.DBus', path='/org/freedesktop/DBus',
+                           interface='org.freedesktop.DBus.Peer', member='Ping'))
+
+async def run(count):
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        address = daemon.stdout.readline().decode().strip()
+        bus = await MessageBus(bus_address=address).connect()
+
+        # Stand-in owner so proxies resolve org.ofono once, as on a device
+        ofono = await MessageBus(bus_address=address).connect()
+        await ofono.request_name('org.ofono')
+
+        with open(os.path.join(DATA_DIR, 'ofono_context.xml'), "r") as f:
+            xml = f.read()
+
+        # Resolve the org.ofono owner once, as on a running device
+        bus.get_proxy_object('org.ofono', '/ril_0', xml).get_interface('org.ofono.ConnectionContext')
+        await ping(bus)
+
+        start = time.perf_counter()
+        for i in range(count):
+            bus.get_proxy_object('org.ofono', f'/ril_0/context{i}', xml).get_interface('org.ofono.ConnectionContext')
+        report("xml per proxy", count, time.perf_counter() - start)
+
+        client = Ofono(bus)
+        start = time.perf_counter()
+        for i in range(count):
+            client["ofono_context"][f'/ril_0/context{i}']['org.ofono.ConnectionContext']
+        report("shared node (Ofono)", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(count):
+            client["ofono_context"][f'/ril_0/context{i}']['org.ofono.ConnectionContext']
+        report("cached proxy (Ofono)", count, time.perf_counter() - start)
+        print(f"cache (max {client.max_proxies} proxies): {client.stats}")
+
+        bus.disconnect()
+        ofono.disconnect()
+    finally:
+        daemon.kill()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="oFono proxy creation benchmark.")
+    parser.add_argument('-n', '--count', type=int, default=200, help='Number of object paths.')
+    args = parser.parse_args()
+    asyncio.run(run(args.count))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+#
+# Measures the cost of an oFono property change for a modem, with a full
+# recompute of the Modem, 3GPP and SIM properties and with the incremental
+# path ofono2mm takes.
+#
+# Usage: bench_set_props.py [-n COUNT]
+#
+# A private dbus-daemon is spawned, no oFono instance is needed: the
+# modem is fed with the fake oFono service properties.
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from dbus_next.aio import MessageBus
+from dbus_next import Message, Variant
+
+from ofono2mm.mm_modem import MMModemInterface
+from ofono2mm.ofono import Ofono
+
+from fake_ofono import FakeModem, FakeSimManager, FakeNetworkRegistration, FakeRadioSettings
+
+EVENTS = [
+    ('org.ofono.NetworkRegistration', 'Strength', lambda i: Variant('y', 20 + i % 60)),
+    ('org.ofono.NetworkRegistration', 'Technology', lambda i: Variant('s', ['lte', 'umts'][i % 2])),
+    ('org.ofono.SimManager', 'Retries', lambda i: Variant('a{sy}', {'pin': 3 - i % 2})),
+]
+
+async def ping(bus):
+    await bus.call(Message(destination='org.freedesktop.DBus', path='/org/freedesktop/DBus',
+                           interface='org.freedesktop.DBus.Peer', member='Ping'))
+
+def report(name, count, elapsed):
+    print(f"{name:<48} {elapsed / count * 1e6:10.1f} us/event")
+
+async def run(count):
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        address = daemon.stdout.readline().decode().strip()
+        bus = await MessageBus(bus_address=address).connect()
+
+        modem = MMModemInterface(asyncio.get_running_loop(), 0, bus, Ofono(bus), '/ril_0')
+        modem.ofono_props.update(FakeModem(0, []).props)
+        for fake in [FakeSimManager(0), FakeNetworkRegistration(0), FakeRadioSettings()]:
+            modem.ofono_state.add_interface(fake.name, None, fake.props.copy())
+        bus.export('/org/freedesktop/ModemManager1/Modem/0', modem)
+        modem.set_props()
+        await modem.init_mm_3gpp_interface()
+        await modem.init_mm_sim_interface()
+        await modem.init_mm_simple_interface()
+        await ping(bus)
+
+        for iface, name, value in EVENTS:
+            start = time.perf_counter()
+            for i in range(count):
+                modem.ofono_interface_props[iface][name] = value(i)
+                modem.set_props()
+                modem.mm_modem3gpp_interface.set_props()
+                modem.mm_sim_interface.set_props()
+            report(f"{name}, full recompute", count, time.perf_counter() - start)
+
+            handler = modem.ofono_interface_changed(iface)
+            start = time.perf_counter()
+            for i in range(count):
+                handler(name, value(i))
+            report(f"{name}, incremental", count, time.perf_counter() - start)
+
+        bus.disconnect()
+    finally:
+        daemon.kill()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Modem property recompute benchmark.")
+    parser.add_argument('-n', '--count', type=int, default=10000, help='Number of events per measurement.')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.count))
@@ -1,29 +1,42 @@
 #!/usr/bin/env python3
 
-from dbus_next.aio import MessageBus
 from dbus_next.service import (ServiceInterface,
                                method, dbus_property)
 from dbus_next.constants import PropertyAccess
 from dbus_next import DBusError, BusType
 
 import asyncio
+import time
 from argparse import ArgumentParser
 
 from ofono2mm import MMModemInterface, Ofono, DBus
+from ofono2mm.ofono import CachedClient
+from ofono2mm.instrumentation import Instrumentation
+from ofono2mm.scheduler import Scheduler
+from ofono2mm.signal_history import SignalHistory
+from ofono2mm.mm_debug import MMDebugInterface
+from ofono2mm.recorder import Recorder, ReplayClient, Player
+from ofono2mm.object_manager import ObjectManagerBus
 from ofono2mm.logger import Logger
-from ofono2mm.utils import async_locked
+from ofono2mm.utils import async_locked, Backoff
 
 has_bus = False
 
 class MMInterface(ServiceInterface):
-    def __init__(self, loop, bus):
+    def __init__(self, loop, bus, ofono_client=None, dbus_client=None):
         super().__init__('org.freedesktop.ModemManager1')
         self.loop = loop
         self.bus = bus
-        self.ofono_client = Ofono(bus)
-        self.dbus_client = DBus(bus)
-        self.mm_modem_interfaces = []
-        self.mm_modem_objects = []
+        self.ofono_client = ofono_client or Ofono(bus)
+        self.dbus_client = dbus_client or DBus(bus)
+        self.mm_modems = {}
+        self.i = 0
+        self.ofono_manager_interface = None
+        self.discovery_event = asyncio.Event()
+        self.discovering = False
+        self.discovery_attempts = 0
+        self.discovery_start = time.monotonic()
+        self.time_to_first_modem = None
         self.loop.create_task(self.check_ofono_presence())
 
     @dbus_property(access=PropertyAccess.READ)
@@ -50,44 +63,81 @@ class MMInterface(ServiceInterface):
         self.ofono_manager_interface = self.ofono_client["ofono"]["/"]["org.ofono.Manager"]
         self.ofono_manager_interface.on_modem_added(self.ofono_modem_added)
         self.ofono_manager_interface.on_modem_removed(self.ofono_modem_removed)
+        self.discovery_event.set()
         self.loop.create_task(self.find_ofono_modems())
 
     def ofono_removed(self):
         self.ofono_manager_interface = None
+        self.discovery_event.set()
 
     @async_locked
     async def find_ofono_modems(self):
         global has_bus
 
-        for mm_object in self.mm_modem_objects:
-            self.bus.unexport(mm_object)
-
-        self.mm_modem_objects = []
-        self.mm_modem_intefaces = []
-
         if not self.ofono_manager_interface:
             return
 
-        self.ofono_modem_list = False
-        while not self.ofono_modem_list:
-            try:
-                self.ofono_modem_list = [
-                    x
-                    for x in await self.ofono_manager_interface.call_get_modems()
-                    if x[0].startswith("/ril_") or x[0].startswith("/phonesim") # FIXME
-                ]
-            except DBusError:
-                pass
+        self.ofono_modem_list = await self.discover_ofono_modems()
+        if not self.ofono_modem_list:
+            return
 
-        self.i = 0
+        # Only touch what changed: modems we already export keep their
+        # objects and paths, they just catch up with oFono properties.
+        ofono_modems = dict(self.ofono_modem_list)
 
-        for modem in self.ofono_modem_list:
-            await self.export_new_modem(modem[0], modem[1])
+        for path in list(self.mm_modems):
+            if path not in ofono_modems:
+                self.remove_modem(path)
 
-        if not has_bus and len(self.mm_modem_objects) != 0:
+        for path, mprops in ofono_modems.items():
+            if path in self.mm_modems:
+                self.mm_modems[path].sync_ofono_props(mprops)
+
+        await asyncio.gather(*[
+            self.export_new_modem(path, mprops)
+            for path, mprops in ofono_modems.items()
+            if path not in self.mm_modems
+        ])
+
+        if not has_bus and len(self.mm_modems) != 0:
             await self.bus.request_name('org.freedesktop.ModemManager1')
             has_bus = True
 
+    async def discover_ofono_modems(self):
+        # oFono may be up without any modem yet: retry with a growing delay,
+        # ModemAdded or oFono reappearing wakes us up early.
+        backoff = Backoff()
+        self.discovering = True
+
+        try:
+            while self.ofono_manager_interface:
+                self.discovery_event.clear()
+                self.discovery_attempts += 1
+                try:
+                    modems = [
+                        x
+                        for x in await self.ofono_manager_interface.call_get_modems()
+                        if x[0].startswith("/ril_") or x[0].startswith("/phonesim") # FIXME
+                    ]
+                except DBusError:
+                    modems = []
+
+                if modems:
+                    if self.time_to_first_modem is None:
+                        self.time_to_first_modem = time.monotonic() - self.discovery_start
+                        Logger.info("First modem found after %d attempt(s) in %.1f ms",
+                                    self.discovery_attempts, self.time_to_first_modem * 1000)
+                    return modems
+
+                try:
+                    await asyncio.wait_for(self.discovery_event.wait(), backoff.next())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.discovering = False
+
+        return []
+
     def dbus_name_owner_changed(self, name, old_owner, new_owner):
         if name == "org.ofono":
             if new_owner == "":
@@ -96,43 +146,70 @@ class MMInterface(ServiceInterface):
                 self.ofono_added()
 
     def ofono_modem_added(self, path, mprops):
+        if path in self.mm_modems:
+            return
+
+        if self.discovering:
+            self.discovery_event.set()
+            return
+
         try:
-            self.loop.create_task(self.export_new_modem(path, props))
+            self.loop.create_task(self.export_new_modem(path, mprops))
         except Exception as e:
             pass
 
     async def export_new_modem(self, path, mprops):
-        mm_modem_interface = MMModemInterface(self.loop, self.i, self.bus, self.ofono_client, path)
-        mm_modem_interface.ofono_props = mprops
+        # Reserve the index first, several modems may be brought up at once
+        index = self.i
+        self.i += 1
+
+        start = time.monotonic()
+        mm_modem_interface = MMModemInterface(self.loop, index, self.bus, self.ofono_client, path)
+        mm_modem_interface.ofono_props.update(mprops)
+        self.mm_modems[path] = mm_modem_interface
         self.ofono_client["ofono_modem"][path]['org.ofono.Modem'].on_property_changed(mm_modem_interface.ofono_changed)
         await mm_modem_interface.init_ofono_interfaces()
-        self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.i}', mm_modem_interface)
+
+        # Modem went away while we were querying oFono
+        if self.mm_modems.get(path) is not mm_modem_interface:
+            return
+
+        self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{index}', mm_modem_interface)
         mm_modem_interface.set_props()
-        await mm_modem_interface.init_mm_sim_interface()
-        await mm_modem_interface.init_mm_3gpp_interface()
-        await mm_modem_interface.init_mm_3gpp_ussd_interface()
-        await mm_modem_interface.init_mm_3gpp_profile_manager_interface()
-        await mm_modem_interface.init_mm_messaging_interface()
-        await mm_modem_interface.init_mm_simple_interface()
-        await mm_modem_interface.init_mm_firmware_interface()
-        await mm_modem_interface.init_mm_time_interface()
-        await mm_modem_interface.init_mm_cdma_interface()
-        await mm_modem_interface.init_mm_sar_interface()
-        await mm_modem_interface.init_mm_oma_interface()
-        await mm_modem_interface.init_mm_signal_interface()
-        await mm_modem_interface.init_mm_location_interface()
-        await mm_modem_interface.init_mm_voice_interface()
-        self.mm_modem_interfaces.append(mm_modem_interface)
-        self.mm_modem_objects.append(f'/org/freedesktop/ModemManager1/Modem/{self.i}')
-        self.i += 1
+        Logger.debug("%s: modem published in %.1f ms", path, (time.monotonic() - start) * 1000)
+
+        await mm_modem_interface.init_mm_interfaces()
+
+        if self.mm_modems.get(path) is not mm_modem_interface:
+            mm_modem_interface.remove_mm_interfaces()
+            return
+
+        Logger.info("%s: modem ready in %.1f ms", path, (time.monotonic() - start) * 1000)
+
+    def remove_modem(self, path):
+        mm_modem_interface = self.mm_modems.pop(path, None)
+        if mm_modem_interface is None:
+            return
+
+        mm_modem_interface.remove_mm_interfaces()
+        # Drops the modem proxies, its contexts and calls along with their handlers
+        self.ofono_client.evict(path)
+        Logger.info("%s: modem removed", path)
 
     def ofono_modem_removed(self, path):
-        for mm_object in self.mm_modem_objects:
-            try:
-                if mm_object.modem_name == path:
-                    self.bus.unexport(mm_object)
-            except Exception as e:
-                pass
+        self.remove_modem(path)
+
+    def add_gauges(self):
+        instrumentation = Instrumentation.get_default()
+        instrumentation.add_gauge('modems', lambda: len(self.mm_modems))
+        instrumentation.add_gauge('discovery_attempts', lambda: self.discovery_attempts)
+        instrumentation.add_gauge('time_to_first_modem_seconds',
+                                  lambda: -1 if self.time_to_first_modem is None else self.time_to_first_modem)
+        for stat in self.ofono_client.stats:
+            instrumentation.add_gauge(f'ofono_cache_{stat}', lambda stat=stat: self.ofono_client.stats[stat])
+        instrumentation.add_gauge('ofono_cache_proxies', lambda: len(self.ofono_client.proxies))
+        instrumentation.add_gauge('scheduler_timers', lambda: Scheduler.get_default().timers)
+        instrumentation.add_gauge('scheduler_wakeups', lambda: Scheduler.get_default().wakeups)
 
     @method()
     def SetLogging(self, level: 's'):
@@ -150,6 +227,18 @@ async def main():
     parser = ArgumentParser(description="oFono2MM.", add_help=False)
     parser.add_argument('-d', '--debug', action='store_true', help='Enable debug messages.')
     parser.add_argument('-h', '--help', action='store_true', help='Show help.')
+    parser.add_argument('--introspection-cache', metavar='FILE', help='Keep parsed oFono introspection data in FILE.')
+    parser.add_argument('--coalesce-window', type=float, default=0, metavar='SECONDS', help='Time PropertiesChanged signals are held for to be merged: 0 for one main loop iteration, negative to send them right away.')
+    parser.add_argument('--signal-quality-threshold', type=int, default=0, metavar='PERCENT', help='Minimum signal strength change for SignalQuality to be updated.')
+    parser.add_argument('--signal-history', type=int, default=720, metavar='SAMPLES', help='Signal measurements kept per modem for org.ofono2mm.Debug, with --instrument or --metrics-file, 0 to keep none.')
+    parser.add_argument('--instrument', action='store_true', help='Collect latency statistics, published on org.ofono2mm.Debug.')
+    parser.add_argument('--metrics-file', metavar='FILE', help='Also write statistics to FILE in Prometheus format (e.g. /run/ofono2mm/metrics.prom).')
+    parser.add_argument('--metrics-interval', type=float, default=10, metavar='SECONDS', help='Metrics file update interval.')
+    parser.add_argument('--bus-address', metavar='ADDRESS', help='Use the D-Bus bus at ADDRESS instead of the system bus.')
+    parser.add_argument('--record', metavar='FILE', help='Record oFono call results and signals to FILE.')
+    parser.add_argument('--replay', metavar='FILE', help='Replay a recording instead of talking to oFono, on the session bus.')
+    parser.add_argument('--replay-fast', action='store_true', help='Replay as fast as possible instead of at recorded speed.')
+    parser.add_argument('--replay-exit', action='store_true', help='Exit once the recording was replayed.')
 
     args = parser.parse_args()
 
@@ -158,11 +247,51 @@ async def main():
         return
 
     Logger.DEBUG = args.debug
+    CachedClient.serialized_nodes = args.introspection_cache
+    ObjectManagerBus.coalesce_window = args.coalesce_window if args.coalesce_window >= 0 else None
+    MMModemInterface.signal_quality_threshold = args.signal_quality_threshold
+    Instrumentation.ENABLED = args.instrument or args.metrics_file is not None
+    # Only org.ofono2mm.Debug reads it, it is not exported otherwise
+    SignalHistory.capacity = args.signal_history if Instrumentation.ENABLED else 0
+
+    if Instrumentation.ENABLED:
+        CachedClient.interface_hooks.append(Instrumentation.get_default().hook_interface)
+
+    if args.record:
+        CachedClient.interface_hooks.append(Recorder(args.record).hook_interface)
 
-    bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
     loop = asyncio.get_running_loop()
-    mm_manager_interface = MMInterface(loop, bus)
+
+    if args.bus_address:
+        bus = await ObjectManagerBus(bus_address=args.bus_address).connect()
+    elif args.replay:
+        bus = await ObjectManagerBus(bus_type=BusType.SESSION).connect()
+    else:
+        bus = await ObjectManagerBus(bus_type=BusType.SYSTEM).connect()
+
+    if args.replay:
+        player = Player(args.replay, args.replay_fast)
+        mm_manager_interface = MMInterface(loop, bus, ReplayClient(Ofono, player), ReplayClient(DBus, player))
+    else:
+        mm_manager_interface = MMInterface(loop, bus)
+
     bus.export('/org/freedesktop/ModemManager1', mm_manager_interface)
+
+    if Instrumentation.ENABLED:
+        mm_manager_interface.add_gauges()
+        bus.export('/org/freedesktop/ModemManager1', MMDebugInterface(mm_manager_interface.mm_modems))
+
+    if args.metrics_file:
+        Scheduler.get_default().add(args.metrics_interval, lambda: Instrumentation.get_default().write_prometheus(args.metrics_file))
+
+    if args.replay:
+        await player.run()
+        if args.replay_exit:
+            # Let the last handlers settle
+            await asyncio.sleep(0.1)
+            bus.disconnect()
+            return
+
     await bus.wait_for_disconnect()
 
 asyncio.run(main())
@@ -15,6 +15,7 @@ from .mm_sms import *
 from .mm_call import *
 from .mm_modem_voice import *
 from .ofono import *
+from .ofono_state import *
 
 __all__ = [
 	"MMModem3gppInterface",
@@ -36,4 +37,5 @@ __all__ = [
 	"MMCallInterface",
 	"MMModemVoiceInterface",
 	"Ofono",
+	"OfonoModemState",
 ]
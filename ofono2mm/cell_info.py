@@ -0,0 +1,207 @@
+from dbus_next import Variant
+
+from ofono2mm.mm_types import ModemManagerCellType
+from ofono2mm.logger import Logger
+
+import asyncio
+
+# Invalid values of the oFono cell properties, INT_MAX, INT64_MAX for NR cell ids
+OFONO_CELL_INVALID = (0x7fffffff, 0x7fffffffffffffff)
+
+OFONO_CELL_INFO_TYPES = {
+    'gsm': ModemManagerCellType.GSM,
+    'wcdma': ModemManagerCellType.UMTS,
+    'lte': ModemManagerCellType.LTE,
+    'nr': ModemManagerCellType._5GNR,
+}
+
+def hex_string(value):
+    return Variant('s', f'{value:X}')
+
+def negated(value):
+    return Variant('d', -float(value))
+
+# oFono cell properties, per cell type: ModemManager name and conversion
+OFONO_CELL_PROPS = {
+    'gsm': {
+        'lac': ('lac', hex_string),
+        'cid': ('ci', hex_string),
+        'arfcn': ('arfcn', lambda value: Variant('u', value)),
+        'bsic': ('base-station-id', hex_string),
+        'timingAdvance': ('timing-advance', lambda value: Variant('u', value)),
+    },
+    'wcdma': {
+        'lac': ('lac', hex_string),
+        'cid': ('ci', hex_string),
+        'psc': ('psc', lambda value: Variant('u', value)),
+        'uarfcn': ('uarfcn', lambda value: Variant('u', value)),
+    },
+    'lte': {
+        'tac': ('tac', hex_string),
+        'ci': ('ci', hex_string),
+        'pci': ('physical-ci', hex_string),
+        'earfcn': ('earfcn', lambda value: Variant('u', value)),
+        # Reported in dBm multiplied by -1
+        'rsrp': ('rsrp', negated),
+        'rsrq': ('rsrq', negated),
+        'timingAdvance': ('timing-advance', lambda value: Variant('u', value)),
+    },
+    'nr': {
+        'tac': ('tac', hex_string),
+        'nci': ('ci', hex_string),
+        'pci': ('physical-ci', hex_string),
+        'nrarfcn': ('nrarfcn', lambda value: Variant('u', value)),
+        'ssRsrp': ('rsrp', negated),
+        'ssRsrq': ('rsrq', negated),
+        'ssSinr': ('sinr', lambda value: Variant('d', float(value))),
+    },
+}
+
+class CellInfoCache:
+    """
+    The cells a modem sees, from org.nemomobile.ofono.CellInfo.
+
+    Cells are fetched once when the interface shows up, then kept up to
+    date from CellsAdded, CellsRemoved and the cells' own signals. Each
+    cell is kept as its ModemManager GetCellInfo entry, converted again
+    only when it changes. get_cells() gives what GetCellInfo returns,
+    serving cells first.
+
+    Usage:
+
+    cache = CellInfoCache(ofono_state)
+    cache.get_cells()
+    """
+
+    def __init__(self, ofono_state):
+        self.ofono_client = ofono_state.ofono_client
+        self.ofono_state = ofono_state
+        self.entries = {}
+        self.cells = None
+        self.generation = 0
+        self.interface = None
+
+        ofono_state.subscribe('org.nemomobile.ofono.CellInfo', None, self.ofono_state_changed)
+
+    def ofono_state_changed(self, iface, name, value):
+        self.clear()
+        if value is not None:
+            asyncio.create_task(self.seed())
+
+    async def seed(self):
+        interface = self.ofono_state.interfaces.get('org.nemomobile.ofono.CellInfo')
+        if interface is None:
+            return
+
+        generation = self.generation
+        try:
+            # The proxy outlives the interface going away and coming back
+            if interface is not self.interface:
+                interface.on_cells_added(self.cells_added)
+                interface.on_cells_removed(self.cells_removed)
+                self.interface = interface
+            paths = await interface.call_get_cells()
+        except Exception as e:
+            Logger.debug("%s: GetCells failed: %s", self.ofono_state.modem_name, e)
+            return
+
+        if generation != self.generation:
+            return
+
+        # add_cell() drops what comes back after a clear()
+        await asyncio.gather(*[self.add_cell(path) for path in paths])
+
+    def clear(self):
+        # Pending fetches belong to the previous interface
+        self.generation += 1
+        for path in self.entries:
+            self.ofono_client.evict(path)
+        self.entries = {}
+        self.cells = None
+
+    def cells_added(self, paths):
+        for path in paths:
+            asyncio.create_task(self.add_cell(path))
+
+    def cells_removed(self, paths):
+        for path in paths:
+            self.remove_cell(path)
+
+    async def add_cell(self, path):
+        if path in self.entries:
+            return
+
+        generation = self.generation
+        interface = self.ofono_client["ofono_cell"][path]['org.nemomobile.ofono.Cell']
+        try:
+            version, cell_type, registered, props = await interface.call_get_all()
+        except Exception as e:
+            Logger.debug("%s: cell %s: %s", self.ofono_state.modem_name, path, e)
+            return
+
+        # Seeding and CellsAdded may race for a cell
+        if generation != self.generation or path in self.entries or cell_type not in OFONO_CELL_INFO_TYPES:
+            return
+
+        props = {name: value.value for name, value in props.items()}
+        self.entries[path] = [cell_type, registered, props, self.to_cell_info(cell_type, registered, props)]
+        interface.on_registered_changed(lambda registered: self.cell_registered_changed(path, registered))
+        interface.on_property_changed(lambda name, value: self.cell_property_changed(path, name, value))
+        interface.on_removed(lambda: self.remove_cell(path))
+        self.cells = None
+
+    def remove_cell(self, path):
+        if self.entries.pop(path, None) is not None:
+            self.ofono_client.evict(path)
+            self.cells = None
+
+    def cell_registered_changed(self, path, registered):
+        if path in self.entries:
+            self.entries[path][1] = registered
+            self.update_cell(path)
+
+    def cell_property_changed(self, path, name, value):
+        if path in self.entries:
+            self.entries[path][2][name] = value.value
+            self.update_cell(path)
+
+    def update_cell(self, path):
+        entry = self.entries[path]
+        entry[3] = self.to_cell_info(entry[0], entry[1], entry[2])
+        self.cells = None
+
+    def get_cells(self):
+        # Only rebuilt after a change
+        if self.cells is None:
+            self.cells = sorted((entry[3] for entry in self.entries.values()),
+                                key=lambda cell: not cell['serving'].value)
+        return self.cells
+
+    def operator_id(self, mcc, mnc):
+        # Cells give the MNC as a number, its length, e.g. 030 or 30, is
+        # only known from the registration strings
+        registration = self.ofono_state.interface_props.get('org.ofono.NetworkRegistration', {})
+        mcc_string = registration['MobileCountryCode'].value if 'MobileCountryCode' in registration else ''
+        mnc_string = registration['MobileNetworkCode'].value if 'MobileNetworkCode' in registration else ''
+        if mcc_string.isdigit() and mnc_string.isdigit() and (int(mcc_string), int(mnc_string)) == (mcc, mnc):
+            return mcc_string + mnc_string
+
+        return f'{mcc:03d}{mnc:02d}'
+
+    def to_cell_info(self, cell_type, registered, props):
+        cell_info = {
+            'cell-type': Variant('u', OFONO_CELL_INFO_TYPES[cell_type]),
+            'serving': Variant('b', registered),
+        }
+
+        mcc = props.get('mcc', OFONO_CELL_INVALID[0])
+        mnc = props.get('mnc', OFONO_CELL_INVALID[0])
+        if mcc not in OFONO_CELL_INVALID and mnc not in OFONO_CELL_INVALID:
+            cell_info['operator-id'] = Variant('s', self.operator_id(mcc, mnc))
+
+        for ofono_name, (name, convert) in OFONO_CELL_PROPS[cell_type].items():
+            value = props.get(ofono_name, OFONO_CELL_INVALID[0])
+            if value not in OFONO_CELL_INVALID:
+                cell_info[name] = convert(value)
+
+        return cell_info
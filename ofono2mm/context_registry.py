@@ -0,0 +1,186 @@
+from dbus_next import Variant, DBusError
+
+from ofono2mm.mm_bearer import MMBearerInterface
+from ofono2mm.instrumentation import Instrumentation
+from ofono2mm.logger import Logger
+
+# Bearer paths are unique across modems
+bearer_i = 0
+
+class ContextRegistry:
+    """
+    The contexts of a modem and the bearers of its internet contexts,
+    keyed by oFono context path.
+
+    Every way a context shows up, GetContexts when ConnectionManager
+    appears, ContextAdded or a bearer created by ModemManager, goes
+    through add(), which gives back the existing bearer of a known
+    context. A context gets one bearer, one PropertyChanged handler and
+    its port once, however often ConnectionManager comes and goes.
+
+    The properties of every context are kept up to date from these
+    signals in ofono_state.contexts, for readers
+    that would otherwise call GetContexts. program() uses them to only
+    write the context properties that differ.
+
+    Usage:
+
+    registry = ContextRegistry(mm_modem)
+    await registry.sync()
+    bearer_path = registry.add(context_path, context_props)
+    await registry.program(context_path, {'Protocol': Variant('s', 'ip')})
+
+    program() refuses to change an active context unless asked to
+    disconnect it.
+    """
+
+    def __init__(self, mm_modem):
+        self.mm_modem = mm_modem
+        self.ofono_client = mm_modem.ofono_client
+        self.contexts = mm_modem.ofono_state.contexts
+        self.bearer_paths = {}
+        self.connection_manager = None
+
+    def get_bearer(self, path):
+        bearer_path = self.bearer_paths.get(path)
+        return self.mm_modem.bearers.get(bearer_path)
+
+    async def sync(self):
+        if 'org.ofono.ConnectionManager' not in self.mm_modem.ofono_interfaces:
+            return
+
+        interface = self.mm_modem.ofono_interfaces['org.ofono.ConnectionManager']
+        # The proxy outlives the interface going away and coming back
+        if interface is not self.connection_manager:
+            interface.on_context_added(self.context_added)
+            interface.on_context_removed(self.context_removed)
+            self.connection_manager = interface
+
+        contexts = await interface.call_get_contexts()
+        for path, props in contexts:
+            self.add(path, props)
+
+        # Contexts removed while ConnectionManager was away
+        paths = [path for path, props in contexts]
+        for path in list(self.contexts):
+            if path not in paths:
+                self.remove(path)
+
+    def context_added(self, path, props):
+        self.add(path, props)
+
+    def context_removed(self, path):
+        self.remove(path)
+
+    def add(self, path, props):
+        global bearer_i
+
+        if path not in self.contexts:
+            self.contexts[path] = {}
+            ofono_ctx_interface = self.ofono_client["ofono_context"][path]['org.ofono.ConnectionContext']
+            ofono_ctx_interface.on_property_changed(lambda name, value: self.context_changed(path, name, value))
+        self.contexts[path].update(props)
+
+        if 'Type' in self.contexts[path] and self.contexts[path]['Type'].value != 'internet':
+            return None
+
+        bearer = self.get_bearer(path)
+        if bearer is not None:
+            bearer.update_from_context(props)
+            return self.bearer_paths[path]
+
+        bearer = MMBearerInterface(self.mm_modem.index, self.mm_modem.bus, self.ofono_client, self.mm_modem.ofono_state, self.mm_modem)
+        bearer.ofono_ctx = path
+        bearer.update_from_context(self.contexts[path])
+
+        bearer_path = f'/org/freedesktop/ModemManager1/Bearer/{bearer_i}'
+        bearer_i += 1
+        Logger.debug("%s: context %s on %s", self.mm_modem.modem_name, path, bearer_path)
+
+        self.bearer_paths[path] = bearer_path
+        self.mm_modem.bearers[bearer_path] = bearer
+        self.mm_modem.bus.export(bearer_path, bearer)
+        self.mm_modem.props.Bearers.append(bearer_path)
+        self.mm_modem.emit_properties_changed({'Bearers': self.mm_modem.props.Bearers})
+
+        if bearer.props['Interface'].value:
+            self.mm_modem.add_port(bearer.props['Interface'].value)
+
+        return bearer_path
+
+    def remove(self, path):
+        if self.contexts.pop(path, None) is None:
+            return
+
+        # Drops the context proxy and its handler
+        self.ofono_client.evict(path)
+
+        bearer_path = self.bearer_paths.pop(path, None)
+        if bearer_path is None:
+            return
+
+        bearer = self.mm_modem.bearers.pop(bearer_path, None)
+        if bearer is not None:
+            bearer.reconnect.cancel()
+            self.mm_modem.bus.unexport(bearer_path)
+        if bearer_path in self.mm_modem.props.Bearers:
+            self.mm_modem.props.Bearers.remove(bearer_path)
+            self.mm_modem.emit_properties_changed({'Bearers': self.mm_modem.props.Bearers})
+
+    def find(self, apn=None):
+        # The last internet context with this APN, or with any APN if None
+        found = None
+        for path, props in self.contexts.items():
+            if props.get('Type', Variant('s', '')).value != 'internet':
+                continue
+
+            access_point_name = props.get('AccessPointName', Variant('s', '')).value
+            if access_point_name == apn or (apn is None and access_point_name):
+                found = path
+
+        return found
+
+    async def program(self, path, props, disconnect=False):
+        if path not in self.contexts:
+            raise DBusError('org.freedesktop.ModemManager1.Error.Core.NotFound', f'Unknown context {path}')
+
+        context = self.contexts[path]
+        writes = {name: value for name, value in props.items()
+                  if name not in context or context[name].value != value.value}
+
+        if Instrumentation.ENABLED:
+            for i in range(len(props) - len(writes)):
+                Instrumentation.get_default().count('suppressed', 'org.ofono.ConnectionContext.SetProperty')
+
+        if not writes:
+            return 0
+
+        # oFono only takes changes of an inactive context, bringing it down
+        # is up to the caller, and so is connecting again
+        if context.get('Active', Variant('b', False)).value:
+            if not disconnect:
+                raise DBusError('org.freedesktop.ModemManager1.Error.Core.WrongState', f'Context {path} is active')
+
+            bearer = self.get_bearer(path)
+            if bearer is not None:
+                await bearer.doDisconnect()
+            else:
+                await self.ofono_client["ofono_context"][path]['org.ofono.ConnectionContext'].call_set_property("Active", Variant('b', False))
+
+        ofono_ctx_interface = self.ofono_client["ofono_context"][path]['org.ofono.ConnectionContext']
+        for name, value in writes.items():
+            await ofono_ctx_interface.call_set_property(name, value)
+            context[name] = value
+
+        return len(writes)
+
+    def context_changed(self, path, name, value):
+        if path in self.contexts:
+            self.contexts[path][name] = value
+
+        bearer = self.get_bearer(path)
+        if bearer is None:
+            return
+
+        bearer.ofono_context_changed(name, value)
+        self.mm_modem.ofono_context_changed(name, value)
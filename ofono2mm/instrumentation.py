@@ -0,0 +1,195 @@
+from dbus_next.constants import MessageType
+
+from ofono2mm.logger import Logger
+
+from bisect import bisect_left
+
+import os
+import time
+
+class Histogram:
+    """
+    A latency histogram with fixed buckets, in seconds.
+
+    counts[i] is the number of observations between BUCKETS[i - 1] and
+    BUCKETS[i], the last bucket is +Inf. cumulative_counts() gives the
+    Prometheus view.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+               0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+class TimedReply:
+    """
+    Wraps dbus_next's reply sender to time a method call until its reply,
+    or its error, goes out.
+    """
+
+    def __init__(self, send_reply, name):
+        self.send_reply = send_reply
+        self.name = name
+        self.start = time.perf_counter()
+        self.done = False
+
+    def observe(self):
+        if not self.done:
+            self.done = True
+            Instrumentation.get_default().observe('method', self.name, time.perf_counter() - self.start)
+
+    def __enter__(self):
+        return self
+
+    def __call__(self, reply):
+        self.observe()
+        self.send_reply(reply)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.observe()
+        return self.send_reply.__exit__(exc_type, exc_value, tb)
+
+    def send_error(self, exc):
+        self.observe()
+        self.send_reply.send_error(exc)
+
+class Instrumentation:
+    """
+    Opt-in latency and event rate statistics.
+
+    Usage:
+
+    Instrumentation.ENABLED = True
+    Instrumentation.get_default().observe('method', name, seconds)
+    Instrumentation.get_default().count('emitted', name)
+
+    Methods exported on an ObjectManagerBus are timed from the call to
+    the reply, oFono signals from reception until their handlers return.
+    Coroutine handlers only account for the time until they are
+    scheduled.
+    """
+
+    ENABLED = False
+    __instance = None
+
+    @staticmethod
+    def get_default():
+        if Instrumentation.__instance is None:
+            Instrumentation.__instance = Instrumentation()
+        return Instrumentation.__instance
+
+    def __init__(self):
+        self.gauges = {}
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+        self.start = time.monotonic()
+
+    def observe(self, kind, name, seconds):
+        key = (kind, name)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(seconds)
+
+    def count(self, kind, name):
+        key = (kind, name)
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def add_gauge(self, name, getter):
+        self.gauges[name] = getter
+
+    def rate(self, count):
+        elapsed = time.monotonic() - self.start
+        return count / elapsed if elapsed > 0 else 0
+
+    def hook_interface(self, path, interface):
+        """
+        Times the signal handlers of an oFono proxy interface.
+
+        :param: path: the object path.
+        :param: interface: the dbus_next proxy interface.
+        """
+
+        message_handler = interface._message_handler
+        interface_name = interface.introspection.name
+
+        def timed_message_handler(msg):
+            # Every proxy interface sees every message, only time ours
+            if msg.message_type != MessageType.SIGNAL or msg.path != path or \
+               msg.interface != interface_name or msg.member not in interface._signal_handlers:
+                return message_handler(msg)
+
+            start = time.perf_counter()
+            try:
+                return message_handler(msg)
+            finally:
+                self.observe('signal', f'{interface_name}.{msg.member}', time.perf_counter() - start)
+
+        interface._message_handler = timed_message_handler
+
+    def get_gauges(self):
+        gauges = {}
+        for name, getter in self.gauges.items():
+            try:
+                gauges[name] = float(getter())
+            except Exception as e:
+                Logger.warning("Can't read gauge %s: %s", name, e)
+
+        return gauges
+
+    def to_prometheus(self):
+        lines = []
+
+        for kind in sorted(set(kind for kind, name in self.histograms)):
+            metric = f'ofono2mm_{kind}_duration_seconds'
+            lines.append(f'# TYPE {metric} histogram')
+            for (hkind, name), histogram in sorted(self.histograms.items()):
+                if hkind != kind:
+                    continue
+                for bound, count in zip(Histogram.BUCKETS, histogram.cumulative_counts()):
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{name="{name}",le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{name="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{name="{name}"}} {histogram.count}')
+
+        for kind in sorted(set(kind for kind, name in self.counters)):
+            metric = f'ofono2mm_{kind}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (ckind, name), count in sorted(self.counters.items()):
+                if ckind == kind:
+                    lines.append(f'{metric}{{name="{name}"}} {count}')
+
+        for name, value in sorted(self.get_gauges().items()):
+            lines.append(f'# TYPE ofono2mm_{name} gauge')
+            lines.append(f'ofono2mm_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Write aside then rename, scrapers must never see a partial file
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(f'{path}.tmp', 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            Logger.warning("Can't write metrics to %s: %s", path, e)
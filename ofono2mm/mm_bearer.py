@@ -3,27 +3,25 @@ from dbus_next.service import (ServiceInterface,
 from dbus_next.constants import PropertyAccess
 from dbus_next import Variant, DBusError, BusType
 
-from ofono2mm.mm_types import ModemManagerPortType
-from ofono2mm.utils import async_retryable
-
-import asyncio
+from ofono2mm.reconnect import ReconnectPolicy
 
 class MMBearerInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props, mm_modem):
+    def __init__(self, index, bus, ofono_client, ofono_state, mm_modem):
         super().__init__('org.freedesktop.ModemManager1.Bearer')
         # print(f"Creating new bearer interface for {index}")
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
         self.mm_modem = mm_modem
         self.disconnecting = False
-        self.reconnect_task = None
+        self.reconnect = ReconnectPolicy(self)
         self.props = {
             "Interface": Variant('s', ''),
             "Connected": Variant('b', False),
@@ -94,10 +92,46 @@ class MMBearerInterface(ServiceInterface):
     def Properties(self) -> 'a{sv}':
         return self.props['Properties'].value
 
-    async def set_props(self):
+    def update_from_context(self, props):
+        old_props = self.props.copy()
+
+        if 'Settings' in props:
+            settings = props['Settings'].value
+            ip_method = 0
+            if 'Method' in settings:
+                if settings['Method'].value == "static":
+                    ip_method = 2
+                elif settings['Method'].value == "dhcp":
+                    ip_method = 3
+
+            ip_dns = settings['DomainNameServers'].value if 'DomainNameServers' in settings else []
+            ip4_config = {
+                "method": Variant('u', ip_method),
+                "dns1": Variant('s', ip_dns[0] if len(ip_dns) > 0 else ''),
+                "dns2": Variant('s', ip_dns[1] if len(ip_dns) > 1 else ''),
+                "dns3": Variant('s', ip_dns[2] if len(ip_dns) > 2 else ''),
+                "gateway": settings.get('Gateway', Variant('s', ''))
+            }
+            if 'Address' in settings:
+                ip4_config['address'] = settings['Address']
+
+            self.props['Interface'] = settings.get('Interface', Variant('s', ''))
+            self.props['Ip4Config'] = Variant('a{sv}', ip4_config)
+        if 'Active' in props:
+            self.props['Connected'] = props['Active']
+        if 'AccessPointName' in props:
+            properties = self.props['Properties'].value.copy()
+            properties['apn'] = props['AccessPointName']
+            self.props['Properties'] = Variant('a{sv}', properties)
+
+        changed_props = {name: variant.value for name, variant in self.props.items() if variant != old_props[name]}
+        if changed_props:
+            self.emit_properties_changed(changed_props)
+
+    def set_props(self):
         old_props = self.props.copy()
         if 'org.ofono.ConnectionManager' in self.ofono_interface_props:
-            contexts = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_get_contexts()
+            contexts = self.ofono_state.contexts.items()
             self.context_names = []
             ctx_idx = 0
             chosen_apn = None
@@ -131,13 +165,9 @@ class MMBearerInterface(ServiceInterface):
             else:
                 self.props['Properties'].value['allowed-auth'] = Variant('u', 0) # unknown MM_BEARER_ALLOWED_AUTH_UNKNOWN
 
-            ofono_interface = self.ofono_client["ofono_modem"][self.modem_name]['org.ofono.ConnectionManager']
-
-            roaming_allowed = None
-            connman_props = await ofono_interface.call_get_properties()
-
-            if connman_props.get('RoamingAllowed', Variant('b', True).value) != "":
-                roaming_allowed = connman_props.get('RoamingAllowed', Variant('b', True).value).value
+            connman_props = self.ofono_interface_props['org.ofono.ConnectionManager']
+            if 'RoamingAllowed' in connman_props:
+                roaming_allowed = connman_props['RoamingAllowed'].value
 
                 if roaming_allowed == True:
                     self.props['Properties'].value['roaming-allowance'] = Variant('u', 2) # roaming partner network MM_BEARER_ROAMING_ALLOWANCE_PARTNER
@@ -148,49 +178,43 @@ class MMBearerInterface(ServiceInterface):
     async def Connect(self):
         await self.doConnect()
 
-    @async_retryable()
     async def doConnect(self):
+        # Disconnect, a context change or the modem going away stopped it
+        if not await self.reconnect.connect():
+            raise DBusError('org.freedesktop.ModemManager1.Error.Core.Cancelled', 'Connection attempt cancelled')
+
+    async def connect_context(self):
         try:
-            await self.set_props()
+            self.set_props()
         except Exception as e:
             pass
 
-        # print("Do connect")
         ofono_ctx_interface = self.ofono_client["ofono_context"][self.ofono_ctx]['org.ofono.ConnectionContext']
         await ofono_ctx_interface.call_set_property("Active", Variant('b', True))
 
-        # Clear the reconnection task
-        self.reconnect_task = None
-
     @method()
     async def Disconnect(self):
         await self.doDisconnect()
 
-    async def cancel_reconnect_task(self):
-        if self.reconnect_task is not None:
-            self.reconnect_task.cancel()
-            try:
-                await self.reconnect_task
-            except asyncio.CancelledError:
-                # Finally
-                pass
-            finally:
-                self.reconnect_task = None
-
     async def doDisconnect(self):
         self.disconnecting = True
 
-        # Cancel an eventual reconnection task
-        await self.cancel_reconnect_task()
+        # Stop an eventual reconnection
+        self.reconnect.cancel()
 
         ofono_ctx_interface = self.ofono_client["ofono_context"][self.ofono_ctx]['org.ofono.ConnectionContext']
         await ofono_ctx_interface.call_set_property("Active", Variant('b', False))
 
-    async def add_auth_ofono(self, username, password):
-        ofono_ctx_interface = self.ofono_client["ofono_context"][self.ofono_ctx]['org.ofono.ConnectionContext']
+    async def add_auth_ofono(self, username=None, password=None):
+        # Credentials that are not given are left as they are
+        credentials = {}
+        if username is not None:
+            credentials["Username"] = Variant('s', username)
+        if password is not None:
+            credentials["Password"] = Variant('s', password)
+
         try:
-            await ofono_ctx_interface.call_set_property("Username", Variant('s', username))
-            await ofono_ctx_interface.call_set_property("Password", Variant('s', password))
+            await self.mm_modem.context_registry.program(self.ofono_ctx, credentials)
         except Exception as e:
             pass
 
@@ -198,8 +222,8 @@ class MMBearerInterface(ServiceInterface):
         if propname == "Active":
             if self.disconnecting and (not value.value):
                 self.disconnecting = False
-            elif not self.disconnecting and (not value.value) and self.reconnect_task is None and self.props['Connected'].value:
-                self.reconnect_task = asyncio.create_task(self.doConnect())
+            elif not self.disconnecting and (not value.value) and self.props['Connected'].value:
+                self.reconnect.start()
 
             self.props['Connected'] = value
             self.emit_properties_changed({'Connected': value.value})
@@ -207,8 +231,7 @@ class MMBearerInterface(ServiceInterface):
             if 'Interface' in value.value:
                 self.props['Interface'] = value.value['Interface']
                 self.emit_properties_changed({'Interface': value.value['Interface'].value})
-                if [value.value['Interface'].value, 2] not in self.mm_modem.props['Ports'].value:
-                    self.mm_modem.props['Ports'].value.append([value.value['Interface'].value, ModemManagerPortType.AT])
+                self.mm_modem.add_port(value.value['Interface'].value)
             if 'Method' in value.value:
                 if value.value['Method'].value == 'static':
                     self.props['Ip4Config'].value['method'] = Variant('u', 2) # static MM_BEARER_IP_METHOD_STATIC
@@ -223,15 +246,3 @@ class MMBearerInterface(ServiceInterface):
                 self.props['Ip4Config'].value['gateway'] = value.value['Gateway']
 
             self.emit_properties_changed({'Ip4Config': self.props['Ip4Config'].value})
-
-    def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
-        self.set_props()
-
-    def ofono_interface_changed(self, iface):
-        def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-            self.set_props()
-
-        return ch
@@ -5,17 +5,18 @@ from dbus_next import Variant
 from ofono2mm.mm_types import ModemManagerCallState
 
 class MMCallInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props):
+    def __init__(self, index, bus, ofono_client, ofono_state):
         super().__init__('org.freedesktop.ModemManager1.Call')
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
         self.voicecall = '/'
         self.props = {
             'State': Variant('u', ModemManagerCallState.UNKNOWN),
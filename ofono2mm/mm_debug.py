@@ -0,0 +1,97 @@
+from dbus_next.service import (ServiceInterface, method)
+from dbus_next import Variant, DBusError
+
+from ofono2mm.instrumentation import Instrumentation, Histogram
+from ofono2mm.signal_history import SignalHistory
+
+class MMDebugInterface(ServiceInterface):
+    def __init__(self, mm_modems):
+        super().__init__('org.ofono2mm.Debug')
+        self.mm_modems = mm_modems
+
+    @method()
+    def GetLatencies(self) -> 'a{sa{sv}}':
+        instrumentation = Instrumentation.get_default()
+        latencies = {}
+
+        for (kind, name), histogram in instrumentation.histograms.items():
+            latencies[f'{kind}:{name}'] = {
+                'count': Variant('t', histogram.count),
+                'rate': Variant('d', instrumentation.rate(histogram.count)),
+                'sum': Variant('d', histogram.sum),
+                'max': Variant('d', histogram.max),
+                'buckets': Variant('ad', [bound for bound in Histogram.BUCKETS]),
+                'counts': Variant('at', histogram.counts),
+            }
+
+        return latencies
+
+    @method()
+    def GetCounters(self) -> 'a{s(td)}':
+        instrumentation = Instrumentation.get_default()
+
+        return {
+            f'{kind}:{name}': [count, instrumentation.rate(count)]
+            for (kind, name), count in instrumentation.counters.items()
+        }
+
+    @method()
+    def GetGauges(self) -> 'a{sd}':
+        return Instrumentation.get_default().get_gauges()
+
+    @method()
+    def Reset(self):
+        Instrumentation.get_default().reset()
+
+    @method()
+    def GetSignalHistory(self, modem: 'o', window: 'd', percentiles: 'ad') -> 'a{sv}':
+        """
+        Statistics of the signal measurements of the last window seconds,
+        0 for every sample kept. Samples are packed in one array, a
+        timestamp then each field per sample, NaN for a measurement the
+        sample does not have.
+        """
+
+        for mm_modem in self.mm_modems.values():
+            if f'/org/freedesktop/ModemManager1/Modem/{mm_modem.index}' == modem:
+                break
+        else:
+            raise DBusError('org.freedesktop.ModemManager1.Error.Core.NotFound', f'No modem {modem}')
+
+        if not mm_modem.mm_modem_signal_interface or mm_modem.mm_modem_signal_interface.history is None:
+            raise DBusError('org.freedesktop.ModemManager1.Error.Core.Unsupported', 'No signal interface yet')
+
+        count, stats, packed = mm_modem.mm_modem_signal_interface.history.stats(window, percentiles)
+        history = {
+            'count': Variant('t', count),
+            'fields': Variant('as', ['timestamp', *SignalHistory.FIELDS]),
+            'samples': Variant('ad', packed.tolist()),
+        }
+        for name, values in stats.items():
+            history[name] = Variant('a{sd}', values)
+
+        return history
+
+    @method()
+    def GetBearers(self) -> 'a{sa{sv}}':
+        """
+        Reconnection attempts of every bearer, times in seconds since the
+        epoch, next-attempt 0 when none is planned.
+        """
+
+        bearers = {}
+        for mm_modem in self.mm_modems.values():
+            for path, bearer in mm_modem.bearers.items():
+                stats = bearer.reconnect.stats()
+                bearers[path] = {
+                    'modem': Variant('o', f'/org/freedesktop/ModemManager1/Modem/{mm_modem.index}'),
+                    'connected': Variant('b', bearer.props['Connected'].value),
+                    'reconnecting': Variant('b', stats['running']),
+                    'attempts': Variant('u', stats['attempts']),
+                    'failures': Variant('u', stats['failures']),
+                    'last-error': Variant('s', stats['last-error']),
+                    'last-attempt': Variant('d', stats['last-attempt']),
+                    'next-attempt': Variant('d', stats['next-attempt']),
+                }
+
+        return bearers
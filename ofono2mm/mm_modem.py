@@ -1,5 +1,4 @@
-from dbus_next.service import (ServiceInterface,
-                               method, dbus_property, signal)
+from dbus_next.service import (method, dbus_property, signal)
 from dbus_next.constants import PropertyAccess
 from dbus_next import Variant, DBusError, BusType
 
@@ -16,7 +15,6 @@ from ofono2mm.mm_modem_oma import MMModemOmaInterface
 from ofono2mm.mm_modem_signal import MMModemSignalInterface
 from ofono2mm.mm_modem_location import MMModemLocationInterface
 from ofono2mm.mm_sim import MMSimInterface
-from ofono2mm.mm_bearer import MMBearerInterface
 from ofono2mm.mm_modem_voice import MMModemVoiceInterface
 from ofono2mm.mm_types import ModemManagerState,\
                               ModemManagerStateFailedReason,\
@@ -33,151 +31,278 @@ from ofono2mm.mm_types import ModemManagerState,\
                               OFONO_MODES,\
                               OFONO_CAPS,\
                               MM_MODES
+from ofono2mm.ofono_state import OfonoModemState, PublishingInterface
+from ofono2mm.cell_info import CellInfoCache
+from ofono2mm.context_registry import ContextRegistry
+from ofono2mm.instrumentation import Instrumentation
+from ofono2mm.mm_props import Props
 from ofono2mm.logger import Logger
 
 import asyncio
+import time
+
+# The modem state, as an input of other derivations
+MM_STATE = ('org.freedesktop.ModemManager1.Modem', 'State')
+
+# Derivations of ModemManager properties: method, oFono (interface, property)
+# inputs and ModemManager outputs, in run order. Only derivations whose
+# inputs changed are run on oFono events.
+DERIVATIONS = [
+    ('set_modem_state', {
+        ('org.ofono.Modem', 'Powered'),
+        ('org.ofono.Modem', 'Online'),
+        ('org.ofono.SimManager', 'Present'),
+        ('org.ofono.SimManager', 'PinRequired'),
+        ('org.ofono.NetworkRegistration', 'Status'),
+        ('org.ofono.ConnectionContext', 'Active'),
+    }, ('State', 'PowerState', 'Sim', 'StateFailedReason', 'UnlockRequired')),
+    ('set_sim_state', {
+        ('org.ofono.SimManager', 'SubscriberNumbers'),
+        ('org.ofono.SimManager', 'Retries'),
+    }, ('OwnNumbers', 'UnlockRetries')),
+    ('set_access_technology', {
+        ('org.ofono.NetworkRegistration', 'Technology'),
+        MM_STATE,
+    }, ('AccessTechnologies',)),
+    ('set_signal_quality', {
+        ('org.ofono.NetworkRegistration', 'Strength'),
+        MM_STATE,
+    }, ('SignalQuality',)),
+    ('set_capabilities', {
+        ('org.ofono.RadioSettings', 'AvailableTechnologies'),
+    }, ('CurrentCapabilities', 'SupportedCapabilities')),
+    ('set_supported_modes', {
+        ('org.ofono.RadioSettings', 'TechnologyPreference'),
+        ('org.ofono.RadioSettings', 'AvailableTechnologies'),
+    }, ('SupportedModes', 'CurrentModes')),
+    ('set_identity', {
+        ('org.ofono.Modem', 'Serial'),
+        ('org.ofono.Modem', 'Revision'),
+        ('org.ofono.Modem', 'SoftwareVersionNumber'),
+        ('org.ofono.Modem', 'Manufacturer'),
+        ('org.ofono.Modem', 'Model'),
+    }, ('EquipmentIdentifier', 'HardwareRevision', 'Revision', 'Manufacturer', 'Model')),
+]
+
+class ModemProps(Props):
+    SIGNATURES = {
+        'Sim': 'o',
+        'SimSlots': 'ao',
+        'PrimarySimSlot': 'u',
+        'Bearers': 'ao',
+        'SupportedCapabilities': 'au',
+        'CurrentCapabilities': 'u',
+        'MaxBearers': 'u',
+        'MaxActiveBearers': 'u',
+        'MaxActiveMultiplexedBearers': 'u',
+        'Manufacturer': 's',
+        'Model': 's',
+        'Revision': 's',
+        'CarrierConfiguration': 's',
+        'CarrierConfigurationRevision': 's',
+        'HardwareRevision': 's',
+        'DeviceIdentifier': 's',
+        'Device': 's',
+        'Physdev': 's',
+        'Drivers': 'as',
+        'Plugin': 's',
+        'PrimaryPort': 's',
+        'Ports': 'a(su)',
+        'EquipmentIdentifier': 's',
+        'UnlockRequired': 'u',
+        'UnlockRetries': 'a{uu}',
+        'State': 'i',
+        'StateFailedReason': 'u',
+        'AccessTechnologies': 'u',
+        'SignalQuality': '(ub)',
+        'OwnNumbers': 'as',
+        'PowerState': 'u',
+        'SupportedModes': 'a(uu)',
+        'CurrentModes': '(uu)',
+        'SupportedBands': 'au',
+        'CurrentBands': 'au',
+        'SupportedIpFamilies': 'u',
+    }
+    __slots__ = tuple(SIGNATURES)
+
+class MMModemInterface(PublishingInterface):
+    # Change of the signal strength, in percent, for SignalQuality to be updated
+    signal_quality_threshold = 0
 
-bearer_i = 0
-
-class MMModemInterface(ServiceInterface):
     def __init__(self, loop, index, bus, ofono_client, modem_name):
         super().__init__('org.freedesktop.ModemManager1.Modem')
         self.loop = loop
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
+        self.ofono_state = OfonoModemState(ofono_client, modem_name)
+        self.ofono_proxy = self.ofono_state.ofono_proxy
         self.modem_name = modem_name
-        self.ofono_modem = self.ofono_proxy['org.ofono.Modem']
-        self.ofono_props = {}
-        self.ofono_interfaces = {}
-        self.ofono_interface_props = {}
+        self.ofono_modem = self.ofono_state.ofono_modem
+        self.ofono_props = self.ofono_state.props
+        self.ofono_interfaces = self.ofono_state.interfaces
+        self.ofono_interface_props = self.ofono_state.interface_props
         self.mm_cell_type = ModemManagerCellType.UNKNOWN
         self.mm_modem3gpp_interface = False
         self.mm_modem_messaging_interface = False
+        self.mm_modem_voice_interface = False
         self.mm_sim_interface = False
-        self.sim = Variant('o', f'/org/freedesktop/ModemManager/SIM/{self.index}')
+        self.mm_modem_signal_interface = False
+        self.sim = f'/org/freedesktop/ModemManager1/SIM/{self.index}'
         self.bearers = {}
-        self.props = {
-            'Sim': Variant('o', '/'),
-            'SimSlots': Variant('ao', [f'/org/freedesktop/ModemManager/SIM/{self.index}']),
-            'PrimarySimSlot': Variant('u', 0),
-            'Bearers': Variant('ao', []),
-            'SupportedCapabilities': Variant('au', [ModemManagerCapability.NONE]),
-            'CurrentCapabilities': Variant('u', ModemManagerCapability.NONE),
-            'MaxBearers': Variant('u', 4),
-            'MaxActiveBearers': Variant('u', 2),
-            'MaxActiveMultiplexedBearers': Variant('u', 2),
-            'Manufacturer': Variant('s', 'ofono'),
-            'Model': Variant('s', ''),
-            'Revision': Variant('s', '10000'),
-            'CarrierConfiguration': Variant('s', ''),
-            'CarrierConfigurationRevision': Variant('s', '0'),
-            'HardwareRevision': Variant('s', '1000'),
-            'DeviceIdentifier': Variant('s', self.modem_name),
-            'Device': Variant('s', self.modem_name),
-            'Physdev': Variant('s', '/dev/binder'),
-            'Drivers': Variant('as', ['binder']),
-            'Plugin': Variant('s', 'ofono2mm'),
-            'PrimaryPort': Variant('s', self.modem_name),
-            'Ports': Variant('a(su)', [[self.modem_name, ModemManagerPortType.UNKNOWN]]),
-            'EquipmentIdentifier': Variant('s', ''),
-            'UnlockRequired': Variant('u', ModemManagerLock.UNKNOWN),
-            'UnlockRetries': Variant('a{uu}', {}),
-            'State': Variant('i', ModemManagerState.UNKNOWN),
-            'StateFailedReason': Variant('u', ModemManagerStateFailedReason.UNKNOWN),
-            'AccessTechnologies': Variant('u', ModemManagerAccessTechnology.UNKNOWN),
-            'SignalQuality': Variant('(ub)', [0, False]),
-            'OwnNumbers': Variant('as', []),
-            'PowerState': Variant('u', ModemManagerPowerState.ON),
-            'SupportedModes': Variant('a(uu)', [[ModemManagerMode.NONE, ModemManagerMode.NONE]]),
-            'CurrentModes': Variant('(uu)', [ModemManagerMode.NONE, ModemManagerMode.NONE]),
-            'SupportedBands': Variant('au', []),
-            'CurrentBands': Variant('au', []),
-            'SupportedIpFamilies': Variant('u', 3) # hardcoded value ipv4 and ipv6 MM_BEARER_IP_FAMILY_IPV4V6
-        }
+        self.context_registry = ContextRegistry(self)
+        self.cell_info = CellInfoCache(self.ofono_state)
+        self.props = ModemProps(
+            Sim='/',
+            SimSlots=[f'/org/freedesktop/ModemManager1/SIM/{self.index}'],
+            PrimarySimSlot=0,
+            Bearers=[],
+            SupportedCapabilities=[ModemManagerCapability.NONE],
+            CurrentCapabilities=ModemManagerCapability.NONE,
+            MaxBearers=4,
+            MaxActiveBearers=2,
+            MaxActiveMultiplexedBearers=2,
+            Manufacturer='ofono',
+            Model='',
+            Revision='10000',
+            CarrierConfiguration='',
+            CarrierConfigurationRevision='0',
+            HardwareRevision='1000',
+            DeviceIdentifier=self.modem_name,
+            Device=self.modem_name,
+            Physdev='/dev/binder',
+            Drivers=['binder'],
+            Plugin='ofono2mm',
+            PrimaryPort=self.modem_name,
+            Ports=[[self.modem_name, ModemManagerPortType.UNKNOWN]],
+            EquipmentIdentifier='',
+            UnlockRequired=ModemManagerLock.UNKNOWN,
+            UnlockRetries={},
+            State=ModemManagerState.UNKNOWN,
+            StateFailedReason=ModemManagerStateFailedReason.UNKNOWN,
+            AccessTechnologies=ModemManagerAccessTechnology.UNKNOWN,
+            SignalQuality=[0, False],
+            OwnNumbers=[],
+            PowerState=ModemManagerPowerState.ON,
+            SupportedModes=[[ModemManagerMode.NONE, ModemManagerMode.NONE]],
+            CurrentModes=[ModemManagerMode.NONE, ModemManagerMode.NONE],
+            SupportedBands=[],
+            CurrentBands=[],
+            SupportedIpFamilies=3, # hardcoded value ipv4 and ipv6 MM_BEARER_IP_FAMILY_IPV4V6
+        )
+
+        for derivation in DERIVATIONS:
+            for iface, name in derivation[1]:
+                if iface.startswith('org.ofono.') and iface != 'org.ofono.ConnectionContext':
+                    self.ofono_state.subscribe(iface, name, self.ofono_state_changed)
 
     async def init_ofono_interfaces(self):
-        for iface in self.ofono_props['Interfaces'].value:
-            await self.add_ofono_interface(iface)
+        await asyncio.gather(*[self.add_ofono_interface(iface) for iface in self.ofono_props['Interfaces'].value])
+
+    async def init_mm_interface(self, init):
+        start = time.monotonic()
+        try:
+            await init()
+        except Exception as e:
+            Logger.error("%s: %s failed: %s", self.modem_name, init.__name__, e)
+            return
 
-        await self.check_ofono_contexts()
+        Logger.debug("%s: %s done in %.1f ms", self.modem_name, init.__name__, (time.monotonic() - start) * 1000)
+
+    async def init_mm_interfaces(self):
+        # The core Modem interface is already published at this point and
+        # none of the following interfaces depend on each other, bring them
+        # up together so slow oFono round trips overlap.
+        start = time.monotonic()
+        await asyncio.gather(
+            self.init_mm_interface(self.init_mm_sim_interface),
+            self.init_mm_interface(self.init_mm_3gpp_interface),
+            self.init_mm_interface(self.init_mm_3gpp_ussd_interface),
+            self.init_mm_interface(self.init_mm_3gpp_profile_manager_interface),
+            self.init_mm_interface(self.init_mm_messaging_interface),
+            self.init_mm_interface(self.init_mm_simple_interface),
+            self.init_mm_interface(self.init_mm_firmware_interface),
+            self.init_mm_interface(self.init_mm_time_interface),
+            self.init_mm_interface(self.init_mm_cdma_interface),
+            self.init_mm_interface(self.init_mm_sar_interface),
+            self.init_mm_interface(self.init_mm_oma_interface),
+            self.init_mm_interface(self.init_mm_signal_interface),
+            self.init_mm_interface(self.init_mm_location_interface),
+            self.init_mm_interface(self.init_mm_voice_interface)
+        )
+        Logger.debug("%s: interfaces ready in %.1f ms", self.modem_name, (time.monotonic() - start) * 1000)
 
     async def add_ofono_interface(self, iface):
-        self.ofono_interfaces.update({
-            iface: self.ofono_proxy[iface]
-        })
+        interface = self.ofono_proxy[iface]
+        self.ofono_interfaces[iface] = interface
+
+        try:
+            self.ofono_state.add_interface(iface, interface, await interface.call_get_properties())
+        except (DBusError, AttributeError):
+            # Interfaces without properties are still announced
+            self.ofono_state.add_interface(iface, interface, {})
 
         try:
-            self.ofono_interface_props.update({
-                iface: await self.ofono_interfaces[iface].call_get_properties()
-            })
-
-            if self.mm_modem3gpp_interface:
-                self.mm_modem3gpp_interface.ofono_interface_props = self.ofono_interface_props.copy()
-            if self.mm_sim_interface:
-                self.mm_sim_interface.ofono_interface_props = self.ofono_interface_props.copy()
-
-            self.ofono_interfaces[iface].on_property_changed(self.ofono_interface_changed(iface))
-        except DBusError:
-            self.ofono_interface_props.update({
-                iface: {}
-            })
-
-            if self.mm_modem3gpp_interface:
-                self.mm_modem3gpp_interface.ofono_interface_props = self.ofono_interface_props.copy()
-            if self.mm_sim_interface:
-                self.mm_sim_interface.ofono_interface_props = self.ofono_interface_props.copy()
-
-            self.ofono_interfaces[iface].on_property_changed(self.ofono_interface_changed(iface))
+            interface.on_property_changed(self.ofono_interface_changed(iface))
         except AttributeError:
             pass
 
-        if self.mm_modem3gpp_interface:
-            self.mm_modem3gpp_interface.set_props()
-        if self.mm_sim_interface:
-            self.mm_sim_interface.set_props()
         if self.mm_modem_messaging_interface and iface == "org.ofono.MessageManager":
             self.mm_modem_messaging_interface.set_props()
             await self.mm_modem_messaging_interface.init_messages()
         if iface == "org.ofono.ConnectionManager":
-            await self.check_ofono_contexts()
+            await self.context_registry.sync()
 
     async def remove_ofono_interface(self, iface):
-        if iface in self.ofono_interfaces:
-            self.ofono_interfaces.pop(iface)
-        if iface in self.ofono_interface_props:
-            self.ofono_interface_props.pop(iface)
+        self.ofono_state.remove_interface(iface)
 
-        self.set_props()
+    def sync_ofono_props(self, mprops):
+        for name, varval in mprops.items():
+            if name not in self.ofono_props or self.ofono_props[name].value != varval.value:
+                self.ofono_changed(name, varval)
+
+    def remove_mm_interfaces(self):
+        if self.mm_modem_signal_interface:
+            self.mm_modem_signal_interface.stop()
 
-        if self.mm_modem3gpp_interface:
-            self.mm_modem3gpp_interface.ofono_interface_props = self.ofono_interface_props.copy()
-            self.mm_modem3gpp_interface.set_props()
-        if self.mm_sim_interface:
-            self.mm_sim_interface.ofono_interface_props = self.ofono_interface_props.copy()
-            self.mm_sim_interface.set_props()
+        for bearer in self.bearers.values():
+            bearer.reconnect.cancel()
+
+        for path in self.bearers:
+            self.bus.unexport(path)
+
+        if self.mm_modem_messaging_interface:
+            for path in self.mm_modem_messaging_interface.props['Messages'].value:
+                self.bus.unexport(path)
+
+        if self.mm_modem_voice_interface:
+            for path in self.mm_modem_voice_interface.props['Calls'].value:
+                self.bus.unexport(path)
+
+        self.bus.unexport(f'/org/freedesktop/ModemManager1/SIM/{self.index}')
+        self.bus.unexport(f'/org/freedesktop/ModemManager1/Modem/{self.index}')
 
     async def init_mm_sim_interface(self):
-        self.mm_sim_interface = MMSimInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
-        self.bus.export(f'/org/freedesktop/ModemManager/SIM/{self.index}', self.mm_sim_interface)
+        self.mm_sim_interface = MMSimInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
+        self.bus.export(f'/org/freedesktop/ModemManager1/SIM/{self.index}', self.mm_sim_interface)
         self.mm_sim_interface.set_props()
 
     async def init_mm_3gpp_interface(self):
-        self.mm_modem3gpp_interface = MMModem3gppInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem3gpp_interface = MMModem3gppInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem3gpp_interface)
         self.mm_modem3gpp_interface.set_props()
 
     async def init_mm_3gpp_ussd_interface(self):
-        self.mm_modem3gpp_ussd_interface = MMModem3gppUssdInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem3gpp_ussd_interface = MMModem3gppUssdInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem3gpp_ussd_interface)
 
     async def init_mm_3gpp_profile_manager_interface(self):
-        self.mm_modem3gpp_profile_manager_interface = MMModem3gppProfileManagerInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem3gpp_profile_manager_interface = MMModem3gppProfileManagerInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem3gpp_profile_manager_interface)
 
     async def init_mm_simple_interface(self):
-        self.mm_modem_simple_interface = MMModemSimpleInterface(self, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem_simple_interface = MMModemSimpleInterface(self)
+        self.mm_modem_simple_interface.set_props()
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_simple_interface)
 
     async def init_mm_firmware_interface(self):
@@ -186,7 +311,7 @@ class MMModemInterface(ServiceInterface):
         self.mm_modem_firmware_interface.set_props()
 
     async def init_mm_time_interface(self):
-        self.mm_modem_time_interface = MMModemTimeInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem_time_interface = MMModemTimeInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_time_interface)
 
         if 'org.ofono.NetworkTime' in self.ofono_interfaces:
@@ -205,7 +330,7 @@ class MMModemInterface(ServiceInterface):
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_oma_interface)
 
     async def init_mm_signal_interface(self):
-        self.mm_modem_signal_interface = MMModemSignalInterface(self, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem_signal_interface = MMModemSignalInterface(self)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_signal_interface)
 
     async def init_mm_location_interface(self):
@@ -213,7 +338,7 @@ class MMModemInterface(ServiceInterface):
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_location_interface)
 
     async def init_mm_voice_interface(self):
-        self.mm_modem_voice_interface = MMModemVoiceInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem_voice_interface = MMModemVoiceInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_voice_interface)
 
         if 'org.ofono.VoiceCallManager' in self.ofono_interfaces:
@@ -221,219 +346,98 @@ class MMModemInterface(ServiceInterface):
             await self.mm_modem_voice_interface.init_calls()
 
     async def init_mm_messaging_interface(self):
-        self.mm_modem_messaging_interface = MMModemMessagingInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        self.mm_modem_messaging_interface = MMModemMessagingInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         self.bus.export(f'/org/freedesktop/ModemManager1/Modem/{self.index}', self.mm_modem_messaging_interface)
 
         if 'org.ofono.MessageManager' in self.ofono_interfaces:
             self.mm_modem_messaging_interface.set_props()
             await self.mm_modem_messaging_interface.init_messages()
 
-    async def check_ofono_contexts(self):
-        global bearer_i
-        if not 'org.ofono.ConnectionManager' in self.ofono_interfaces:
-            return
-
-        contexts = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_get_contexts();
-        old_bearer_list = self.props['Bearers'].value
-        for ctx in contexts:
-            if ctx[1]['Type'].value == "internet":
-                mm_bearer_interface = MMBearerInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props, self)
-
-                ip_method = 0
-                if 'Method' in ctx[1]['Settings'].value:
-                    if ctx[1]['Settings'].value['Method'].value == "static":
-                        ip_method = 2
-                    if ctx[1]['Settings'].value['Method'].value == "dhcp":
-                        ip_method = 3
-
-                ip_address = ''
-                if 'Address' in ctx[1]['Settings'].value:
-                    ip_address = ctx[1]['Settings'].value['Address'].value
-
-                ip_dns = []
-                if 'DomainNameServers' in ctx[1]['Settings'].value:
-                    ip_dns = ctx[1]['Settings'].value['DomainNameServers'].value
-
-                ip_gateway = ''
-                if 'Gateway' in ctx[1]['Settings'].value:
-                    ip_gateway = ctx[1]['Settings'].value['Gateway'].value
-
-                mm_bearer_interface.props.update({
-                    "Interface": ctx[1]['Settings'].value.get("Interface", Variant('s', '')),
-                    "Connected": ctx[1]['Active'],
-                    "Ip4Config": Variant('a{sv}', {
-                        "method": Variant('u', ip_method),
-                        "dns1": Variant('s', ip_dns[0] if len(ip_dns) > 0 else ''),
-                        "dns2": Variant('s', ip_dns[1] if len(ip_dns) > 1 else ''),
-                        "dns3": Variant('s', ip_dns[2] if len(ip_dns) > 2 else ''),
-                        "gateway": Variant('s', ip_gateway)
-                    }),
-                    "Properties": Variant('a{sv}', {
-                        "apn": ctx[1]['AccessPointName']
-                    })
-                })
-
-                if 'Interface' in ctx[1]['Settings'].value:
-                    self.props['Ports'].value.append([ctx[1]['Settings'].value['Interface'].value, ModemManagerPortType.AT])
-                    self.emit_properties_changed({'Ports': self.props['Ports'].value})
-
-                ofono_ctx_interface = self.ofono_client["ofono_context"][ctx[0]]["org.ofono.ConnectionContext"]
-                ofono_ctx_interface.on_property_changed(mm_bearer_interface.ofono_context_changed)
-                ofono_ctx_interface.on_property_changed(self.ofono_context_changed)
-                mm_bearer_interface.ofono_ctx = ctx[0]
-                self.bus.export(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}', mm_bearer_interface)
-                self.props['Bearers'].value.append(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}')
-                self.bearers[f'/org/freedesktop/ModemManager/Bearer/{bearer_i}'] = mm_bearer_interface
-                bearer_i += 1
-
-        if self.props['Bearers'].value == old_bearer_list:
-            self.emit_properties_changed({'Bearers': self.props['Bearers'].value})
-
-        self.ofono_interfaces['org.ofono.ConnectionManager'].on_context_added(self.ofono_context_added)
-
-    def ofono_context_added(self, path, properties):
-        global bearer_i
-        if properties['Type'] == "internet":
-            mm_bearer_interface = MMBearerInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props, self)
-
-            ip_method = 0
-            if 'Method' in properties['Settings'].value:
-                if properties['Settings'].value['Method'].value == "static":
-                    ip_method = 2
-                elif properties['Settings'].value['Method'].value == "dhcp":
-                    ip_method = 3
-
-            ip_address = ''
-            if 'Address' in properties['Settings'].value:
-                ip_address = properties['Settings'].value['Address'].value
-
-            ip_dns = []
-            if 'DomainNameServers' in properties['Settings'].value:
-                ip_dns = properties['Settings'].value['DomainNameServers'].value
-
-            ip_gateway = ''
-            if 'Gateway' in properties['Settings'].value:
-                ip_gateway = properties['Settings'].value['Gateway'].value
-
-            mm_bearer_interface.props.update({
-                "Interface": properties['Settings'].value['Interface'] if 'Interface' in properties['Settings'].value else Variant('s', ''),
-                "Connected": properties['Active'],
-                "Ip4Config": Variant('a{sv}', {
-                    "method": Variant('u', ip_method),
-                    "dns1": Variant('s', ip_dns[0] if len(ip_dns) > 0 else ''),
-                    "dns2": Variant('s', ip_dns[1] if len(ip_dns) > 1 else ''),
-                    "dns3": Variant('s', ip_dns[2] if len(ip_dns) > 2 else ''),
-                    "gateway": Variant('s', ip_gateway)
-                }),
-                "Properties": Variant('a{sv}', {
-                    "apn": properties['AccessPointName']
-                })
-            })
-
-            if 'Interface' in properties['Settings'].value:
-                self.props['Ports'].value.append([properties['Settings'].value['Interface'].value, 2])
-                self.emit_properties_changed({'Ports': self.props['Ports'].value})
-
-            ofono_ctx_interface = self.ofono_client["ofono_context"][path]['org.ofono.ConnectionContext']
-            ofono_ctx_interface.on_property_changed(mm_bearer_interface.ofono_context_changed)
-            ofono_ctx_interface.on_property_changed(self.ofono_context_changed)
-            mm_bearer_interface.ofono_ctx = path
-            self.bus.export(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}', mm_bearer_interface)
-            self.props['Bearers'].value.append(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}')
-            self.bearers[f'/org/freedesktop/ModemManager/Bearer/{bearer_i}'] = mm_bearer_interface
-            bearer_i += 1
-            self.emit_properties_changed({'Bearers': self.props['Bearers'].value})
-
     def set_modem_state(self):
         #############
         # MODEM OFF #
         #############
         if not self.ofono_props['Powered'].value or 'org.ofono.SimManager' not in self.ofono_interface_props:
-            self.props['State'] = Variant('i', ModemManagerState.DISABLED)
-            self.props['PowerState'] = Variant('i', ModemManagerPowerState.OFF)
+            self.props.State = ModemManagerState.DISABLED
+            self.props.PowerState = ModemManagerPowerState.OFF
             return
 
         #############
         # MODEM ON  #
         #############
-        self.props['PowerState'] = Variant('i', ModemManagerPowerState.ON)
+        self.props.PowerState = ModemManagerPowerState.ON
 
         if 'Present' not in self.ofono_interface_props['org.ofono.SimManager'] or \
                 not self.ofono_interface_props['org.ofono.SimManager']['Present'].value:
-            self.props['Sim'] = Variant('o', '/')
-            self.props['State'] = Variant('i', ModemManagerState.FAILED)
-            self.props['StateFailedReason'] = Variant('i', ModemManagerStateFailedReason.SIM_MISSING)
+            self.props.Sim = '/'
+            self.props.State = ModemManagerState.FAILED
+            self.props.StateFailedReason = ModemManagerStateFailedReason.SIM_MISSING
             return
 
         #################
         # SIM AVAILABLE #
         #################
-        self.props['Sim'] = self.sim
-        self.props['StateFailedReason'] = Variant('i', ModemManagerStateFailedReason.NONE)
+        self.props.Sim = self.sim
+        self.props.StateFailedReason = ModemManagerStateFailedReason.NONE
 
         if self.ofono_interface_props['org.ofono.SimManager']['PinRequired'].value == 'none':
-            self.props['UnlockRequired'] = Variant('u', ModemManagerLock.NONE)
+            self.props.UnlockRequired = ModemManagerLock.NONE
         else:
-            self.props['UnlockRequired'] = Variant('u', ModemManagerLock.SIM_PIN)
-            self.props['State'] = Variant('i', ModemManagerState.LOCKED)
+            self.props.UnlockRequired = ModemManagerLock.SIM_PIN
+            self.props.State = ModemManagerState.LOCKED
             return
 
         #################
         # SIM UNLOCKED  #
         #################
         if not self.ofono_props['Online'].value:
-            self.props['State'] = Variant('i', ModemManagerState.DISABLED)
+            self.props.State = ModemManagerState.DISABLED
             return
 
         #################
         # MODEM ENABLED #
         #################
         if 'org.ofono.NetworkRegistration' not in self.ofono_interface_props:
-            self.props['State'] = Variant('i', ModemManagerState.ENABLED)
+            self.props.State = ModemManagerState.ENABLED
             return
 
         if "Status" not in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-            self.props['State'] = Variant('i', ModemManagerState.ENABLED)
+            self.props.State = ModemManagerState.ENABLED
             return
 
         if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == 'denied':
-            self.props['State'] = Variant('i', ModemManagerState.ENABLED)
+            self.props.State = ModemManagerState.ENABLED
             return
 
         ###################
         # MODEM SEARCHING #
         ###################
         if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == 'searching':
-            self.props['State'] = Variant('i', ModemManagerState.SEARCHING)
+            self.props.State = ModemManagerState.SEARCHING
             return
 
-        if 'Strength' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-            self.props['SignalQuality'] = Variant('(ub)',
-                                                  [self.ofono_interface_props['org.ofono.NetworkRegistration']
-                                                                             ['Strength'].value,
-                                                  True])
         ###################
         # MODEM CONNECTED #
         ###################
         for bearer in self.bearers.values():
             if bearer.Connected:
-                self.props['State'] = Variant('i', ModemManagerState.CONNECTED)
+                self.props.State = ModemManagerState.CONNECTED
                 return
 
         ####################
         # MODEM REGISTERED #
         ####################
         if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value in ['registered', 'roaming']:
-            self.props['State'] = Variant('i', ModemManagerState.REGISTERED)
+            self.props.State = ModemManagerState.REGISTERED
 
     def set_sim_state(self):
         if 'org.ofono.SimManager' not in self.ofono_interface_props:
             return
 
         try:
-            self.props['OwnNumbers'] = Variant('as', self.ofono_interface_props['org.ofono.SimManager']['SubscriberNumbers'].value)
+            self.props.OwnNumbers = self.ofono_interface_props['org.ofono.SimManager']['SubscriberNumbers'].value
         except:
-            self.props['OwnNumbers'] = Variant('as', [])
+            self.props.OwnNumbers = []
 
         unlock_retries = {}
         for key in OFONO_RETRIES_LOCK.keys():
@@ -442,25 +446,41 @@ class MMModemInterface(ServiceInterface):
                 unlock_retries[OFONO_RETRIES_LOCK[key]] = value
             except:
                 pass
-        self.props['UnlockRetries'] = Variant('a{uu}', unlock_retries)
+        self.props.UnlockRetries = unlock_retries
 
     def set_access_technology(self):
         if 'org.ofono.NetworkRegistration' not in self.ofono_interface_props or \
-                self.props['State'].value not in [ModemManagerState.REGISTERED,
+                self.props.State not in [ModemManagerState.REGISTERED,
                                                   ModemManagerState.CONNECTED]:
-            self.props['AccessTechnologies'] = Variant('u', ModemManagerAccessTechnology.UNKNOWN)
-            self.props['SignalQuality'] = Variant('(ub)', [0, False])
+            self.props.AccessTechnologies = ModemManagerAccessTechnology.UNKNOWN
             return
 
         if "Technology" not in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-            self.props['AccessTechnologies'] = Variant('u', ModemManagerAccessTechnology.UNKNOWN)
+            self.props.AccessTechnologies = ModemManagerAccessTechnology.UNKNOWN
             return
 
         ofono_tech = self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value
         Logger.debug ("AccessTechnologies: %s -> %s", ofono_tech, OFONO_TECHNOLOGIES[ofono_tech])
-        self.props['AccessTechnologies'] = Variant('u', OFONO_TECHNOLOGIES[ofono_tech])
+        self.props.AccessTechnologies = OFONO_TECHNOLOGIES[ofono_tech]
         self.mm_cell_type = OFONO_CELL_TYPES[ofono_tech]
 
+    def set_signal_quality(self):
+        if 'org.ofono.NetworkRegistration' not in self.ofono_interface_props or \
+                self.props.State not in [ModemManagerState.REGISTERED,
+                                                  ModemManagerState.CONNECTED]:
+            self.props.SignalQuality = [0, False]
+            return
+
+        if 'Strength' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
+            strength = self.ofono_interface_props['org.ofono.NetworkRegistration']['Strength'].value
+            # Small moves around the last published value are not worth a wakeup
+            if self.props.SignalQuality[1] and abs(strength - self.props.SignalQuality[0]) < self.signal_quality_threshold:
+                # An unchanged strength would not have been sent anyway
+                if Instrumentation.ENABLED and strength != self.props.SignalQuality[0]:
+                    Instrumentation.get_default().count('suppressed', 'org.freedesktop.ModemManager1.Modem.SignalQuality')
+                return
+            self.props.SignalQuality = [strength, True]
+
     def set_capabilities(self):
         caps = 0
         try:
@@ -472,8 +492,8 @@ class MMModemInterface(ServiceInterface):
             Logger.error("%s", e)
 
         Logger.debug ("SupportedCapabilities: %s", caps)
-        self.props['CurrentCapabilities'] = Variant('u', caps)
-        self.props['SupportedCapabilities'] = Variant('au', [caps])
+        self.props.CurrentCapabilities = caps
+        self.props.SupportedCapabilities = [caps]
 
     def set_supported_modes(self):
         try:
@@ -484,61 +504,89 @@ class MMModemInterface(ServiceInterface):
             for ofono_tech in self.ofono_interface_props['org.ofono.RadioSettings']['AvailableTechnologies'].value:
                 mm_modes |= OFONO_MODES[ofono_tech]
             Logger.debug ("SupportedModes: %s -> %s", mm_modes, MM_MODES[mm_modes])
-            self.props['SupportedModes'] = Variant('a(uu)', MM_MODES[mm_modes])
+            self.props.SupportedModes = MM_MODES[mm_modes]
 
             for mode in MM_MODES[mm_modes]:
                 if mode[1] == mm_pref:
-                    self.props['CurrentModes'] = Variant('(uu)', [mode[0], mm_pref])
+                    self.props.CurrentModes = [mode[0], mm_pref]
                     break
                 elif mode[1] & mm_pref != 0:
-                    self.props['CurrentModes'] = Variant('(uu)', [mm_pref, ModemManagerMode.NONE])
+                    self.props.CurrentModes = [mm_pref, ModemManagerMode.NONE]
                     break
-            Logger.debug ("CurrentModes: %s", self.props['CurrentModes'].value)
+            Logger.debug ("CurrentModes: %s", self.props.CurrentModes)
         except KeyError:
-            self.props['SupportedModes'] = Variant('a(uu)', [[ModemManagerMode.NONE, ModemManagerMode.NONE]])
-            self.props['CurrentModes'] = Variant('(uu)', [ModemManagerMode.NONE, ModemManagerMode.NONE])
+            self.props.SupportedModes = [[ModemManagerMode.NONE, ModemManagerMode.NONE]]
+            self.props.CurrentModes = [ModemManagerMode.NONE, ModemManagerMode.NONE]
         except Exception as e:
             Logger.error("%s", e)
 
-    def set_props(self):
-        old_props = self.props.copy()
-        old_state = self.props['State'].value
+    def set_identity(self):
+        self.props.EquipmentIdentifier = self.ofono_props['Serial'].value if 'Serial' in self.ofono_props else ''
+        self.props.HardwareRevision = self.ofono_props['Revision'].value if 'Revision' in self.ofono_props else ''
+        self.props.Revision = self.ofono_props['SoftwareVersionNumber'].value if 'SoftwareVersionNumber' in self.ofono_props else ''
+        self.props.Manufacturer = self.ofono_props['Manufacturer'].value if 'Manufacturer' in self.ofono_props else 'ofono'
+        self.props.Model = self.ofono_props['Model'].value if 'Model' in self.ofono_props else 'binder'
+
+    def get_derivations(self, changes):
+        if changes is None:
+            return list(DERIVATIONS)
+
+        derivations = []
+        for derivation in DERIVATIONS:
+            for iface, name in derivation[1]:
+                if (iface, name) in changes or (iface, None) in changes:
+                    derivations.append(derivation)
+                    break
 
-        self.set_modem_state()
+        return derivations
 
-        if old_state != self.props['State'].value:
-            Logger.info("Modem state: %s", ModemManagerState.to_string(self.props['State'].value))
+    def set_props(self, changes=None):
+        """
+        Recomputes ModemManager properties from oFono ones and emits what
+        changed.
 
-        self.set_sim_state()
-        self.set_access_technology()
-        self.set_capabilities()
-        self.set_supported_modes()
+        :param: changes: a set of changed (oFono interface, property),
+                         (interface, None) when a whole interface changed.
+                         Everything is recomputed when None.
+        """
+
+        derivations = self.get_derivations(changes)
+        if not derivations:
+            return
 
-        self.props['EquipmentIdentifier'] = Variant('s', self.ofono_props['Serial'].value if 'Serial' in self.ofono_props else '')
-        self.props['HardwareRevision'] = Variant('s', self.ofono_props['Revision'].value if 'Revision' in self.ofono_props else '')
-        self.props['Revision'] = Variant('s', self.ofono_props['SoftwareVersionNumber'].value if 'SoftwareVersionNumber' in self.ofono_props else '')
-        self.props['Manufacturer'] = Variant('s', self.ofono_props['Manufacturer'].value if 'Manufacturer' in self.ofono_props else 'ofono')
-        self.props['Model'] = Variant('s', self.ofono_props['Model'].value if 'Model' in self.ofono_props else 'binder')
+        old_props = {}
+        for derivation in derivations:
+            old_props.update(self.props.snapshot(derivation[2]))
+        old_state = self.props.State
 
-        if old_state != self.props['State'].value:
-            self.StateChanged(old_state, self.props['State'].value, 1)
+        for derivation in derivations:
+            getattr(self, derivation[0])()
 
-        changed_props = {}
-        for prop in self.props:
-            if self.props[prop].value != old_props[prop].value:
-                changed_props.update({ prop: self.props[prop].value })
+            # Run what depends on the modem state, once it is known
+            if derivation[0] == 'set_modem_state' and old_state != self.props.State:
+                Logger.info("Modem state: %s", ModemManagerState.to_string(self.props.State))
+                for state_derivation in self.get_derivations({MM_STATE}):
+                    if state_derivation not in derivations:
+                        derivations.append(state_derivation)
+                        for prop in state_derivation[2]:
+                            old_props.setdefault(prop, getattr(self.props, prop))
 
-        self.emit_properties_changed(changed_props)
+        if old_state != self.props.State:
+            self.StateChanged(old_state, self.props.State, 1)
+
+        changed_props = self.props.changed(old_props)
+        if changed_props:
+            self.emit_properties_changed(changed_props)
 
     @method()
     async def Enable(self, enable: 'b'):
-        if self.props['State'].value == -1:
+        if self.props.State == -1:
             return
 
-        old_state = self.props['State'].value
-        self.props['State'] = Variant('i', 6 if enable else 3)
-        self.StateChanged(old_state, self.props['State'].value, 1)
-        self.emit_properties_changed({'State': self.props['State'].value})
+        old_state = self.props.State
+        self.props.State = 6 if enable else 3
+        self.StateChanged(old_state, self.props.State, 1)
+        self.emit_properties_changed({'State': self.props.State})
 
         try:
             await self.ofono_modem.call_set_property('Online', Variant('b', enable))
@@ -549,7 +597,7 @@ class MMModemInterface(ServiceInterface):
 
     @method()
     def ListBearers(self) -> 'ao':
-        return self.props['Bearers'].value
+        return self.props.Bearers
 
     @method()
     async def CreateBearer(self, properties: 'a{sv}') -> 'o':
@@ -559,7 +607,6 @@ class MMModemInterface(ServiceInterface):
             pass
 
     async def doCreateBearer(self, properties):
-        global bearer_i
         connection_manager_tries = 0
 
         # Prevents initial modem connection to fail by waiting for ofono
@@ -570,77 +617,50 @@ class MMModemInterface(ServiceInterface):
         if 'org.ofono.ConnectionManager' not in self.ofono_interfaces:
             return
 
-        Logger.debug(f"docreatebearer {bearer_i}")
-        mm_bearer_interface = MMBearerInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props, self)
-        mm_bearer_interface.props.update({
-            "Properties": Variant('a{sv}', properties)
-        })
-
         # users would usually have to do
         # set-context-property 0 AccessPointName example.apn && activate-context 1
-        # to activate the correct context for ofono2mm to use, lets do it on bearer creation to not need ofono scripts
-        contexts = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_get_contexts()
-        self.context_names = []
-        ctx_idx = 0
-        chosen_apn = None
-        chosen_ctx_path = None
-        for ctx in contexts:
-            name = ctx[1].get('Type', Variant('s', '')).value
-            access_point_name = ctx[1].get('AccessPointName', Variant('s', '')).value
-            if name.lower() == "internet":
-                ctx_idx += 1
-                if access_point_name:
-                    self.context_names.append(access_point_name)
-                    chosen_apn = access_point_name
-                    chosen_ctx_path = ctx[0]
-
-                    # print(chosen_ctx_path)
-
-            if chosen_ctx_path:
-                # print("set apn")
-                chosen_ctx_interface = self.ofono_client["ofono_context"][chosen_ctx_path]['org.ofono.ConnectionContext']
-                await chosen_ctx_interface.call_set_property("Active", Variant('b', False))
-                await chosen_ctx_interface.call_set_property("AccessPointName", Variant('s', chosen_apn))
-                await chosen_ctx_interface.call_set_property("Protocol", Variant('s', 'ip'))
-                await chosen_ctx_interface.call_set_property("Active", Variant('b', True))
-
-        ofono_ctx = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_add_context("internet")
-        ofono_ctx_interface = self.ofono_client["ofono_context"][ofono_ctx]['org.ofono.ConnectionContext']
+        # to get the correct context for ofono2mm to use, reuse it on bearer creation to not need ofono scripts
+        # and to not pile up contexts in oFono
+        ofono_ctx = self.context_registry.find(properties['apn'].value if 'apn' in properties else None)
+        if ofono_ctx is None:
+            ofono_ctx = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_add_context("internet")
+
+        # ContextAdded may have beaten the reply, add() gives back its bearer
+        # then. Either way the context is followed before it is set up.
+        bearer_path = self.context_registry.add(ofono_ctx, {'Type': Variant('s', 'internet')})
+        Logger.debug("%s: created %s on %s", self.modem_name, bearer_path, ofono_ctx)
+
+        context_props = {'Protocol': Variant('s', 'ip')}
         if 'apn' in properties:
-            await ofono_ctx_interface.call_set_property("AccessPointName", properties['apn'])
+            context_props['AccessPointName'] = properties['apn']
+        await self.context_registry.program(ofono_ctx, context_props, disconnect=True)
 
-        await mm_bearer_interface.add_auth_ofono(properties['username'].value if 'username' in properties else '',
-                                                        properties['password'].value if 'password' in properties else '')
+        mm_bearer_interface = self.bearers[bearer_path]
+        mm_bearer_interface.props['Properties'] = Variant('a{sv}', {**mm_bearer_interface.props['Properties'].value, **properties})
 
-        await ofono_ctx_interface.call_set_property("Protocol", Variant('s', 'ip'))
-        mm_bearer_interface.ofono_ctx = ofono_ctx
-        ofono_ctx_interface.on_property_changed(self.ofono_context_changed)
-        self.bus.export(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}', mm_bearer_interface)
-        self.props['Bearers'].value.append(f'/org/freedesktop/ModemManager/Bearer/{bearer_i}')
-        self.bearers[f'/org/freedesktop/ModemManager/Bearer/{bearer_i}'] = mm_bearer_interface
-        self.emit_properties_changed({'Bearers': self.props['Bearers'].value})
-        bearer_i += 1
+        # A reused context keeps the credentials it was provisioned with
+        await mm_bearer_interface.add_auth_ofono(properties['username'].value if 'username' in properties else None,
+                                                 properties['password'].value if 'password' in properties else None)
 
-        return f'/org/freedesktop/ModemManager/Bearer/{bearer_i}'
+        return bearer_path
 
     @method()
     async def DeleteBearer(self, path: 'o'):
-        if path in self.props['Bearers'].value:
-            self.props['Bearers'].value.remove(path)
-            await self.ofono_interfaces['org.ofono.ConnectionManager'].call_remove_context(self.bearers[path].ofono_ctx)
-            self.bearers.pop(path)
-            self.bus.unexport(path)
-            self.emit_properties_changed({'Bearers': self.props['Bearers'].value})
+        if path in self.bearers:
+            ofono_ctx = self.bearers[path].ofono_ctx
+            await self.ofono_interfaces['org.ofono.ConnectionManager'].call_remove_context(ofono_ctx)
+            # Already gone if ContextRemoved came first
+            self.context_registry.remove(ofono_ctx)
 
     @method()
     async def Reset(self):
         await self.ofono_modem.call_set_property('Powered', Variant('b', False))
         await self.ofono_modem.call_set_property('Powered', Variant('b', True))
 
-        old_state = self.props['State'].value
-        self.props['State'] = Variant('i', 6)  # 6 typically represents an enabled state
-        self.StateChanged(old_state, self.props['State'].value, 1)
-        self.emit_properties_changed({'State': self.props['State'].value})
+        old_state = self.props.State
+        self.props.State = 6  # 6 typically represents an enabled state
+        self.StateChanged(old_state, self.props.State, 1)
+        self.emit_properties_changed({'State': self.props.State})
 
         await self.ofono_modem.call_set_property('Online', Variant('b', True))
 
@@ -652,10 +672,10 @@ class MMModemInterface(ServiceInterface):
         await self.ofono_modem.call_set_property('Powered', Variant('b', False))
         await self.ofono_modem.call_set_property('Powered', Variant('b', True))
 
-        old_state = self.props['State'].value
-        self.props['State'] = Variant('i', 6)  # 6 typically represents an enabled state
-        self.StateChanged(old_state, self.props['State'].value, 1)
-        self.emit_properties_changed({'State': self.props['State'].value})
+        old_state = self.props.State
+        self.props.State = 6  # 6 typically represents an enabled state
+        self.StateChanged(old_state, self.props.State, 1)
+        self.emit_properties_changed({'State': self.props.State})
 
         await self.ofono_modem.call_set_property('Online', Variant('b', True))
 
@@ -669,10 +689,10 @@ class MMModemInterface(ServiceInterface):
             pass
 
         if state in [2, 3]:  # If state is 'on' or 'low'
-            old_state = self.props['State'].value
-            self.props['State'] = Variant('i', 6)  # 6 typically represents an enabled state
-            self.StateChanged(old_state, self.props['State'].value, 1)
-            self.emit_properties_changed({'State': self.props['State'].value})
+            old_state = self.props.State
+            self.props.State = 6  # 6 typically represents an enabled state
+            self.StateChanged(old_state, self.props.State, 1)
+            self.emit_properties_changed({'State': self.props.State})
 
             try:
                 await self.ofono_modem.call_set_property('Online', Variant('b', enable))
@@ -683,17 +703,17 @@ class MMModemInterface(ServiceInterface):
 
     @method()
     def SetCurrentCapabilities(self, capabilities: 'u'):
-        self.props['CurrentCapabilities'] = Variant('u', capabilities)
+        self.props.CurrentCapabilities = capabilities
 
     @method()
     async def SetCurrentModes(self, modes: '(uu)'):
-        for supported_modes in self.props['SupportedModes'].value:
+        for supported_modes in self.props.SupportedModes:
             if supported_modes[1] == modes[1]:
                 value = list(filter(lambda x: OFONO_MODES[x] == modes[1], OFONO_MODES))[0]
                 await self.ofono_interfaces['org.ofono.RadioSettings'].call_set_property('TechnologyPreference', Variant('s', value))
                 return
 
-        for supported_modes in self.props['SupportedModes'].value[::-1]:
+        for supported_modes in self.props.SupportedModes[::-1]:
             if supported_modes[0] & modes[0] != 0:
                 value = list(filter(lambda x: OFONO_MODES[x] == modes[0], OFONO_MODES))[0]
                 await self.ofono_interfaces['org.ofono.RadioSettings'].call_set_property('TechnologyPreference', Variant('s', value))
@@ -703,17 +723,21 @@ class MMModemInterface(ServiceInterface):
 
     @method()
     def SetCurrentBands(self, bands: 'au'):
-        self.props['CurrentBands'] = Variant('u', bands)
+        self.props.CurrentBands = bands
 
     @method()
     def SetPrimarySimSlot(self, sim_slot: 'u'):
-        self.props['PrimarySimSlot'] = Variant('u', sim_slot)
+        self.props.PrimarySimSlot = sim_slot
 
     @method()
     def GetCellInfo(self) -> 'aa{sv}':
+        cells = self.cell_info.get_cells()
+        if cells:
+            return cells
+
         cell_info = {
             "cell-type": Variant("u", self.mm_cell_type),
-            "serving": Variant("b", self.props['State'].value == 8), # 8 should mean its registered correctly to a network
+            "serving": Variant("b", self.props.State == 8), # 8 should mean its registered correctly to a network
         }
 
         return [cell_info]
@@ -728,142 +752,142 @@ class MMModemInterface(ServiceInterface):
 
     @dbus_property(access=PropertyAccess.READ)
     def Sim(self) -> 'o':
-        return self.props['Sim'].value
+        return self.props.Sim
 
     @dbus_property(access=PropertyAccess.READ)
     def SimSlots(self) -> 'ao':
-        return self.props['SimSlots'].value
+        return self.props.SimSlots
 
     @dbus_property(access=PropertyAccess.READ)
     def PrimarySimSlot(self) -> 'u':
-        return self.props['PrimarySimSlot'].value
+        return self.props.PrimarySimSlot
 
     @dbus_property(access=PropertyAccess.READ)
     def Bearers(self) -> 'ao':
-        return self.props['Bearers'].value
+        return self.props.Bearers
 
     @dbus_property(access=PropertyAccess.READ)
     def SupportedCapabilities(self) -> 'au':
-        return self.props['SupportedCapabilities'].value
+        return self.props.SupportedCapabilities
 
     @dbus_property(access=PropertyAccess.READ)
     def CurrentCapabilities(self) -> 'u':
-        return self.props['CurrentCapabilities'].value
+        return self.props.CurrentCapabilities
 
     @dbus_property(access=PropertyAccess.READ)
     def MaxBearers(self) -> 'u':
-        return self.props['MaxBearers'].value
+        return self.props.MaxBearers
 
     @dbus_property(access=PropertyAccess.READ)
     def MaxActiveBearers(self) -> 'u':
-        return self.props['MaxActiveBearers'].value
+        return self.props.MaxActiveBearers
 
     @dbus_property(access=PropertyAccess.READ)
     def MaxActiveMultiplexedBearers(self) -> 'u':
-        return self.props['MaxActiveMultiplexedBearers'].value
+        return self.props.MaxActiveMultiplexedBearers
 
     @dbus_property(access=PropertyAccess.READ)
     def Manufacturer(self) -> 's':
-        return self.props['Manufacturer'].value
+        return self.props.Manufacturer
 
     @dbus_property(access=PropertyAccess.READ)
     def Model(self) -> 's':
-        return self.props['Model'].value
+        return self.props.Model
 
     @dbus_property(access=PropertyAccess.READ)
     def Revision(self) -> 's':
-        return self.props['Revision'].value
+        return self.props.Revision
 
     @dbus_property(access=PropertyAccess.READ)
     def HardwareRevision(self) -> 's':
-        return self.props['HardwareRevision'].value
+        return self.props.HardwareRevision
 
     @dbus_property(access=PropertyAccess.READ)
     def DeviceIdentifier(self) -> 's':
-        return self.props['DeviceIdentifier'].value
+        return self.props.DeviceIdentifier
 
     @dbus_property(access=PropertyAccess.READ)
     def Device(self) -> 's':
-        return self.props['Device'].value
+        return self.props.Device
 
     @dbus_property(access=PropertyAccess.READ)
     def Physdev(self) -> 's':
-        return self.props['Physdev'].value
+        return self.props.Physdev
 
     @dbus_property(access=PropertyAccess.READ)
     def Drivers(self) -> 'as':
-        return self.props['Drivers'].value
+        return self.props.Drivers
 
     @dbus_property(access=PropertyAccess.READ)
     def Plugin(self) -> 's':
-        return self.props['Plugin'].value
+        return self.props.Plugin
 
     @dbus_property(access=PropertyAccess.READ)
     def PrimaryPort(self) -> 's':
-        return self.props['PrimaryPort'].value
+        return self.props.PrimaryPort
 
     @dbus_property(access=PropertyAccess.READ)
     def Ports(self) -> 'a(su)':
-        return self.props['Ports'].value
+        return self.props.Ports
 
     @dbus_property(access=PropertyAccess.READ)
     def EquipmentIdentifier(self) -> 's':
-        return self.props['EquipmentIdentifier'].value
+        return self.props.EquipmentIdentifier
 
     @dbus_property(access=PropertyAccess.READ)
     def UnlockRequired(self) -> 'u':
-        return self.props['UnlockRequired'].value
+        return self.props.UnlockRequired
 
     @dbus_property(access=PropertyAccess.READ)
     def UnlockRetries(self) -> 'a{uu}':
-        return self.props['UnlockRetries'].value
+        return self.props.UnlockRetries
 
     @dbus_property(access=PropertyAccess.READ)
     def State(self) -> 'i':
-        return self.props['State'].value
+        return self.props.State
 
     @dbus_property(access=PropertyAccess.READ)
     def StateFailedReason(self) -> 'u':
-        return self.props['StateFailedReason'].value
+        return self.props.StateFailedReason
 
     @dbus_property(access=PropertyAccess.READ)
     def AccessTechnologies(self) -> 'u':
-        return self.props['AccessTechnologies'].value
+        return self.props.AccessTechnologies
 
     @dbus_property(access=PropertyAccess.READ)
     def SignalQuality(self) -> '(ub)':
-        return self.props['SignalQuality'].value
+        return self.props.SignalQuality
 
     @dbus_property(access=PropertyAccess.READ)
     def OwnNumbers(self) -> 'as':
-        return self.props['OwnNumbers'].value
+        return self.props.OwnNumbers
 
     @dbus_property(access=PropertyAccess.READ)
     def PowerState(self) -> 'u':
-        return self.props['PowerState'].value
+        return self.props.PowerState
 
     @dbus_property(access=PropertyAccess.READ)
     def SupportedModes(self) -> 'a(uu)':
-        return self.props['SupportedModes'].value
+        return self.props.SupportedModes
 
     @dbus_property(access=PropertyAccess.READ)
     def CurrentModes(self) -> '(uu)':
-        return self.props['CurrentModes'].value
+        return self.props.CurrentModes
 
     @dbus_property(access=PropertyAccess.READ)
     def SupportedBands(self) -> 'au':
-        return self.props['SupportedBands'].value
+        return self.props.SupportedBands
 
     @dbus_property(access=PropertyAccess.READ)
     def CurrentBands(self) -> 'au':
-        return self.props['CurrentBands'].value
+        return self.props.CurrentBands
 
     @dbus_property(access=PropertyAccess.READ)
     def SupportedIpFamilies(self) -> 'u':
-        return self.props['SupportedIpFamilies'].value
+        return self.props.SupportedIpFamilies
 
     def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
+        self.ofono_state.set_prop(name, varval)
         if name == "Interfaces":
             for iface in varval.value:
                 if not (iface in self.ofono_interfaces):
@@ -872,24 +896,21 @@ class MMModemInterface(ServiceInterface):
                 if not (iface in varval.value):
                     self.loop.create_task(self.remove_ofono_interface(iface))
 
-        self.set_props()
-        if self.mm_modem3gpp_interface:
-            self.mm_modem3gpp_interface.ofono_changed(name, varval)
-        if self.mm_sim_interface:
-            self.mm_sim_interface.ofono_changed(name, varval)
-
     def ofono_interface_changed(self, iface):
         def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-                self.set_props()
-                if self.mm_modem3gpp_interface:
-                    self.mm_modem3gpp_interface.ofono_interface_changed(iface)(name, varval)
-                if self.mm_sim_interface:
-                    self.mm_sim_interface.ofono_interface_changed(iface)(name, varval)
+            self.ofono_state.set_interface_prop(iface, name, varval)
 
         return ch
 
+    def ofono_state_changed(self, iface, name, value):
+        self.set_props({(iface, name)})
+
     def ofono_context_changed(self, propname, value):
         if propname == "Active":
-            self.set_props()
+            self.set_props({('org.ofono.ConnectionContext', 'Active')})
+
+    def add_port(self, name):
+        # Contexts report their interface on every settings change
+        if [name, ModemManagerPortType.AT] not in self.props.Ports:
+            self.props.Ports.append([name, ModemManagerPortType.AT])
+            self.emit_properties_changed({'Ports': self.props.Ports})
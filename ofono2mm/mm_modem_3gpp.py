@@ -1,76 +1,86 @@
-from dbus_next.service import (ServiceInterface,
-                               method, dbus_property, signal)
+from dbus_next.service import (method, dbus_property, signal)
 from dbus_next.constants import PropertyAccess
 from dbus_next import Variant, DBusError
 
-from ofono2mm.mm_types import ModemManager3gppRegistrationState, ModemManager3gppFacility
-
-class MMModem3gppInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props):
+from ofono2mm.mm_types import ModemManager3gppRegistrationState, ModemManager3gppFacility, OFONO_REGISTRATION_STATES
+from ofono2mm.mm_props import Props
+from ofono2mm.ofono_state import PublishingInterface
+
+class Modem3gppProps(Props):
+    SIGNATURES = {
+        'Imei': 's',
+        'RegistrationState': 'u',
+        'OperatorCode': 's',
+        'OperatorName': 's',
+        'EnabledFacilityLocks': 'u',
+        'SubscriptionState': 'u',
+        'EpsUeModeOperation': 'u',
+        'Pco': 'a(ubay)',
+        'InitialEpsBearer': 'o',
+        'InitialEpsBearerSettings': 'a{sv}',
+        'PacketServiceState': 'u',
+        'Nr5gRegistrationSettings': 'a{sv}',
+    }
+    __slots__ = tuple(SIGNATURES)
+
+class MMModem3gppInterface(PublishingInterface):
+    def __init__(self, index, bus, ofono_client, ofono_state):
         super().__init__('org.freedesktop.ModemManager1.Modem.Modem3gpp')
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
-        self.props = {
-            'Imei': Variant('s', ''),
-            'RegistrationState': Variant('u', ModemManager3gppRegistrationState.IDLE),
-            'OperatorCode': Variant('s', ''),
-            'OperatorName': Variant('s', ''),
-            'EnabledFacilityLocks': Variant('u', ModemManager3gppFacility.NONE),
-            'SubscriptionState': Variant('u', 0), # on runtime unknown MM_MODEM_3GPP_SUBSCRIPTION_STATE_UNKNOWN
-            'EpsUeModeOperation': Variant('u', 0), # on runtime unknown MM_MODEM_3GPP_PACKET_SERVICE_STATE_UNKNOWN
-            'Pco': Variant('a(ubay)', []),
-            'InitialEpsBearer': Variant('o', '/'),
-            'InitialEpsBearerSettings': Variant('a{sv}', {}),
-            'PacketServiceState': Variant('u', 0), # on runtime unknown MM_MODEM_3GPP_PACKET_SERVICE_STATE_UNKNOWN
-            'Nr5gRegistrationSettings': Variant('a{sv}', {
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
+        self.props = Modem3gppProps(
+            Imei='',
+            RegistrationState=ModemManager3gppRegistrationState.IDLE,
+            OperatorCode='',
+            OperatorName='',
+            EnabledFacilityLocks=ModemManager3gppFacility.NONE,
+            SubscriptionState=0, # on runtime unknown MM_MODEM_3GPP_SUBSCRIPTION_STATE_UNKNOWN
+            EpsUeModeOperation=0, # on runtime unknown MM_MODEM_3GPP_PACKET_SERVICE_STATE_UNKNOWN
+            Pco=[],
+            InitialEpsBearer='/',
+            InitialEpsBearerSettings={},
+            PacketServiceState=0, # on runtime unknown MM_MODEM_3GPP_PACKET_SERVICE_STATE_UNKNOWN
+            Nr5gRegistrationSettings={
                 'mico-mode': Variant('u', 0), # hardcoded value unknown MM_MODEM_3GPP_MICO_MODE_UNKNOWN
                 'dtx-cycle': Variant('u', 0) # hardcoded value unknown MM_MODEM_3GPP_DRX_CYCLE_UNKNOWN
-            })
-        }
+            },
+        )
+
+        self.ofono_state.subscribe('org.ofono.Modem', 'Serial', self.ofono_state_changed)
+        for name in ['Name', 'MobileCountryCode', 'MobileNetworkCode', 'Status']:
+            self.ofono_state.subscribe('org.ofono.NetworkRegistration', name, self.ofono_state_changed)
 
     def set_props(self):
-        old_props = self.props.copy()
+        old_props = self.props.snapshot()
         if 'org.ofono.NetworkRegistration' in self.ofono_interface_props:
-            self.props['OperatorName'] = Variant('s', self.ofono_interface_props['org.ofono.NetworkRegistration']['Name'].value if "Name" in self.ofono_interface_props['org.ofono.NetworkRegistration'] else '')
+            self.props.OperatorName = self.ofono_interface_props['org.ofono.NetworkRegistration']['Name'].value if "Name" in self.ofono_interface_props['org.ofono.NetworkRegistration'] else ''
             MCC = self.ofono_interface_props['org.ofono.NetworkRegistration']['MobileCountryCode'].value if "MobileCountryCode" in self.ofono_interface_props['org.ofono.NetworkRegistration'] else ''
             MNC = self.ofono_interface_props['org.ofono.NetworkRegistration']['MobileNetworkCode'].value if "MobileNetworkCode" in self.ofono_interface_props['org.ofono.NetworkRegistration'] else ''
-            self.props['OperatorCode'] = Variant('s', f"{MCC}{MNC}" if MCC != '' else '')
+            self.props.OperatorCode = f"{MCC}{MNC}" if MCC != '' else ''
             if 'Status' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "unregistered":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.IDLE)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "registered":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.HOME)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "searching":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.SEARCHING)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "denied":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.DENIED)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "unknown":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.UNKNOWN)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "roaming":
-                    self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.ROAMING)
+                ofono_status = self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value
+                self.props.RegistrationState = OFONO_REGISTRATION_STATES.get(ofono_status, ModemManager3gppRegistrationState.UNKNOWN)
             else:
-                self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.UNKNOWN)
+                self.props.RegistrationState = ModemManager3gppRegistrationState.UNKNOWN
         else:
-            self.props['OperatorName'] = Variant('s', '')
-            self.props['OperatorCode'] = Variant('s', '')
-            self.props['RegistrationState'] = Variant('u', ModemManager3gppRegistrationState.UNKNOWN)
-
-        self.props['Imei'] = Variant('s', self.ofono_props['Serial'].value if 'Serial' in self.ofono_props else '')
-        self.props['EnabledFacilityLocks'] = Variant('u', ModemManager3gppFacility.NONE)
+            self.props.OperatorName = ''
+            self.props.OperatorCode = ''
+            self.props.RegistrationState = ModemManager3gppRegistrationState.UNKNOWN
 
-        changed_props = {}
-        for prop in self.props:
-            if self.props[prop].value != old_props[prop].value:
-                changed_props.update({ prop: self.props[prop].value })
+        self.props.Imei = self.ofono_props['Serial'].value if 'Serial' in self.ofono_props else ''
+        self.props.EnabledFacilityLocks = ModemManager3gppFacility.NONE
 
-        self.emit_properties_changed(changed_props)
+        changed_props = self.props.changed(old_props)
+        if changed_props:
+            self.emit_properties_changed(changed_props)
 
     @method()
     async def Register(self, operator_id: 's'):
@@ -149,60 +159,51 @@ class MMModem3gppInterface(ServiceInterface):
 
     @dbus_property(access=PropertyAccess.READ)
     def Imei(self) -> 's':
-        return self.props['Imei'].value
+        return self.props.Imei
 
     @dbus_property(access=PropertyAccess.READ)
     def RegistrationState(self) -> 'u':
-        return self.props['RegistrationState'].value
+        return self.props.RegistrationState
 
     @dbus_property(access=PropertyAccess.READ)
     def OperatorCode(self) -> 's':
-        return self.props['OperatorCode'].value
+        return self.props.OperatorCode
 
     @dbus_property(access=PropertyAccess.READ)
     def OperatorName(self) -> 's':
-        return self.props['OperatorName'].value
+        return self.props.OperatorName
 
     @dbus_property(access=PropertyAccess.READ)
     def EnabledFacilityLocks(self) -> 'u':
-        return self.props['EnabledFacilityLocks'].value
+        return self.props.EnabledFacilityLocks
 
     @dbus_property(access=PropertyAccess.READ)
     def SubscriptionState(self) -> 'u':
-        return self.props['SubscriptionState'].value
+        return self.props.SubscriptionState
 
     @dbus_property(access=PropertyAccess.READ)
     def EpsUeModeOperation(self) -> 'u':
-        return self.props['EpsUeModeOperation'].value
+        return self.props.EpsUeModeOperation
 
     @dbus_property(access=PropertyAccess.READ)
     def Pco(self) -> 'a(ubay)':
-        return self.props['Pco'].value
+        return self.props.Pco
 
     @dbus_property(access=PropertyAccess.READ)
     def InitialEpsBearer(self) -> 'o':
-        return self.props['InitialEpsBearer'].value
+        return self.props.InitialEpsBearer
 
     @dbus_property(access=PropertyAccess.READ)
     def InitialEpsBearerSettings(self) -> 'a{sv}':
-        return self.props['InitialEpsBearerSettings'].value
+        return self.props.InitialEpsBearerSettings
 
     @dbus_property(access=PropertyAccess.READ)
     def PacketServiceState(self) -> 'u':
-        return self.props['PacketServiceState'].value
+        return self.props.PacketServiceState
 
     @dbus_property(access=PropertyAccess.READ)
     def Nr5gRegistrationSettings(self) -> 'a{sv}':
-        return self.props['Nr5gRegistrationSettings'].value
+        return self.props.Nr5gRegistrationSettings
 
-    def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
+    def ofono_state_changed(self, iface, name, value):
         self.set_props()
-
-    def ofono_interface_changed(self, iface):
-        def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-            self.set_props()
-
-        return ch
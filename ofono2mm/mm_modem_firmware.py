@@ -9,7 +9,7 @@ class MMModemFirmwareInterface(ServiceInterface):
         self.set_props()
 
     def set_props(self):
-        self.hardware_revision = self.mm_modem.props.get('HardwareRevision', Variant('s', ''))
+        self.hardware_revision = self.mm_modem.props.variant('HardwareRevision')
 
         self.props = {
             'UpdateSettings': Variant('(ua{sv})', [1, {
@@ -8,17 +8,18 @@ from ofono2mm.mm_sms import MMSmsInterface
 message_i = 1
 
 class MMModemMessagingInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props):
+    def __init__(self, index, bus, ofono_client, ofono_state):
         super().__init__('org.freedesktop.ModemManager1.Modem.Messaging')
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
         self.props = {
             'Messages': Variant('ao', []),
             'SupportedStorages': Variant('au', []),
@@ -26,11 +27,15 @@ class MMModemMessagingInterface(ServiceInterface):
         }
 
     def set_props(self):
-        old_props = self.props
+        old_props = self.props.copy()
 
+        changed_props = {}
         for prop in self.props:
             if self.props[prop].value != old_props[prop].value:
-                self.emit_properties_changed({prop: self.props[prop].value})
+                changed_props.update({ prop: self.props[prop].value })
+
+        if changed_props:
+            self.emit_properties_changed(changed_props)
 
     async def init_messages(self):
         if 'org.ofono.MessageManager' in self.ofono_interfaces:
@@ -38,7 +43,7 @@ class MMModemMessagingInterface(ServiceInterface):
 
     def add_incoming_message(self, msg, props):
         global message_i
-        mm_sms_interface = MMSmsInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        mm_sms_interface = MMSmsInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         mm_sms_interface.props.update({
             'State': Variant('u', 3), # hardcoded value received MM_SMS_STATE_RECEIVED
             'PduType': Variant('u', 1), # hardcoded value deliver MM_SMS_PDU_TYPE_DELIVER
@@ -71,7 +76,7 @@ class MMModemMessagingInterface(ServiceInterface):
         if 'number' not in properties or 'text' not in properties:
             return
 
-        mm_sms_interface = MMSmsInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        mm_sms_interface = MMSmsInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         mm_sms_interface.props.update({
             'Text': properties['text'],
             'Number': properties['number'],
@@ -109,15 +114,3 @@ class MMModemMessagingInterface(ServiceInterface):
     @dbus_property(access=PropertyAccess.READ)
     def DefaultStorage(self) -> 'u':
         return self.props['DefaultStorage'].value
-
-    def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
-        self.set_props()
-
-    def ofono_interface_changed(self, iface):
-        def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-            self.set_props()
-
-        return ch
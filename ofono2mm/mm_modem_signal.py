@@ -2,143 +2,267 @@ from dbus_next.service import ServiceInterface, method, dbus_property, signal
 from dbus_next.constants import PropertyAccess
 from dbus_next import Variant
 
+from ofono2mm.mm_props import Props
+from ofono2mm.instrumentation import Instrumentation
+from ofono2mm.scheduler import Scheduler
+from ofono2mm.signal_history import SignalHistory
+from ofono2mm.logger import Logger
+
+# Measurements reported for each access technology
+MEASUREMENTS = {
+    'Cdma': ('rssi', 'ecio', 'error-rate'),
+    'Evdo': ('rssi', 'ecio', 'sinr', 'io', 'error-rate'),
+    'Gsm': ('rssi', 'error-rate'),
+    'Umts': ('rssi', 'rscp', 'ecio', 'error-rate'),
+    'Lte': ('rssi', 'rsrq', 'rsrp', 'snr', 'error-rate'),
+    'Nr5g': ('rsrq', 'rsrp', 'snr', 'error-rate'),
+}
+
+# oFono NetworkMonitor properties and the measurement they give
+OFONO_MEASUREMENTS = {
+    'ReceivedSignalStrength': 'rssi',
+    'BitErrorRate': 'error-rate',
+    'ReferenceSignalReceivedQuality': 'rsrq',
+    'ReferenceSignalReceivedPower': 'rsrp',
+    'ReceivedSignalCodePower': 'rscp',
+}
+
+# oFono serving cell technologies and the matching Signal property
+OFONO_SIGNAL_TECHNOLOGIES = {
+    'gsm': 'Gsm',
+    'umts': 'Umts',
+    'hspa': 'Umts',
+    'lte': 'Lte',
+    'nr': 'Nr5g',
+}
+
+class SignalProps(Props):
+    SIGNATURES = {
+        'Rate': 'u',
+        'RssiThreshold': 'u',
+        'ErrorRateThreshold': 'b',
+        'Cdma': 'a{sv}',
+        'Evdo': 'a{sv}',
+        'Gsm': 'a{sv}',
+        'Umts': 'a{sv}',
+        'Lte': 'a{sv}',
+        'Nr5g': 'a{sv}',
+    }
+    __slots__ = tuple(SIGNATURES)
+
+def to_variants(measurements):
+    return {name: Variant('d', value) for name, value in measurements.items()}
+
+class OfonoNetworkMonitorAgent(ServiceInterface):
+    """
+    Receives the serving cell information oFono pushes at the period the
+    agent was registered with.
+    """
+
+    def __init__(self, cell_changed, released):
+        super().__init__('org.ofono.NetworkMonitorAgent')
+        self.cell_changed = cell_changed
+        self.released = released
+
+    @method()
+    def ServingCellInformationChanged(self, cellinfo: 'a{sv}'):
+        self.cell_changed(cellinfo)
+
+    @method()
+    def Release(self):
+        self.released()
+
 class MMModemSignalInterface(ServiceInterface):
-    def __init__(self, mm_modem, ofono_interfaces, ofono_interface_props):
+    def __init__(self, mm_modem):
         super().__init__('org.freedesktop.ModemManager1.Modem.Signal')
         self.mm_modem = mm_modem
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
-        self.props = {
-            'Rate': Variant('u', 0),
-            'RssiThreshold': Variant('u', 0),
-            'ErrorRateThreshold': Variant('b', False),
-            'Cdma': Variant('a{sv}', {
-                'rssi': Variant('d', 0),
-                'ecio': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-             }),
-            'Evdo': Variant('a{sv}', {
-                'rssi': Variant('d', 0),
-                'ecio': Variant('d', 0),
-                'sinr': Variant('d', 0),
-                'io': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-             }),
-            'Gsm': Variant('a{sv}', {
-                'rssi': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-            }),
-            'Umts': Variant('a{sv}', {
-                'rssi': Variant('d', 0),
-                'rscp': Variant('d', 0),
-                'ecio': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-            }),
-            'Lte': Variant('a{sv}', {
-                'rssi': Variant('d', 0),
-                'rsrq': Variant('d', 0),
-                'rsrp': Variant('d', 0),
-                'snr': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-            }),
-            'Nr5g': Variant('a{sv}', {
-                'rsrq': Variant('d', 0),
-                'rsrp': Variant('d', 0),
-                'snr': Variant('d', 0),
-                'error-rate': Variant('d', 0)
-            })
-        }
-
-    async def set_props(self):
-        if 'org.ofono.NetworkMonitor' in self.ofono_interface_props:
-            self.props['Cdma'].value['rssi'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalStrength'].value if "ReceivedSignalStrength" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Evdo'].value['rssi'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalStrength'].value if "ReceivedSignalStrength" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Gsm'].value['rssi'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalStrength'].value if "ReceivedSignalStrength" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Umts'].value['rssi'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalStrength'].value if "ReceivedSignalStrength" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Lte'].value['rssi'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalStrength'].value if "ReceivedSignalStrength" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-
-            self.props['Cdma'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Evdo'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Gsm'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Umts'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Lte'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Nr5g'].value['error-rate'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['BitErrorRate'].value if "BitErrorRate" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-
-            self.props['Lte'].value['rsrq'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReferenceSignalReceivedQuality'].value if "ReferenceSignalReceivedQuality" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Nr5g'].value['rsrq'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReferenceSignalReceivedQuality'].value if "ReferenceSignalReceivedQuality" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-
-            self.props['Lte'].value['rsrp'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReferenceSignalReceivedPower'].value if "ReferenceSignalReceivedPower" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-            self.props['Nr5g'].value['rsrp'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReferenceSignalReceivedPower'].value if "ReferenceSignalReceivedPower" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-
-            self.props['Umts'].value['rscp'] = Variant('d', self.ofono_interface_props['org.ofono.NetworkMonitor']['ReceivedSignalCodePower'].value if "ReceivedSignalCodePower" in self.ofono_interface_props['org.ofono.NetworkMonitor'] else 0)
-        else:
-            self.props['Cdma'].value['rssi'] = Variant('d', 0)
-            self.props['Evdo'].value['rssi'] = Variant('d', 0)
-            self.props['Gsm'].value['rssi'] = Variant('d', 0)
-            self.props['Umts'].value['rssi'] = Variant('d', 0)
-            self.props['Lte'].value['rssi'] = Variant('d', 0)
-
-            self.props['Cdma'].value['error-rate'] = Variant('d', 0)
-            self.props['Evdo'].value['error-rate'] = Variant('d', 0)
-            self.props['Gsm'].value['error-rate'] = Variant('d', 0)
-            self.props['Umts'].value['error-rate'] = Variant('d', 0)
-            self.props['Lte'].value['error-rate'] = Variant('d', 0)
-            self.props['Nr5g'].value['error-rate'] = Variant('d', 0)
-
-            self.props['Lte'].value['rsrq'] = Variant('d', 0)
-            self.props['Nr5g'].value['rsrq'] = Variant('d', 0)
-
-            self.props['Lte'].value['rsrp'] = Variant('d', 0)
-            self.props['Nr5g'].value['rsrp'] = Variant('d', 0)
-
-            self.props['Umts'].value['rscp'] = Variant('d', 0)
+        self.ofono_interfaces = mm_modem.ofono_interfaces
+        self.ofono_interface_props = mm_modem.ofono_interface_props
+        # Measurements are kept as plain floats, Variants are built when they are sent
+        self.props = SignalProps(
+            Rate=0,
+            RssiThreshold=0,
+            ErrorRateThreshold=False,
+            **{tech: dict.fromkeys(names, 0.0) for tech, names in MEASUREMENTS.items()}
+        )
 
-    @method()
-    async def Setup(self, rate: 'u'):
+        self.timer = None
+        self.polling = False
+        self.agent = None
+        self.agent_path = f'/org/ofono2mm/NetworkMonitorAgent/{mm_modem.index}'
+        self.history = SignalHistory() if SignalHistory.capacity else None
+
+        self.mm_modem.ofono_state.subscribe('org.ofono.NetworkMonitor', None, self.ofono_state_changed)
+
+    def ofono_state_changed(self, iface, name, value):
+        self.set_props()
+
+    def set_props(self):
+        old_props = self.props.snapshot(MEASUREMENTS)
+        ofono_props = self.ofono_interface_props.get('org.ofono.NetworkMonitor', {})
+
+        # Only what oFono reported, the history tells missing from 0
+        values = {}
+        for ofono_name, name in OFONO_MEASUREMENTS.items():
+            if ofono_name in ofono_props:
+                values[name] = float(ofono_props[ofono_name].value)
+
+        if ofono_props and self.history is not None:
+            self.history.append(values)
+
+        # Serving cell information only describes the current technology
+        current_tech = None
+        if 'Technology' in ofono_props:
+            current_tech = OFONO_SIGNAL_TECHNOLOGIES.get(ofono_props['Technology'].value)
+
+        for tech, names in MEASUREMENTS.items():
+            if current_tech is not None and tech != current_tech:
+                measurements = dict.fromkeys(names, 0.0)
+            else:
+                measurements = {name: values.get(name, 0.0) for name in names}
+            if self.over_thresholds(getattr(self.props, tech), measurements):
+                setattr(self.props, tech, measurements)
+
+        changed_props = self.props.changed(old_props)
+        if changed_props:
+            self.emit_properties_changed({tech: to_variants(measurements) for tech, measurements in changed_props.items()})
+
+    def over_thresholds(self, old, new):
+        # Without thresholds, every change is published
+        if not self.props.RssiThreshold and not self.props.ErrorRateThreshold:
+            return True
+
+        # Compared to the last published values, so slow drifts still get out,
+        # 5G has no RSSI, its RSRP is used instead
+        level = 'rssi' if 'rssi' in new else 'rsrp'
+        if self.props.RssiThreshold and abs(new[level] - old[level]) >= self.props.RssiThreshold:
+            return True
+
+        if self.props.ErrorRateThreshold and new['error-rate'] != old['error-rate']:
+            return True
+
+        if new != old and Instrumentation.ENABLED:
+            Instrumentation.get_default().count('suppressed', 'org.freedesktop.ModemManager1.Modem.Signal')
+        return False
+
+    async def poll(self):
+        # A slow oFono must not pile up calls
+        if self.polling or 'org.ofono.NetworkMonitor' not in self.ofono_interfaces:
+            return
+
+        self.polling = True
+        try:
+            cell = await self.ofono_interfaces['org.ofono.NetworkMonitor'].call_get_serving_cell_information()
+            self.mm_modem.ofono_state.set_interface_props('org.ofono.NetworkMonitor', cell)
+        except Exception as e:
+            Logger.debug("%s: GetServingCellInformation failed: %s", self.mm_modem.modem_name, e)
+        finally:
+            self.polling = False
+
+    def cell_changed(self, cellinfo):
+        self.mm_modem.ofono_state.set_interface_props('org.ofono.NetworkMonitor', cellinfo)
+
+    def agent_released(self):
+        Logger.debug("%s: NetworkMonitor agent released, polling", self.mm_modem.modem_name)
+        self.unexport_agent()
+        if self.props.Rate != 0 and self.timer is None:
+            self.timer = Scheduler.get_default().add(self.props.Rate, self.poll)
+
+    def unexport_agent(self):
+        if self.agent is not None:
+            self.mm_modem.bus.unexport(self.agent_path, self.agent)
+            self.agent = None
+
+    async def register_agent(self, rate):
+        if 'org.ofono.NetworkMonitor' not in self.ofono_interfaces:
+            return False
+
+        self.agent = OfonoNetworkMonitorAgent(self.cell_changed, self.agent_released)
+        self.mm_modem.bus.export(self.agent_path, self.agent)
         try:
-            await self.set_props()
+            await self.ofono_interfaces['org.ofono.NetworkMonitor'].call_register_agent(self.agent_path, rate)
+        except Exception as e:
+            Logger.debug("%s: NetworkMonitor agent not supported: %s", self.mm_modem.modem_name, e)
+            self.unexport_agent()
+            return False
+
+        return True
+
+    async def unregister_agent(self):
+        if self.agent is None:
+            return
+
+        try:
+            await self.ofono_interfaces['org.ofono.NetworkMonitor'].call_unregister_agent(self.agent_path)
         except Exception as e:
             pass
+        self.unexport_agent()
 
-        self.props['Rate'] = Variant('u', rate)
+    def stop(self):
+        Scheduler.get_default().remove(self.timer)
+        self.timer = None
+        # oFono drops the agent of a modem that goes away
+        self.unexport_agent()
+
+    @method()
+    async def Setup(self, rate: 'u'):
+        Scheduler.get_default().remove(self.timer)
+        self.timer = None
+        await self.unregister_agent()
+
+        if rate != 0:
+            # oFono pushes the cell information to an agent, polling is
+            # only for when it can't
+            if not await self.register_agent(rate):
+                self.timer = Scheduler.get_default().add(rate, self.poll)
+            await self.poll()
+
+        if self.props.Rate != rate:
+            self.props.Rate = rate
+            self.emit_properties_changed({'Rate': rate})
 
     @method()
     def SetupThresholds(self, settings: 'a{sv}'):
-        self.props['RssiThreshold'] = Variant('u', settings.get('rssi-threshold', Variant('u', 0)).value)
-        self.props['ErrorRateThreshold'] = Variant('b', settings.get('error-rate-threshold', Variant('b', False)).value)
+        old_props = self.props.snapshot(('RssiThreshold', 'ErrorRateThreshold'))
+        self.props.RssiThreshold = settings.get('rssi-threshold', Variant('u', 0)).value
+        self.props.ErrorRateThreshold = settings.get('error-rate-threshold', Variant('b', False)).value
+
+        changed_props = self.props.changed(old_props)
+        if changed_props:
+            self.emit_properties_changed(changed_props)
 
     @dbus_property(access=PropertyAccess.READ)
     def Rate(self) -> 'u':
-        return self.props['Rate'].value
+        return self.props.Rate
 
     @dbus_property(access=PropertyAccess.READ)
     def RssiThreshold(self) -> 'u':
-        return self.props['RssiThreshold'].value
+        return self.props.RssiThreshold
 
     @dbus_property(access=PropertyAccess.READ)
     def ErrorRateThreshold(self) -> 'b':
-        return self.props['ErrorRateThreshold'].value
+        return self.props.ErrorRateThreshold
 
     @dbus_property(access=PropertyAccess.READ)
     def Cdma(self) -> 'a{sv}':
-        return self.props['Cdma'].value
+        return to_variants(self.props.Cdma)
 
     @dbus_property(access=PropertyAccess.READ)
     def Evdo(self) -> 'a{sv}':
-        return self.props['Evdo'].value
+        return to_variants(self.props.Evdo)
 
     @dbus_property(access=PropertyAccess.READ)
     def Gsm(self) -> 'a{sv}':
-        return self.props['Gsm'].value
+        return to_variants(self.props.Gsm)
 
     @dbus_property(access=PropertyAccess.READ)
     def Umts(self) -> 'a{sv}':
-        return self.props['Umts'].value
+        return to_variants(self.props.Umts)
 
     @dbus_property(access=PropertyAccess.READ)
     def Lte(self) -> 'a{sv}':
-        return self.props['Lte'].value
+        return to_variants(self.props.Lte)
 
     @dbus_property(access=PropertyAccess.READ)
     def Nr5g(self) -> 'a{sv}':
-        return self.props['Nr5g'].value
+        return to_variants(self.props.Nr5g)
@@ -1,18 +1,30 @@
 from dbus_next.service import (ServiceInterface, method, dbus_property, signal)
 from dbus_next.constants import PropertyAccess
-from dbus_next import Variant
+from dbus_next import Variant, DBusError
 
 from ofono2mm.mm_types import ModemManagerState, ModemManagerAccessTechnology, ModemManager3gppRegistrationState
 
+# Status entries and the ModemManager (interface, property) they mirror
+STATUS_PROPS = {
+    ('org.freedesktop.ModemManager1.Modem', 'State'): ('state', 'u'),
+    ('org.freedesktop.ModemManager1.Modem', 'SignalQuality'): ('signal-quality', '(ub)'),
+    ('org.freedesktop.ModemManager1.Modem', 'CurrentBands'): ('current-bands', 'au'),
+    ('org.freedesktop.ModemManager1.Modem', 'AccessTechnologies'): ('access-technologies', 'u'),
+    ('org.freedesktop.ModemManager1.Modem.Modem3gpp', 'RegistrationState'): ('m3gpp-registration-state', 'u'),
+    ('org.freedesktop.ModemManager1.Modem.Modem3gpp', 'OperatorCode'): ('m3gpp-operator-code', 's'),
+    ('org.freedesktop.ModemManager1.Modem.Modem3gpp', 'OperatorName'): ('m3gpp-operator-name', 's'),
+}
+
 class MMModemSimpleInterface(ServiceInterface):
-    def __init__(self, mm_modem, ofono_interfaces, ofono_interface_props):
+    def __init__(self, mm_modem):
         super().__init__('org.freedesktop.ModemManager1.Modem.Simple')
         self.mm_modem = mm_modem
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
+        self.ofono_interfaces = mm_modem.ofono_interfaces
+        self.ofono_interface_props = mm_modem.ofono_interface_props
+        # GetStatus reply, kept up to date by the Modem and 3GPP interface changes
         self.props = {
-             'state': Variant('u', ModemManagerState.ENABLED),
-             'signal-quality': Variant('(ub)', [0, True]),
+             'state': Variant('u', ModemManagerState.UNKNOWN),
+             'signal-quality': Variant('(ub)', [0, False]),
              'current-bands': Variant('au', []),
              'access-technologies': Variant('u', ModemManagerAccessTechnology.UNKNOWN),
              'm3gpp-registration-state': Variant('u', ModemManager3gppRegistrationState.IDLE),
@@ -24,84 +36,32 @@ class MMModemSimpleInterface(ServiceInterface):
              'cdma-nid': Variant('u', 0)
         }
 
-    async def set_props(self):
-        old_props = self.props.copy()
-        if 'org.ofono.NetworkRegistration' in self.ofono_interface_props:
-            self.props['m3gpp-operator-name'] = Variant('s', self.ofono_interface_props['org.ofono.NetworkRegistration']['Name'].value if "Name" in self.ofono_interface_props['org.ofono.NetworkRegistration'] else '')
-
-            if 'MobileCountryCode' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                MCC = self.ofono_interface_props['org.ofono.NetworkRegistration']['MobileCountryCode'].value
-            else:
-                MCC = ''
-
-            if 'MobileNetworkCode' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                MNC = self.ofono_interface_props['org.ofono.NetworkRegistration']['MobileNetworkCode'].value
-            else:
-                MNC = ''
-
-            self.props['m3gpp-operator-code'] = Variant('s', f'{MCC}-{MNC}')
-
-            if 'Strength' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                self.props['signal-quality'] = Variant('(ub)', [self.ofono_interface_props['org.ofono.NetworkRegistration']['Strength'].value, True])
+        for iface, name in STATUS_PROPS:
+            self.mm_modem.ofono_state.subscribe(iface, name, self.mm_state_changed)
 
-            if 'Status' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == 'registered' or self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == 'roaming':
-                    self.props['state'] = Variant('u', ModemManagerState.REGISTERED)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == 'searching':
-                    self.props['state'] = Variant('u', ModemManagerState.SEARCHING)
-                else:
-                    self.props['state'] = Variant('u', ModemManagerState.ENABLED)
+    def mm_state_changed(self, iface, name, value):
+        key, signature = STATUS_PROPS[(iface, name)]
+        # The status state is unsigned, a failed modem is reported as unknown
+        if key == 'state':
+            value = max(value, ModemManagerState.UNKNOWN)
+        self.props[key] = Variant(signature, value)
 
-            if 'Status' in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                if self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "unregistered":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.IDLE)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "registered":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.HOME)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "searching":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.SEARCHING)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "denied":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.DENIED)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "unknown":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.UNKNOWN)
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']['Status'].value == "roaming":
-                    self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.ROAMING)
-            else:
-                self.props['m3gpp-registration-state'] = Variant('u', ModemManager3gppRegistrationState.UNKNOWN)
-        else:
-            self.props['m3gpp-operator-name'] = Variant('s', '')
-            self.props['m3gpp-operator-code'] = Variant('s', '')
-            self.props['signal-quality'] = Variant('(ub)', [0, True])
-            self.props['state'] = Variant('u', ModemManagerState.ENABLED)
+    def set_props(self):
+        sources = [('org.freedesktop.ModemManager1.Modem', self.mm_modem.props)]
+        if self.mm_modem.mm_modem3gpp_interface:
+            sources.append(('org.freedesktop.ModemManager1.Modem.Modem3gpp', self.mm_modem.mm_modem3gpp_interface.props))
 
-        if 'org.ofono.NetworkRegistration' in self.ofono_interface_props and self.props['state'].value == 7:
-            if "Technology" in self.ofono_interface_props['org.ofono.NetworkRegistration']:
-                current_tech = 0
-                if self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "nr":
-                    current_tech |= 1 << ModemManagerAccessTechnology._5GNR
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "lte":
-                    current_tech |= 1 << ModemManagerAccessTechnology.LTE
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "umts" or self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "hspa" or self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "hsdpa" or self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "hsupa":
-                    current_tech |= 1 << ModemManagerAccessTechnology.UMTS
-                elif self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "gsm" or self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "edge" or self.ofono_interface_props['org.ofono.NetworkRegistration']["Technology"].value == "gprs":
-                    current_tech |= 1 << ModemManagerAccessTechnology.GSM
-
-                self.props['access-technologies'] = Variant('u', current_tech)
-            else:
-                self.props['access-technologies'] = Variant('u', ModemManagerAccessTechnology.UNKNOWN)
-        else:
-            self.props['access-technologies'] = Variant('u', ModemManagerAccessTechnology.UNKNOWN)
+        for iface, props in sources:
+            for (status_iface, name) in STATUS_PROPS:
+                if status_iface == iface:
+                    self.mm_state_changed(iface, name, getattr(props, name))
 
     @method()
     async def Connect(self, properties: 'a{sv}') -> 'o':
-        try:
-            await self.props()
-        except Exception as e:
-            pass
-
         for b in self.mm_modem.bearers:
             if self.mm_modem.bearers[b].props['Properties'].value['apn'] == properties['apn']:
-                await self.mm_modem.bearers[b].add_auth_ofono(properties['username'].value if 'username' in properties else '',
-                                                                properties['password'].value if 'password' in properties else '')
+                await self.mm_modem.bearers[b].add_auth_ofono(properties['username'].value if 'username' in properties else None,
+                                                              properties['password'].value if 'password' in properties else None)
                 self.mm_modem.bearers[b].props['Properties'] = Variant('a{sv}', properties)
                 await self.mm_modem.bearers[b].doConnect()
                 return b
@@ -109,8 +69,10 @@ class MMModemSimpleInterface(ServiceInterface):
         try:
             bearer = await self.mm_modem.doCreateBearer(properties)
             await self.mm_modem.bearers[bearer].doConnect()
+        except DBusError:
+            raise
         except Exception as e:
-            bearer = f'/org/freedesktop/ModemManager/Bearer/0'
+            bearer = f'/org/freedesktop/ModemManager1/Bearer/0'
 
         return bearer
 
@@ -130,5 +92,4 @@ class MMModemSimpleInterface(ServiceInterface):
 
     @method()
     async def GetStatus(self) -> 'a{sv}':
-        await self.set_props()
         return self.props
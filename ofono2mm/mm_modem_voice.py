@@ -5,40 +5,49 @@ from dbus_next import Variant
 from ofono2mm.mm_call import MMCallInterface
 from ofono2mm.mm_types import ModemManagerCallState
 
-import time
+import asyncio
 
 call_i = 1
 
 class MMModemVoiceInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props):
+    def __init__(self, index, bus, ofono_client, ofono_state):
         super().__init__('org.freedesktop.ModemManager1.Modem.Voice')
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
         self.props = {
             'Calls': Variant('ao', []),
             'EmergencyOnly': Variant('b', False),
         }
 
-    def set_props(self):
-        old_props = self.props
+        self.ofono_state.subscribe('org.ofono.SimManager', 'FixedDialing', self.ofono_state_changed)
 
-        for prop in self.props:
-            if self.props[prop].value != old_props[prop].value:
-                self.emit_properties_changed({prop: self.props[prop].value})
+    def set_props(self):
+        old_props = self.props.copy()
 
-    async def init_calls(self):
         if 'org.ofono.SimManager' in self.ofono_interfaces and 'FixedDialing' in self.ofono_interface_props['org.ofono.SimManager']:
             self.props['EmergencyOnly'] = Variant('b', self.ofono_interface_props['org.ofono.SimManager']['FixedDialing'].value)
         else:
             self.props['EmergencyOnly'] = Variant('b', False)
 
+        changed_props = {}
+        for prop in self.props:
+            if self.props[prop].value != old_props[prop].value:
+                changed_props.update({ prop: self.props[prop].value })
+
+        if changed_props:
+            self.emit_properties_changed(changed_props)
+
+    async def init_calls(self):
+        self.set_props()
+
         if 'org.ofono.VoiceCallManager' in self.ofono_interfaces:
             self.ofono_interfaces['org.ofono.VoiceCallManager'].on_call_added(self.add_call)
 
@@ -49,12 +58,9 @@ class MMModemVoiceInterface(ServiceInterface):
         if props['State'].value == 'incoming':
             global call_i
 
-            if 'org.ofono.SimManager' in self.ofono_interfaces and 'FixedDialing' in self.ofono_interface_props['org.ofono.SimManager']:
-                self.props['EmergencyOnly'] = Variant('b', self.ofono_interface_props['org.ofono.SimManager']['FixedDialing'].value)
-            else:
-                self.props['EmergencyOnly'] = Variant('b', False)
+            self.set_props()
 
-            mm_call_interface = MMCallInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+            mm_call_interface = MMCallInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
             mm_call_interface.props.update({
                 'State': Variant('u', ModemManagerCallState.RINGING_IN),
                 'StateReason': Variant('u', 2), # incoming new MM_CALL_STATE_REASON_INCOMING_NEW
@@ -73,6 +79,7 @@ class MMModemVoiceInterface(ServiceInterface):
     async def remove_call(self, path):
         global call_i
 
+        self.ofono_client.evict(path)
         call_i -= 1
 
         try:
@@ -83,14 +90,11 @@ class MMModemVoiceInterface(ServiceInterface):
         except Exception as e:
             pass
 
-        if 'org.ofono.SimManager' in self.ofono_interfaces and 'FixedDialing' in self.ofono_interface_props['org.ofono.SimManager']:
-            self.props['EmergencyOnly'] = Variant('b', self.ofono_interface_props['org.ofono.SimManager']['FixedDialing'].value)
-        else:
-            self.props['EmergencyOnly'] = Variant('b', False)
+        self.set_props()
 
         # print(f"call deleted: {path}")
         if 'org.ofono.ConnectionManager' in self.ofono_interfaces:
-            contexts = await self.ofono_interfaces['org.ofono.ConnectionManager'].call_get_contexts()
+            contexts = list(self.ofono_state.contexts.items())
             self.context_names = []
             ctx_idx = 0
             chosen_apn = None
@@ -109,7 +113,7 @@ class MMModemVoiceInterface(ServiceInterface):
                     # print(f'activate context on apn {chosen_apn}')
                     chosen_ctx_interface = self.ofono_client["ofono_context"][chosen_ctx_path]['org.ofono.ConnectionContext']
                     # on some carriers context does not get reactivated after a call automatically, lets do it ourselves just in case
-                    time.sleep(2) # wait a bit for the call to end
+                    await asyncio.sleep(2) # wait a bit for the call to end
                     try:
                         await chosen_ctx_interface.call_set_property("Active", Variant('b', True))
                     except Exception as e:
@@ -128,21 +132,15 @@ class MMModemVoiceInterface(ServiceInterface):
             self.emit_properties_changed({'Calls': self.props['Calls'].value})
             self.CallDeleted(path)
 
-            if 'org.ofono.SimManager' in self.ofono_interfaces and 'FixedDialing' in self.ofono_interface_props['org.ofono.SimManager']:
-                self.props['EmergencyOnly'] = Variant('b', self.ofono_interface_props['org.ofono.SimManager']['FixedDialing'].value)
-            else:
-                self.props['EmergencyOnly'] = Variant('b', False)
+            self.set_props()
 
     @method()
     async def CreateCall(self, properties: 'a{sv}') -> 'o':
         global call_i
 
-        if 'org.ofono.SimManager' in self.ofono_interfaces and 'FixedDialing' in self.ofono_interface_props['org.ofono.SimManager']:
-            self.props['EmergencyOnly'] = Variant('b', self.ofono_interface_props['org.ofono.SimManager']['FixedDialing'].value)
-        else:
-            self.props['EmergencyOnly'] = Variant('b', False)
+        self.set_props()
 
-        mm_call_interface = MMCallInterface(self.index, self.bus, self.ofono_client, self.modem_name, self.ofono_modem, self.ofono_props, self.ofono_interfaces, self.ofono_interface_props)
+        mm_call_interface = MMCallInterface(self.index, self.bus, self.ofono_client, self.ofono_state)
         mm_call_interface.props.update({
             'State': Variant('u', ModemManagerCallState.RINGING_OUT),
             'StateReason': Variant('u', 0), # outgoing started MM_CALL_STATE_REASON_UNKNOWN
@@ -202,14 +200,5 @@ class MMModemVoiceInterface(ServiceInterface):
     def EmergencyOnly(self) -> 'b':
         return self.props['EmergencyOnly'].value
 
-    def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
+    def ofono_state_changed(self, iface, name, value):
         self.set_props()
-
-    def ofono_interface_changed(self, iface):
-        def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-            self.set_props()
-
-        return ch
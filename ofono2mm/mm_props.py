@@ -0,0 +1,83 @@
+from dbus_next import Variant
+
+import sys
+
+def intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class Props:
+    """
+    The properties of a ModemManager interface, as raw values.
+
+    Subclasses list their properties and D-Bus signatures in SIGNATURES
+    and are slotted, so an instance only holds one reference per
+    property. dbus_next marshals raw values for property getters and
+    PropertiesChanged. Variants are only built when a caller needs them,
+    e.g. for a{sv} replies. Strings are interned on every assignment.
+
+    Usage:
+
+    class ModemProps(Props):
+        SIGNATURES = {'State': 'i', 'Model': 's'}
+        __slots__ = tuple(SIGNATURES)
+
+    props = ModemProps(State=0, Model='')
+    old_props = props.snapshot()
+    props.State = 8
+    props.changed(old_props) # {'State': 8}
+
+    props['State'] and props['State'] = Variant('i', 8) are still
+    understood, for code that handles Variants.
+    """
+
+    __slots__ = ()
+    SIGNATURES = {}
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.pop(name))
+
+        if values:
+            raise TypeError(f"{type(self).__name__} has no {', '.join(values)} properties")
+
+    def snapshot(self, names=None):
+        return {name: getattr(self, name) for name in (names if names is not None else self.__slots__)}
+
+    def changed(self, snapshot):
+        changed_props = {}
+        for name, old_value in snapshot.items():
+            value = getattr(self, name)
+            if value != old_value:
+                changed_props[name] = value
+        return changed_props
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, intern(value))
+
+    def set(self, name, value):
+        setattr(self, name, value)
+
+    def variant(self, name):
+        return Variant(self.SIGNATURES[name], getattr(self, name))
+
+    def variants(self):
+        return {name: self.variant(name) for name in self.__slots__}
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __contains__(self, name):
+        return name in self.SIGNATURES
+
+    def __getitem__(self, name):
+        if name not in self.SIGNATURES:
+            raise KeyError(name)
+        return self.variant(name)
+
+    def __setitem__(self, name, variant):
+        if name not in self.SIGNATURES:
+            raise KeyError(name)
+        self.set(name, variant.value)
+
+    def get(self, name, default=None):
+        return self.variant(name) if name in self.SIGNATURES else default
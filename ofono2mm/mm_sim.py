@@ -1,57 +1,80 @@
 from dbus_next.service import (ServiceInterface,
                                method, dbus_property)
 from dbus_next.constants import PropertyAccess
-from dbus_next import Variant, DBusError
+from dbus_next import DBusError
 
 from ofono2mm.mm_types import ModemManagerSimRemovability
+from ofono2mm.mm_props import Props
+
+class SimProps(Props):
+    SIGNATURES = {
+        'Active': 'b',
+        'SimIdentifier': 's',
+        'Imsi': 's',
+        'Eid': 's',
+        'OperatorIdentifier': 's',
+        'OperatorName': 's',
+        'EmergencyNumbers': 'as',
+        'PreferredNetworks': 'a(su)',
+        'Gid1': 'ay',
+        'Gid2': 'ay',
+        'SimType': 'u',
+        'EsimStatus': 'u',
+        'Removability': 'u',
+    }
+    __slots__ = tuple(SIGNATURES)
 
 class MMSimInterface(ServiceInterface):
-    def __init__(self, index, bus, ofono_client, modem_name, ofono_modem, ofono_props, ofono_interfaces, ofono_interface_props):
+    def __init__(self, index, bus, ofono_client, ofono_state):
         super().__init__('org.freedesktop.ModemManager1.Sim')
         self.index = index
         self.bus = bus
         self.ofono_client = ofono_client
-        self.ofono_proxy = self.ofono_client["ofono_modem"][modem_name]
-        self.modem_name = modem_name
-        self.ofono_modem = ofono_modem
-        self.ofono_props = ofono_props
-        self.ofono_interfaces = ofono_interfaces
-        self.ofono_interface_props = ofono_interface_props
-        self.props = {
-            'Active': Variant('b', True),
-            'SimIdentifier': Variant('s', ''),
-            'Imsi': Variant('s', '0'),
-            'Eid': Variant('s', ''),
-            'OperatorIdentifier': Variant('s', '0'),
-            'OperatorName': Variant('s', ''),
-            'EmergencyNumbers': Variant('as', []),
-            'PreferredNetworks': Variant('a(su)', []),
-            'Gid1': Variant('ay', bytes()),
-            'Gid2': Variant('ay', bytes()),
-            'SimType': Variant('u', 1), # hardcoded value physical MM_SIM_TYPE_PHYSICAL
-            'EsimStatus': Variant('u', 0), # hardcoded value unknown MM_SIM_ESIM_STATUS_UNKNOWN
-            'Removability': Variant('u', ModemManagerSimRemovability.REMOVABLE)
-        }
+        self.ofono_state = ofono_state
+        self.ofono_proxy = ofono_state.ofono_proxy
+        self.modem_name = ofono_state.modem_name
+        self.ofono_modem = ofono_state.ofono_modem
+        self.ofono_props = ofono_state.props
+        self.ofono_interfaces = ofono_state.interfaces
+        self.ofono_interface_props = ofono_state.interface_props
+        self.props = SimProps(
+            Active=True,
+            SimIdentifier='',
+            Imsi='0',
+            Eid='',
+            OperatorIdentifier='0',
+            OperatorName='',
+            EmergencyNumbers=[],
+            PreferredNetworks=[],
+            Gid1=bytes(),
+            Gid2=bytes(),
+            SimType=1, # hardcoded value physical MM_SIM_TYPE_PHYSICAL
+            EsimStatus=0, # hardcoded value unknown MM_SIM_ESIM_STATUS_UNKNOWN
+            Removability=ModemManagerSimRemovability.REMOVABLE,
+        )
+
+        self.ofono_state.subscribe('org.ofono.SimManager', None, self.ofono_state_changed)
+        self.ofono_state.subscribe('org.ofono.VoiceCallManager', 'EmergencyNumbers', self.ofono_state_changed)
 
     def set_props(self):
-        old_props = self.props
+        old_props = self.props.snapshot()
 
         if 'org.ofono.SimManager' in self.ofono_interface_props:
             if 'Present' in self.ofono_interface_props['org.ofono.SimManager']:
                 if self.ofono_interface_props['org.ofono.SimManager']:
-                    self.props['Active'] = Variant('b', True)
+                    self.props.Active = True
                 else:
-                    self.props['Active'] = Variant('b', False)
+                    self.props.Active = False
             else:
-                self.props['Active'] = Variant('b', False)
+                self.props.Active = False
             if 'CardIdentifier' in self.ofono_interface_props['org.ofono.SimManager']:
-                self.props['SimIdentifier'] = Variant('s', self.ofono_interface_props['org.ofono.SimManager']['CardIdentifier'].value)
+                self.props.SimIdentifier = self.ofono_interface_props['org.ofono.SimManager']['CardIdentifier'].value
             else:
-                self.props['SimIdentifier'] = Variant('s', '')
+                self.props.SimIdentifier = ''
             if 'SubscriberIdentity' in self.ofono_interface_props['org.ofono.SimManager']:
-                self.props['Imsi'] = Variant('s', self.ofono_interface_props['org.ofono.SimManager']['SubscriberIdentity'].value)
+                self.props.Imsi = self.ofono_interface_props['org.ofono.SimManager']['SubscriberIdentity'].value
             else:
-                self.props['Imsi'] = Variant('s', '')
+                self.props.Imsi = ''
 
             
             if 'MobileCountryCode' in self.ofono_interface_props['org.ofono.SimManager']:
@@ -64,21 +87,21 @@ class MMSimInterface(ServiceInterface):
             else:
                 MNC = ''
 
-            self.props['OperatorIdentifier'] = Variant('s', f"{MCC}{MNC}" if MCC != '' else '')
-            self.props['PreferredNetworks'] = Variant('a(su)', [[f"{MCC}{MNC}", 19]])
+            self.props.OperatorIdentifier = f"{MCC}{MNC}" if MCC != '' else ''
+            self.props.PreferredNetworks = [[f"{MCC}{MNC}", 19]]
         else:
-            self.props['Active'] = Variant('b', False)
-            self.props['SimIdentifier'] = Variant('s', '')
-            self.props['Imsi'] = Variant('s', '')
-            self.props['OperatorIdentifier'] = Variant('s', '')
-            self.props['PreferredNetworks'] = Variant('a(su)', [])
+            self.props.Active = False
+            self.props.SimIdentifier = ''
+            self.props.Imsi = ''
+            self.props.OperatorIdentifier = ''
+            self.props.PreferredNetworks = []
 
         if 'org.ofono.VoiceCallManager' in self.ofono_interface_props:
-            self.props['EmergencyNumbers'] = Variant('as', self.ofono_interface_props['org.ofono.VoiceCallManager']['EmergencyNumbers'].value if 'EmergencyNumbers' in self.ofono_interface_props['org.ofono.VoiceCallManager'] else [])
+            self.props.EmergencyNumbers = self.ofono_interface_props['org.ofono.VoiceCallManager']['EmergencyNumbers'].value if 'EmergencyNumbers' in self.ofono_interface_props['org.ofono.VoiceCallManager'] else []
 
-        for prop in self.props:
-            if self.props[prop].value != old_props[prop].value:
-                self.emit_properties_changed({prop: self.props[prop].value})
+        changed_props = self.props.changed(old_props)
+        if changed_props:
+            self.emit_properties_changed(changed_props)
 
     @method()
     async def SendPin(self, pin: 's'):
@@ -109,65 +132,55 @@ class MMSimInterface(ServiceInterface):
 
     @dbus_property(access=PropertyAccess.READ)
     def Active(self) -> 'b':
-        return self.props['Active'].value
+        return self.props.Active
 
     @dbus_property(access=PropertyAccess.READ)
     def SimIdentifier(self) -> 's':
-        return self.props['SimIdentifier'].value
+        return self.props.SimIdentifier
 
     @dbus_property(access=PropertyAccess.READ)
     def Imsi(self) -> 's':
-        return self.props['Imsi'].value
+        return self.props.Imsi
 
     @dbus_property(access=PropertyAccess.READ)
     def Eid(self) -> 's':
-        return self.props['Eid'].value
+        return self.props.Eid
 
     @dbus_property(access=PropertyAccess.READ)
     def OperatorIdentifier(self) -> 's':
-        return self.props['OperatorIdentifier'].value
+        return self.props.OperatorIdentifier
 
     @dbus_property(access=PropertyAccess.READ)
     def OperatorName(self) -> 's':
-        return self.props['OperatorName'].value
+        return self.props.OperatorName
 
     @dbus_property(access=PropertyAccess.READ)
     def EmergencyNumbers(self) -> 'as':
-        return self.props['EmergencyNumbers'].value
+        return self.props.EmergencyNumbers
 
     @dbus_property(access=PropertyAccess.READ)
     def PreferredNetworks(self) -> 'a(su)':
-        return self.props['PreferredNetworks'].value
+        return self.props.PreferredNetworks
 
     @dbus_property(access=PropertyAccess.READ)
     def Gid1(self) -> 'ay':
-        return self.props['Gid1'].value
+        return self.props.Gid1
 
     @dbus_property(access=PropertyAccess.READ)
     def Gid2(self) -> 'ay':
-        return self.props['Gid2'].value
+        return self.props.Gid2
 
     @dbus_property(access=PropertyAccess.READ)
     def SimType(self) -> 'u':
-        return self.props['SimType'].value
+        return self.props.SimType
 
     @dbus_property(access=PropertyAccess.READ)
     def EsimStatus(self) -> 'u':
-        return self.props['EsimStatus'].value
+        return self.props.EsimStatus
 
     @dbus_property(access=PropertyAccess.READ)
     def Removability(self) -> 'u':
-        return self.props['Removability'].value
+        return self.props.Removability
 
-    def ofono_changed(self, name, varval):
-        self.ofono_props[name] = varval
+    def ofono_state_changed(self, iface, name, value):
         self.set_props()
-
-    def ofono_interface_changed(self, iface):
-        def ch(name, varval):
-            if iface in self.ofono_interface_props:
-                self.ofono_interface_props[iface][name] = varval
-
-            self.set_props()
-
-        return ch
@@ -251,6 +251,15 @@ class ModemManager3gppRegistrationState:
     ROAMING_CSFB_NOT_PREFERRED = 10
     ATTACHED_RLOS              = 11
 
+OFONO_REGISTRATION_STATES = {
+    "unregistered": ModemManager3gppRegistrationState.IDLE,
+    "registered": ModemManager3gppRegistrationState.HOME,
+    "searching": ModemManager3gppRegistrationState.SEARCHING,
+    "denied": ModemManager3gppRegistrationState.DENIED,
+    "unknown": ModemManager3gppRegistrationState.UNKNOWN,
+    "roaming": ModemManager3gppRegistrationState.ROAMING
+}
+
 class ModemManager3gppFacility:
     NONE          = 0
     SIM           = 1 << 0
@@ -279,7 +288,7 @@ class ModemManagerCallState:
     TERMINATED    = 7
 
 class ModemManagerPowerState:
-    UNKNOWN = 0,
-    OFF     = 1,
-    LOW     = 2,
+    UNKNOWN = 0
+    OFF     = 1
+    LOW     = 2
     ON      = 3
@@ -0,0 +1,140 @@
+from dbus_next.aio import MessageBus
+from dbus_next.service import ServiceInterface
+from dbus_next import Message
+
+from ofono2mm.instrumentation import Instrumentation, TimedReply
+from ofono2mm.logger import Logger
+
+class ObjectManagerBus(MessageBus):
+    """
+    A message bus exposing org.freedesktop.DBus.ObjectManager on
+    /org/freedesktop/ModemManager1, as ModemManager does.
+
+    dbus_next already answers GetManagedObjects with every object exported
+    below the requested path, but it emits InterfacesAdded and
+    InterfacesRemoved from the object itself. ModemManager clients only
+    listen to the manager object, so emit them from there instead.
+
+    PropertiesChanged signals are coalesced, as GDBus does for
+    ModemManager: changes to an interface are held for coalesce_window
+    seconds, or one main loop iteration when 0, and sent as one signal.
+    None sends them right away.
+
+    When instrumentation is enabled, exported methods are timed and
+    emitted signals counted.
+    """
+
+    manager_path = '/org/freedesktop/ModemManager1'
+    coalesce_window = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_properties = {}
+        self.flush_handle = None
+
+    def is_managed(self, path):
+        return path.startswith(f'{self.manager_path}/')
+
+    def _emit_interface_added(self, path, interface):
+        if self._disconnected or not self.is_managed(path):
+            return
+
+        def get_properties_callback(interface, result, user_data, e):
+            if e is not None:
+                Logger.warning("InterfacesAdded for %s on %s is missing properties: %s", interface.name, path, e)
+
+            self.send(Message.new_signal(path=self.manager_path,
+                                         interface='org.freedesktop.DBus.ObjectManager',
+                                         member='InterfacesAdded',
+                                         signature='oa{sa{sv}}',
+                                         body=[path, {interface.name: result}]))
+
+        ServiceInterface._get_all_property_values(interface, get_properties_callback)
+
+    def _emit_interface_removed(self, path, removed_interfaces):
+        if self._disconnected or not self.is_managed(path) or not removed_interfaces:
+            return
+
+        self.send(Message.new_signal(path=self.manager_path,
+                                     interface='org.freedesktop.DBus.ObjectManager',
+                                     member='InterfacesRemoved',
+                                     signature='oas',
+                                     body=[path, removed_interfaces]))
+
+    def _make_method_handler(self, interface, method):
+        handler = super()._make_method_handler(interface, method)
+        if not Instrumentation.ENABLED:
+            return handler
+
+        name = f'{interface.name}.{method.name}'
+
+        def timed_handler(msg, send_reply):
+            timed_reply = TimedReply(send_reply, name)
+            try:
+                return handler(msg, timed_reply)
+            except Exception:
+                # Synchronous methods raise through, the caller replies
+                timed_reply.observe()
+                raise
+
+        return timed_handler
+
+    def _interface_signal_notify(self, interface, interface_name, member, signature, body, unix_fds=[]):
+        if self.coalesce_window is not None and interface_name == 'org.freedesktop.DBus.Properties' and \
+           member == 'PropertiesChanged':
+            self.queue_properties_changed(interface, body)
+            return
+
+        self.send_interface_signal(interface, interface_name, member, signature, body, unix_fds)
+
+    def send_interface_signal(self, interface, interface_name, member, signature, body, unix_fds=[]):
+        if Instrumentation.ENABLED:
+            Instrumentation.get_default().count('emitted', f'{interface.name}.{member}')
+
+        super()._interface_signal_notify(interface, interface_name, member, signature, body, unix_fds)
+
+    def queue_properties_changed(self, interface, body):
+        name, changed, invalidated = body
+
+        if interface not in self.pending_properties:
+            self.pending_properties[interface] = [name, dict(changed), list(invalidated)]
+        else:
+            pending = self.pending_properties[interface]
+            for prop in changed:
+                if prop in pending[2]:
+                    pending[2].remove(prop)
+            for prop in invalidated:
+                pending[1].pop(prop, None)
+                if prop not in pending[2]:
+                    pending[2].append(prop)
+            pending[1].update(changed)
+
+            if Instrumentation.ENABLED:
+                Instrumentation.get_default().count('coalesced', f'{interface.name}.PropertiesChanged')
+
+        if self.flush_handle is None:
+            if self.coalesce_window > 0:
+                self.flush_handle = self._loop.call_later(self.coalesce_window, self.flush_properties_changed)
+            else:
+                self.flush_handle = self._loop.call_soon(self.flush_properties_changed)
+
+    def unexport(self, path, interface=None):
+        super().unexport(path, interface)
+
+        # Changes of an interface that is no longer exported are dropped
+        # here, so flushing does not have to look them up
+        for pending in [pending for pending in self.pending_properties
+                        if self not in ServiceInterface._get_buses(pending)]:
+            del self.pending_properties[pending]
+
+    def flush_properties_changed(self):
+        pending_properties = self.pending_properties
+        self.pending_properties = {}
+        self.flush_handle = None
+
+        if self._disconnected:
+            return
+
+        for interface, body in pending_properties.items():
+            self.send_interface_signal(interface, 'org.freedesktop.DBus.Properties',
+                                       'PropertiesChanged', 'sa{sv}as', body)
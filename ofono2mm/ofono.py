@@ -2,8 +2,55 @@ from dbus_next.service import (ServiceInterface,
                                method, dbus_property, signal)
 from dbus_next.constants import PropertyAccess
 from dbus_next import Variant, DBusError, BusType
+from dbus_next import introspection as intr
+from dbus_next.proxy_object import BaseProxyInterface
+
+from ofono2mm.logger import Logger
+
+from collections import OrderedDict
 
 import asyncio
+import json
+import os
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Format of the introspection cache file, caches of another one are dropped
+SERIALIZED_NODES_VERSION = 1
+
+def node_to_json(node):
+    return {
+        'name': node.name,
+        'is_root': node.is_root,
+        'interfaces': [{
+            'name': interface.name,
+            'methods': [[method.name,
+                         [[arg.signature, arg.name] for arg in method.in_args],
+                         [[arg.signature, arg.name] for arg in method.out_args]]
+                        for method in interface.methods],
+            'signals': [[signal.name, [[arg.signature, arg.name] for arg in signal.args]]
+                        for signal in interface.signals],
+            'properties': [[prop.name, prop.signature, prop.access.value]
+                           for prop in interface.properties],
+        } for interface in node.interfaces],
+        'nodes': [node_to_json(child) for child in node.nodes],
+    }
+
+def node_from_json(data):
+    node = intr.Node(data['name'], [
+        intr.Interface(interface['name'],
+                       [intr.Method(name,
+                                    [intr.Arg(signature, intr.ArgDirection.IN, arg_name) for signature, arg_name in in_args],
+                                    [intr.Arg(signature, intr.ArgDirection.OUT, arg_name) for signature, arg_name in out_args])
+                        for name, in_args, out_args in interface['methods']],
+                       [intr.Signal(name, [intr.Arg(signature, intr.ArgDirection.OUT, arg_name) for signature, arg_name in args])
+                        for name, args in interface['signals']],
+                       [intr.Property(name, signature, PropertyAccess(access))
+                        for name, signature, access in interface['properties']])
+        for interface in data['interfaces']
+    ], data['is_root'])
+    node.nodes = [node_from_json(child) for child in data['nodes']]
+    return node
 
 class ObjectProxy:
     def __init__(self, parent, getter, getter_args):
@@ -31,6 +78,18 @@ class CachedClient:
     bus_name = None
     introspections = None
 
+    # Maximum number of object proxies kept around
+    max_proxies = 256
+
+    # Parsed introspection nodes, shared by every client and proxy object
+    nodes = {}
+
+    # Optional file keeping the parsed nodes across restarts
+    serialized_nodes = None
+
+    # Callables run with (path, interface) on every new proxy interface
+    interface_hooks = []
+
     def __init__(self, bus):
         """
         Initialises the class.
@@ -42,27 +101,165 @@ class CachedClient:
         assert self.introspections is not None
 
         self.bus = bus
-        self.cache = {}
+        self.proxies = OrderedDict()
+        self.interfaces = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
 
         # Load introspections
+        self.introspection_nodes = {}
         for introspection, path in self.introspections.items():
+            self.introspection_nodes[introspection] = CachedClient.get_node(path)
+
+    @staticmethod
+    def get_node(path):
+        """
+        Returns the parsed introspection node for the given XML file.
+
+        Parsing is done once per file, dbus_next would otherwise parse
+        the XML again for every proxy object we create.
+
+        :param: path: the introspection XML file.
+        """
+
+        if path not in CachedClient.nodes:
+            CachedClient.load_serialized_nodes()
+
+        if path not in CachedClient.nodes:
             with open(path, "r") as f:
-                self.cache[hash(introspection)] = f.read()
+                CachedClient.nodes[path] = intr.Node.parse(f.read())
+            CachedClient.save_serialized_nodes()
 
-    def get_interface(self, introspection, path, interface):
-        path_hashed = hash(path)
-        interface_hashed = hash(path + interface)
+        return CachedClient.nodes[path]
+
+    @staticmethod
+    def load_serialized_nodes():
+        if CachedClient.serialized_nodes is None or CachedClient.nodes:
+            return
 
-        if not interface_hashed in self.cache:
-            if not path_hashed in self.cache:
-                self.cache[path_hashed] = self.bus.get_proxy_object(self.bus_name, path, self.cache[hash(introspection)])
+        # Plain data, the file is not trusted to hold code
+        try:
+            with open(CachedClient.serialized_nodes, "r") as f:
+                data = json.load(f)
+            if data.get('version') != SERIALIZED_NODES_VERSION:
+                return
+            mtimes = data['mtimes']
+            nodes = {path: node_from_json(node) for path, node in data['nodes'].items()}
+        except Exception:
+            return
 
+        # Drop the cache as soon as one XML file changed on disk
+        for path, mtime in mtimes.items():
             try:
-                self.cache[interface_hashed] = self.cache[path_hashed].get_interface(interface)
-            except Exception as e:
-                self.cache[interface_hashed] = None  # skip over org.ofono.IpMultimediaSystem
+                if os.stat(path).st_mtime != mtime:
+                    return
+            except OSError:
+                return
+
+        CachedClient.nodes.update(nodes)
+
+    @staticmethod
+    def save_serialized_nodes():
+        if CachedClient.serialized_nodes is None:
+            return
+
+        try:
+            mtimes = {path: os.stat(path).st_mtime for path in CachedClient.nodes}
+            with open(CachedClient.serialized_nodes, "w") as f:
+                json.dump({
+                    'version': SERIALIZED_NODES_VERSION,
+                    'mtimes': mtimes,
+                    'nodes': {path: node_to_json(node) for path, node in CachedClient.nodes.items()},
+                }, f)
+        except Exception as e:
+            Logger.warning("Can't save introspection cache: %s", e)
+
+    def get_interface(self, introspection, path, interface):
+        key = (path, interface)
+
+        if key in self.interfaces:
+            self.stats['hits'] += 1
+            self.proxies.move_to_end(path)
+            return self.interfaces[key]
+
+        self.stats['misses'] += 1
+
+        if path not in self.proxies:
+            self.proxies[path] = self.bus.get_proxy_object(self.bus_name, path, self.introspection_nodes[introspection])
+            self.evict_unused()
+        else:
+            self.proxies.move_to_end(path)
+
+        try:
+            self.interfaces[key] = self.proxies[path].get_interface(interface)
+        except Exception as e:
+            self.interfaces[key] = None  # skip over org.ofono.IpMultimediaSystem
+        else:
+            for hook in self.interface_hooks:
+                hook(path, self.interfaces[key])
+
+        return self.interfaces[key]
+
+    def get_path_interfaces(self, path):
+        return [
+            key for key in self.interfaces
+            if key[0] == path
+        ]
+
+    def has_signal_handlers(self, path):
+        for key in self.get_path_interfaces(path):
+            if self.interfaces[key] is not None and self.interfaces[key]._signal_handlers:
+                return True
+
+        return False
+
+    def drop(self, path):
+        for key in self.get_path_interfaces(path):
+            interface = self.interfaces.pop(key)
+            if interface is None:
+                continue
+
+            # Unsubscribing the last handler also drops the match rule
+            for name, handlers in list(interface._signal_handlers.items()):
+                off_signal = getattr(interface, f'off_{BaseProxyInterface._to_snake_case(name)}')
+                for handler in list(handlers):
+                    off_signal(handler)
+
+        self.proxies.pop(path, None)
+        self.stats['evictions'] += 1
+
+    def evict_unused(self):
+        """
+        Keeps at most max_proxies object proxies, dropping the least
+        recently used ones. Proxies we still listen to are kept, they go
+        away with evict() once oFono removes the object.
+        """
+
+        if len(self.proxies) <= self.max_proxies:
+            return
+
+        for path in list(self.proxies):
+            if len(self.proxies) <= self.max_proxies:
+                break
+            if not self.has_signal_handlers(path):
+                self.drop(path)
+
+    def evict(self, path):
+        """
+        Drops the proxies of a removed object and of every object below it,
+        unsubscribing their signal handlers.
+
+        :param: path: the removed object path.
+        """
+
+        for proxy_path in list(self.proxies):
+            if proxy_path == path or proxy_path.startswith(f'{path}/'):
+                self.drop(proxy_path)
 
-        return self.cache[interface_hashed]
+        Logger.debug("%s: evicted, cache stats: %s", path, self.stats)
 
     def __getitem__(self, introspection):
         """
@@ -73,7 +270,7 @@ class CachedClient:
             self,
             lambda proxy, *args: ObjectProxy(
                     self,
-                    CachedClient.get_interface,
+                    type(self).get_interface,
                     [introspection, args[-1]] # UGLY
             ),
             [introspection]
@@ -83,15 +280,16 @@ class Ofono(CachedClient):
 
     bus_name = "org.ofono"
     introspections = {
-        "ofono" : '/usr/lib/ofono2mm/ofono.xml',
-        'ofono_context' : '/usr/lib/ofono2mm/ofono_context.xml',
-        'ofono_modem' : '/usr/lib/ofono2mm/ofono_modem.xml',
-        'ofono_operator' : '/usr/lib/ofono2mm/ofono_operator.xml',
+        "ofono" : os.path.join(DATA_DIR, 'ofono.xml'),
+        'ofono_context' : os.path.join(DATA_DIR, 'ofono_context.xml'),
+        'ofono_modem' : os.path.join(DATA_DIR, 'ofono_modem.xml'),
+        'ofono_operator' : os.path.join(DATA_DIR, 'ofono_operator.xml'),
+        'ofono_cell' : os.path.join(DATA_DIR, 'ofono_cell.xml'),
     }
 
 class DBus(CachedClient):
 
     bus_name = "org.freedesktop.DBus"
     introspections = {
-        "dbus" : '/usr/lib/ofono2mm/dbus.xml',
+        "dbus" : os.path.join(DATA_DIR, 'dbus.xml'),
     }
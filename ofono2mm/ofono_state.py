@@ -0,0 +1,116 @@
+from dbus_next.service import ServiceInterface
+
+from ofono2mm.logger import Logger
+
+class OfonoModemState:
+    """
+    What is known of an oFono modem: its properties, its interfaces and
+    their properties.
+
+    There is one per modem, every ModemManager interface of the modem reads
+    it by reference, so they all see the same values.
+
+    Usage:
+
+    state = OfonoModemState(ofono_client, modem_name)
+    state.subscribe('org.ofono.NetworkRegistration', 'Strength', callback)
+    state.set_interface_prop('org.ofono.NetworkRegistration', 'Strength', Variant('y', 50))
+
+    Callbacks are called with (interface, name, value) once the state is
+    updated. Modem properties are published on 'org.ofono.Modem'. A name
+    of None subscribes to every property of the interface, interfaces
+    coming and going are published with a None name and their
+    properties, or None when removed.
+
+    ModemManager interfaces publish the properties they emit under their
+    own interface name, e.g. 'org.freedesktop.ModemManager1.Modem', for
+    the interfaces deriving from them, see PublishingInterface.
+    """
+
+    def __init__(self, ofono_client, modem_name):
+        self.ofono_client = ofono_client
+        self.modem_name = modem_name
+        self.ofono_proxy = ofono_client["ofono_modem"][modem_name]
+        self.ofono_modem = self.ofono_proxy['org.ofono.Modem']
+        self.props = {}
+        self.interfaces = {}
+        self.interface_props = {}
+        # Properties of the ConnectionManager contexts, by path
+        self.contexts = {}
+        self.subscribers = {}
+
+    def subscribe(self, iface, name, callback):
+        callbacks = self.subscribers.setdefault((iface, name), [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, iface, name, callback):
+        callbacks = self.subscribers.get((iface, name), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self.subscribers[(iface, name)]
+
+    def publish(self, iface, name, value):
+        if name is None:
+            keys = [key for key in self.subscribers if key[0] == iface]
+        else:
+            keys = [(iface, name), (iface, None)]
+
+        # A callback subscribed to several properties is only called once
+        callbacks = []
+        for key in keys:
+            for callback in self.subscribers.get(key, []):
+                if callback not in callbacks:
+                    callbacks.append(callback)
+
+        for callback in callbacks:
+            try:
+                callback(iface, name, value)
+            except Exception as e:
+                Logger.error("%s: %s.%s subscriber failed: %s", self.modem_name, iface, name, e)
+
+    def set_prop(self, name, value):
+        self.props[name] = value
+        self.publish('org.ofono.Modem', name, value)
+
+    def set_interface_prop(self, iface, name, value):
+        # Late signal of an interface that went away
+        if iface not in self.interface_props:
+            return
+
+        self.interface_props[iface][name] = value
+        self.publish(iface, name, value)
+
+    def set_interface_props(self, iface, props):
+        # Replaces what is known, interfaces without GetProperties have no
+        # entry until first set
+        if iface not in self.interfaces:
+            return
+
+        self.interface_props[iface] = props
+        self.publish(iface, None, props)
+
+    def add_interface(self, iface, interface, props):
+        self.interfaces[iface] = interface
+        self.interface_props[iface] = props
+        self.publish(iface, None, props)
+
+    def remove_interface(self, iface):
+        self.interfaces.pop(iface, None)
+        self.interface_props.pop(iface, None)
+        self.publish(iface, None, None)
+
+class PublishingInterface(ServiceInterface):
+    """
+    A ModemManager interface that publishes the properties it emits on
+    its modem's OfonoModemState, under its own interface name, for the
+    interfaces deriving from it. Subclasses set self.ofono_state.
+    """
+
+    def emit_properties_changed(self, changed_properties, invalidated_properties=[]):
+        super().emit_properties_changed(changed_properties, invalidated_properties)
+
+        # Let other interfaces of the modem derive from ours
+        for name, value in changed_properties.items():
+            self.ofono_state.publish(self.name, name, value)
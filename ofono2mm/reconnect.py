@@ -0,0 +1,132 @@
+from ofono2mm.instrumentation import Instrumentation
+from ofono2mm.utils import Backoff
+from ofono2mm.logger import Logger
+
+import asyncio
+import time
+
+# Changes after which a bearer that failed to connect is retried at once
+RECONNECT_EVENTS = (
+    ('org.ofono.ConnectionManager', 'Attached'),
+    ('org.ofono.NetworkRegistration', 'Status'),
+    ('org.ofono.NetworkRegistration', 'Technology'),
+)
+
+class ReconnectPolicy:
+    """
+    Connection attempts of a bearer, until its context is active.
+
+    Failed attempts are retried after an exponential backoff with jitter,
+    capped at maximum seconds. No attempt is made while ConnectionManager
+    is not attached, the wait goes on at the capped rate instead. Getting
+    attached, registered again or a technology change retries at once
+    with a fresh backoff. cancel() stops it, on Disconnect or when the
+    bearer goes away.
+
+    Usage:
+
+    policy = ReconnectPolicy(bearer)
+    policy.start()
+    await policy.connect()
+    policy.cancel()
+    """
+
+    # Delays between attempts, in seconds
+    initial = 1
+    maximum = 60
+
+    def __init__(self, bearer):
+        self.bearer = bearer
+        self.ofono_state = bearer.ofono_state
+        self.backoff = Backoff(initial=self.initial, maximum=self.maximum)
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.attempts = 0
+        self.failures = 0
+        self.last_error = ''
+        self.last_attempt = 0
+        self.next_attempt = 0
+
+    def running(self):
+        return self.task is not None
+
+    def start(self):
+        if self.task is None:
+            self.backoff.reset()
+            for iface, name in RECONNECT_EVENTS:
+                self.ofono_state.subscribe(iface, name, self.ofono_state_changed)
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def connect(self):
+        # Callers wait for the attempts in progress, not cancel them
+        task = self.start()
+        await asyncio.wait([task])
+        return not task.cancelled()
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.stopped()
+
+    def stopped(self):
+        self.task = None
+        self.next_attempt = 0
+        for iface, name in RECONNECT_EVENTS:
+            self.ofono_state.unsubscribe(iface, name, self.ofono_state_changed)
+
+    def attached(self):
+        connman_props = self.ofono_state.interface_props.get('org.ofono.ConnectionManager')
+        if connman_props is None:
+            return False
+        return connman_props['Attached'].value if 'Attached' in connman_props else True
+
+    def ofono_state_changed(self, iface, name, value):
+        if self.attached():
+            self.backoff.reset()
+            self.wakeup.set()
+
+    async def run(self):
+        while True:
+            # Events during the attempt count, they come before the wait
+            self.wakeup.clear()
+
+            if self.attached():
+                self.attempts += 1
+                self.last_attempt = time.time()
+                if Instrumentation.ENABLED:
+                    Instrumentation.get_default().count('reconnect', 'attempt')
+
+                try:
+                    await self.bearer.connect_context()
+                    break
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    if Instrumentation.ENABLED:
+                        Instrumentation.get_default().count('reconnect', 'failure')
+
+                delay = self.backoff.next()
+            else:
+                self.last_error = 'Not attached'
+                delay = self.maximum
+
+            self.next_attempt = time.time() + delay
+            Logger.debug("%s: %s, next attempt in %.1f s", self.bearer.modem_name, self.last_error, delay)
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+        self.stopped()
+
+    def stats(self):
+        return {
+            'running': self.running(),
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'last-error': self.last_error,
+            'last-attempt': self.last_attempt,
+            'next-attempt': self.next_attempt,
+        }
@@ -0,0 +1,327 @@
+from dbus_next.constants import MessageType
+from dbus_next.proxy_object import BaseProxyInterface
+from dbus_next._private.unmarshaller import Unmarshaller
+from dbus_next import Message, DBusError
+
+from ofono2mm.ofono import CachedClient
+from ofono2mm.logger import Logger
+
+from collections import deque
+from io import BytesIO
+
+import asyncio
+import struct
+import time
+
+MAGIC = b'O2MMREC1'
+
+# Record header: monotonic time since start, record kind, payload length
+HEADER = struct.Struct('<dBI')
+
+KIND_CALL = 1
+KIND_SIGNAL = 2
+
+class Recorder:
+    """
+    Appends every oFono call result and signal to a file.
+
+    Usage:
+
+    recorder = Recorder(path)
+    CachedClient.interface_hooks.append(recorder.hook_interface)
+
+    Each record is a HEADER followed by a marshalled D-Bus message: the
+    signal itself, or a method return/error carrying the call result
+    along with the called path, interface and member.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.start = time.monotonic()
+
+    def write(self, kind, msg):
+        payload = msg._marshall()
+        self.file.write(HEADER.pack(time.monotonic() - self.start, kind, len(payload)))
+        self.file.write(payload)
+        self.file.flush()
+
+    def record_call(self, bus_name, path, interface_name, intr_method, result):
+        if len(intr_method.out_args) == 0:
+            body = []
+        elif len(intr_method.out_args) == 1:
+            body = [result]
+        else:
+            body = result
+
+        self.write(KIND_CALL, Message(destination=bus_name,
+                                      path=path,
+                                      interface=interface_name,
+                                      member=intr_method.name,
+                                      message_type=MessageType.METHOD_RETURN,
+                                      reply_serial=1,
+                                      signature=intr_method.out_signature,
+                                      body=body))
+
+    def record_error(self, bus_name, path, interface_name, intr_method, error):
+        self.write(KIND_CALL, Message(destination=bus_name,
+                                      path=path,
+                                      interface=interface_name,
+                                      member=intr_method.name,
+                                      message_type=MessageType.ERROR,
+                                      error_name=error.type,
+                                      reply_serial=1,
+                                      signature='s',
+                                      body=[error.text]))
+
+    def record_signal(self, bus_name, msg):
+        self.write(KIND_SIGNAL, Message(destination=bus_name,
+                                        path=msg.path,
+                                        interface=msg.interface,
+                                        member=msg.member,
+                                        message_type=MessageType.SIGNAL,
+                                        signature=msg.signature,
+                                        body=msg.body))
+
+    def hook_interface(self, path, interface):
+        """
+        Records the calls and signals of an oFono proxy interface.
+
+        :param: path: the object path.
+        :param: interface: the dbus_next proxy interface.
+        """
+
+        bus_name = interface.bus_name
+        interface_name = interface.introspection.name
+
+        for intr_method in interface.introspection.methods:
+            method_name = f'call_{BaseProxyInterface._to_snake_case(intr_method.name)}'
+            setattr(interface, method_name, self.recorded_method(bus_name, path, interface_name,
+                                                                 intr_method, getattr(interface, method_name)))
+
+        message_handler = interface._message_handler
+
+        def recorded_message_handler(msg):
+            if msg.message_type == MessageType.SIGNAL and msg.path == path and \
+               msg.interface == interface_name and msg.member in interface._signal_handlers:
+                self.record_signal(bus_name, msg)
+
+            return message_handler(msg)
+
+        interface._message_handler = recorded_message_handler
+
+    def recorded_method(self, bus_name, path, interface_name, intr_method, method_fn):
+        async def recorded_method_fn(*args, **kwargs):
+            try:
+                result = await method_fn(*args, **kwargs)
+            except DBusError as e:
+                self.record_error(bus_name, path, interface_name, intr_method, e)
+                raise
+
+            self.record_call(bus_name, path, interface_name, intr_method, result)
+            return result
+
+        return recorded_method_fn
+
+def read_recording(path):
+    """
+    Returns the (time, kind, message) records of a recording.
+
+    A truncated last record, as left by a crash, is dropped.
+    """
+
+    records = []
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not an oFono recording')
+
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                break
+
+            timestamp, kind, length = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                break
+
+            records.append((timestamp, kind, Unmarshaller(BytesIO(payload)).unmarshall()))
+
+    return records
+
+class ReplayInterface:
+    """
+    Stands for a dbus_next proxy interface, answering calls and emitting
+    signals from a recording.
+    """
+
+    def __init__(self, player, bus_name, path, introspection):
+        self.player = player
+        self.bus_name = bus_name
+        self.path = path
+        self.introspection = introspection
+        self._signal_handlers = {}
+
+        self.methods = {
+            BaseProxyInterface._to_snake_case(intr_method.name): intr_method
+            for intr_method in introspection.methods
+        }
+        self.signals = {
+            BaseProxyInterface._to_snake_case(intr_signal.name): intr_signal
+            for intr_signal in introspection.signals
+        }
+
+    def __getattr__(self, name):
+        if name.startswith('call_') and name[5:] in self.methods:
+            return self.caller(self.methods[name[5:]])
+        if name.startswith('on_') and name[3:] in self.signals:
+            return lambda handler: self.on_signal(self.signals[name[3:]].name, handler)
+        if name.startswith('off_') and name[4:] in self.signals:
+            return lambda handler: self.off_signal(self.signals[name[4:]].name, handler)
+
+        raise AttributeError(name)
+
+    def caller(self, intr_method):
+        async def method_fn(*args, **kwargs):
+            msg = self.player.next_result(self.bus_name, self.path, self.introspection.name, intr_method.name)
+            if msg is None:
+                raise DBusError('org.ofono.Error.Failed', f'{intr_method.name} was not recorded')
+            if msg.message_type == MessageType.ERROR:
+                raise DBusError(msg.error_name, msg.body[0] if msg.body else '')
+
+            if len(intr_method.out_args) == 0:
+                return None
+            elif len(intr_method.out_args) == 1:
+                return msg.body[0]
+            else:
+                return msg.body
+
+        return method_fn
+
+    def on_signal(self, member, handler):
+        self._signal_handlers.setdefault(member, []).append(handler)
+        self.player.add_interface(self)
+
+    def off_signal(self, member, handler):
+        if handler in self._signal_handlers.get(member, []):
+            self._signal_handlers[member].remove(handler)
+            if not self._signal_handlers[member]:
+                del self._signal_handlers[member]
+
+    def emit(self, msg):
+        for handler in list(self._signal_handlers.get(msg.member, [])):
+            result = handler(*msg.body)
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result)
+
+class ReplayClient(CachedClient):
+    """
+    A CachedClient whose interfaces are fed by a Player instead of a bus.
+
+    Usage:
+
+    ofono_client = ReplayClient(Ofono, player)
+    """
+
+    def __init__(self, client_class, player):
+        self.bus_name = client_class.bus_name
+        self.introspections = client_class.introspections
+        self.player = player
+        super().__init__(None)
+
+    def get_interface(self, introspection, path, interface):
+        key = (path, interface)
+
+        if key not in self.interfaces:
+            self.stats['misses'] += 1
+            self.interfaces[key] = None
+            for intr_interface in self.introspection_nodes[introspection].interfaces:
+                if intr_interface.name == interface:
+                    self.interfaces[key] = ReplayInterface(self.player, self.bus_name, path, intr_interface)
+        else:
+            self.stats['hits'] += 1
+
+        return self.interfaces[key]
+
+    def evict(self, path):
+        for key in list(self.interfaces):
+            if key[0] == path or key[0].startswith(f'{path}/'):
+                interface = self.interfaces.pop(key)
+                if interface is not None:
+                    interface._signal_handlers.clear()
+                self.stats['evictions'] += 1
+
+class Player:
+    """
+    Replays a recording.
+
+    Call results are served in recorded order for each path, interface
+    and method. Signals are emitted at their recorded time, or as soon as
+    possible when fast is set, but only once the calls recorded before
+    them were made: the translation layer must have caught up before it
+    sees what came next. A signal waits at most stall_timeout seconds for
+    such calls, the replayed code path may differ from the recorded one.
+    """
+
+    stall_timeout = 1
+
+    def __init__(self, path, fast=False):
+        self.fast = fast
+        self.results = {}
+        self.signals = []
+        self.interfaces = []
+        self.pending_calls = set()
+        self.progress = asyncio.Event()
+
+        for i, (timestamp, kind, msg) in enumerate(read_recording(path)):
+            if kind == KIND_CALL:
+                key = (msg.destination, msg.path, msg.interface, msg.member)
+                self.results.setdefault(key, deque()).append((i, msg))
+                self.pending_calls.add(i)
+            elif kind == KIND_SIGNAL:
+                self.signals.append((i, timestamp, msg))
+
+    def next_result(self, bus_name, path, interface_name, member):
+        results = self.results.get((bus_name, path, interface_name, member))
+        if not results:
+            Logger.debug("replay: no recorded result for %s %s.%s", path, interface_name, member)
+            return None
+
+        i, msg = results.popleft()
+        self.pending_calls.discard(i)
+        self.progress.set()
+        return msg
+
+    def add_interface(self, interface):
+        if interface not in self.interfaces:
+            self.interfaces.append(interface)
+
+    async def wait_for_calls(self, index):
+        while any(i < index for i in self.pending_calls):
+            self.progress.clear()
+            try:
+                await asyncio.wait_for(self.progress.wait(), self.stall_timeout)
+            except asyncio.TimeoutError:
+                skipped = set(i for i in self.pending_calls if i < index)
+                Logger.debug("replay: went on without %d recorded call(s)", len(skipped))
+                self.pending_calls -= skipped
+                return
+
+    async def run(self):
+        start = time.monotonic()
+
+        for index, timestamp, msg in self.signals:
+            if not self.fast:
+                await asyncio.sleep(timestamp - (time.monotonic() - start))
+            await self.wait_for_calls(index)
+
+            for interface in self.interfaces:
+                if interface.bus_name == msg.destination and interface.path == msg.path and \
+                   interface.introspection.name == msg.interface:
+                    interface.emit(msg)
+
+            # Let handlers run before the next signal
+            await asyncio.sleep(0)
+
+        Logger.info("Replayed %d signal(s) in %.1f ms", len(self.signals), (time.monotonic() - start) * 1000)
@@ -0,0 +1,128 @@
+from ofono2mm.logger import Logger
+
+import asyncio
+import time
+
+class Timer:
+    __slots__ = ('callback', 'ticks', 'expiry', 'cancelled')
+
+    def __init__(self, callback, ticks, expiry):
+        self.callback = callback
+        self.ticks = ticks
+        self.expiry = expiry
+        self.cancelled = False
+
+class Scheduler:
+    """
+    Periodic work of the whole process, on a timer wheel.
+
+    Usage:
+
+    timer = Scheduler.get_default().add(5, callback)
+    Scheduler.get_default().remove(timer)
+
+    Periods are rounded to the wheel resolution and timers are aligned
+    on multiples of their period, so every timer of a given period
+    expires on the same tick and runs in the same wakeup, whatever the
+    number of modems. The loop is only woken up for ticks that have
+    timers, and not at all when there are none. Callbacks returning a
+    coroutine get it run as a task.
+    """
+
+    __instance = None
+
+    # Tick length, in seconds
+    resolution = 1
+
+    # Number of slots of the wheel
+    size = 64
+
+    @staticmethod
+    def get_default():
+        if Scheduler.__instance is None:
+            Scheduler.__instance = Scheduler()
+        return Scheduler.__instance
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.slots = [[] for i in range(self.size)]
+        self.timers = 0
+        self.tick = self.current_tick()
+        self.handle = None
+        self.wakeups = 0
+
+    def current_tick(self):
+        return int(time.monotonic() // self.resolution)
+
+    def add(self, period, callback):
+        ticks = max(1, round(period / self.resolution))
+        timer = Timer(callback, ticks, (self.current_tick() // ticks + 1) * ticks)
+        self.insert(timer)
+        self.timers += 1
+        self.reschedule()
+        return timer
+
+    def remove(self, timer):
+        if timer is None or timer.cancelled:
+            return
+
+        timer.cancelled = True
+        self.slots[timer.expiry % self.size].remove(timer)
+        self.timers -= 1
+        self.reschedule()
+
+    def insert(self, timer):
+        self.slots[timer.expiry % self.size].append(timer)
+
+    def next_expiry(self):
+        # Timers of the next revolution sit in their slot, take the
+        # first slot with one, or the earliest one further away
+        for tick in range(self.tick + 1, self.tick + self.size + 1):
+            for timer in self.slots[tick % self.size]:
+                if timer.expiry == tick:
+                    return tick
+
+        return min(timer.expiry for slot in self.slots for timer in slot)
+
+    def reschedule(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        if not self.timers:
+            return
+
+        loop = self.loop or asyncio.get_running_loop()
+        delay = self.next_expiry() * self.resolution - time.monotonic()
+        self.handle = loop.call_later(max(0, delay), self.run)
+
+    def run(self):
+        self.handle = None
+        self.wakeups += 1
+        now = self.current_tick()
+
+        expired = []
+        for tick in range(self.tick + 1, min(now, self.tick + self.size) + 1):
+            slot = self.slots[tick % self.size]
+            for timer in [timer for timer in slot if timer.expiry <= now]:
+                slot.remove(timer)
+                expired.append(timer)
+        self.tick = now
+
+        for timer in expired:
+            # A late wakeup runs a timer once, not once per missed period
+            timer.expiry = (now // timer.ticks + 1) * timer.ticks
+            self.insert(timer)
+
+        for timer in expired:
+            if timer.cancelled:
+                continue
+
+            try:
+                result = timer.callback()
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                Logger.error("Scheduled %s failed: %s", timer.callback, e)
+
+        self.reschedule()
@@ -0,0 +1,87 @@
+from array import array
+
+import math
+import time
+
+class SignalHistory:
+    """
+    The last signal measurements of a modem, in a fixed-size ring buffer.
+
+    Usage:
+
+    history = SignalHistory(720)
+    history.append({'rssi': -70.0, 'rsrp': -100.0})
+    history.stats(60, [50, 90])
+
+    Samples are packed in one array of doubles, a timestamp followed by
+    FIELDS, allocated once: memory does not grow with uptime, the oldest
+    samples are overwritten. Measurements a sample does not have, e.g.
+    rsrp on a GSM cell, are NaN and left out of the statistics.
+    """
+
+    FIELDS = ('rssi', 'rsrq', 'rsrp')
+    WIDTH = 1 + len(FIELDS)
+
+    # Default number of samples kept per modem, 0 to keep none, set from
+    # --signal-history when org.ofono2mm.Debug is exported
+    capacity = 0
+
+    def __init__(self, capacity=None):
+        self.size = self.capacity if capacity is None else capacity
+        self.samples = array('d', bytes(8 * self.WIDTH * self.size))
+        self.head = 0
+        self.count = 0
+
+    def append(self, values, timestamp=None):
+        if self.size == 0:
+            return
+
+        offset = self.head * self.WIDTH
+        self.samples[offset] = time.time() if timestamp is None else timestamp
+        for i, name in enumerate(self.FIELDS):
+            self.samples[offset + 1 + i] = values.get(name, math.nan)
+
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def window(self, seconds=0, now=None):
+        """
+        The samples of the last seconds, 0 for all of them, oldest first,
+        packed as in the buffer.
+        """
+
+        since = (time.time() if now is None else now) - seconds
+        count = 0
+        while count < self.count:
+            # Walk back from the newest one
+            offset = ((self.head - 1 - count) % self.size) * self.WIDTH
+            if seconds and self.samples[offset] < since:
+                break
+            count += 1
+
+        packed = array('d')
+        for i in range(self.head - count, self.head):
+            offset = (i % self.size) * self.WIDTH
+            packed.extend(self.samples[offset:offset + self.WIDTH])
+        return packed
+
+    def stats(self, seconds=0, percentiles=(50, 90), now=None):
+        packed = self.window(seconds, now)
+        count = len(packed) // self.WIDTH
+
+        stats = {}
+        for i, name in enumerate(self.FIELDS):
+            values = sorted(value for value in packed[1 + i::self.WIDTH] if not math.isnan(value))
+            if not values:
+                stats[name] = {}
+                continue
+
+            stats[name] = {
+                'min': values[0],
+                'max': values[-1],
+                'mean': sum(values) / len(values),
+            }
+            for percentile in percentiles:
+                stats[name][f'p{percentile:g}'] = values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+        return count, stats, packed
@@ -1,4 +1,5 @@
 import asyncio
+import random
 
 def async_retryable(times=0):
     """
@@ -41,3 +42,36 @@ def async_locked(func):
 
     func.__lock = asyncio.Lock()
     return wrapper
+
+class Backoff:
+    """
+    Bounded exponential backoff with jitter.
+
+    Usage:
+
+    backoff = Backoff(initial=0.5, maximum=30)
+    while not done():
+        await asyncio.sleep(backoff.next())
+    backoff.reset()
+
+    Each call to next() returns a delay twice as long as the previous
+    one, randomised by +/- jitter and never longer than maximum.
+    attempts stops growing once the delay reached maximum.
+    """
+
+    def __init__(self, initial=0.5, maximum=30, factor=2, jitter=0.2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self):
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        # Past the cap, a growing exponent would only overflow
+        if delay < self.maximum:
+            self.attempts += 1
+        return min(self.maximum, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def reset(self):
+        self.attempts = 0
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbus_next import Variant
+
+from ofono2mm.ofono_state import OfonoModemState
+from ofono2mm.reconnect import ReconnectPolicy
+from ofono2mm.utils import Backoff
+
+class SlowBearer:
+    # Fails its first attempt after delay seconds, then connects
+    def __init__(self, ofono_state, delay):
+        self.ofono_state = ofono_state
+        self.modem_name = ofono_state.modem_name
+        self.delay = delay
+        self.attempts = 0
+        self.attempt_started = asyncio.Event()
+
+    async def connect_context(self):
+        self.attempts += 1
+        self.attempt_started.set()
+        await asyncio.sleep(self.delay)
+        if self.attempts == 1:
+            raise Exception('No service')
+
+class ReconnectPolicyTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        ofono_client = {'ofono_modem': {'/ril_0': {'org.ofono.Modem': None}}}
+        self.ofono_state = OfonoModemState(ofono_client, '/ril_0')
+        self.ofono_state.add_interface('org.ofono.ConnectionManager', None, {'Attached': Variant('b', True)})
+        self.ofono_state.add_interface('org.ofono.NetworkRegistration', None, {'Technology': Variant('s', 'lte')})
+
+    async def test_event_during_attempt_retries_at_once(self):
+        bearer = SlowBearer(self.ofono_state, 0.2)
+        policy = ReconnectPolicy(bearer)
+        # Without the event, the retry would wait this long
+        policy.backoff = Backoff(initial=30, maximum=30)
+
+        start = time.monotonic()
+        task = asyncio.create_task(policy.connect())
+        await bearer.attempt_started.wait()
+        self.ofono_state.set_interface_prop('org.ofono.NetworkRegistration', 'Technology', Variant('s', 'nr'))
+
+        self.assertTrue(await asyncio.wait_for(task, 5))
+        self.assertEqual(bearer.attempts, 2)
+        self.assertLess(time.monotonic() - start, 1)
+
+    async def test_cancel_stops_attempts(self):
+        bearer = SlowBearer(self.ofono_state, 0.2)
+        policy = ReconnectPolicy(bearer)
+
+        task = asyncio.create_task(policy.connect())
+        await bearer.attempt_started.wait()
+        policy.cancel()
+
+        self.assertFalse(await asyncio.wait_for(task, 5))
+        self.assertFalse(policy.running())
+
+if __name__ == '__main__':
+    unittest.main()
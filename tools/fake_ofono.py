@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+#
+# A pure-Python oFono stand-in, to drive ofono2mm without hardware.
+#
+# Usage: fake_ofono.py [-n MODEMS] [--address ADDRESS]
+#                      [--strength-rate HZ] [--sms-rate HZ] [--call-rate HZ]
+#                      [--duration SECONDS]
+#
+# Without --address, a private dbus-daemon is spawned and its address
+# printed, then run: main.py --bus-address ADDRESS
+#
+# Rates are events per second and per modem. Modems are named /ril_N as
+# on devices.
+
+from dbus_next.aio import MessageBus
+from dbus_next.service import (ServiceInterface,
+                               method, signal)
+from dbus_next import Message, Variant, DBusError
+
+import asyncio
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+class OfonoPropertiesInterface(ServiceInterface):
+    def __init__(self, name, props):
+        super().__init__(name)
+        self.props = props
+
+    def set(self, name, value):
+        if name in self.props and self.props[name].signature == value.signature and \
+           self.props[name].value == value.value:
+            return
+
+        self.props[name] = value
+        self.PropertyChanged(name, value)
+
+    @method()
+    def GetProperties(self) -> 'a{sv}':
+        return self.props
+
+    @method()
+    def SetProperty(self, name: 's', value: 'v'):
+        if name not in self.props:
+            raise DBusError('org.ofono.Error.InvalidArguments', f'Unknown property {name}')
+
+        self.set(name, value)
+
+    @signal()
+    def PropertyChanged(self, name, value) -> 'sv':
+        return [name, value]
+
+class FakeModem(OfonoPropertiesInterface):
+    def __init__(self, index, interfaces):
+        super().__init__('org.ofono.Modem', {
+            'Powered': Variant('b', True),
+            'Online': Variant('b', True),
+            'Lockdown': Variant('b', False),
+            'Emergency': Variant('b', False),
+            'Manufacturer': Variant('s', 'Fake'),
+            'Model': Variant('s', 'Fake Modem'),
+            'Revision': Variant('s', '1.0'),
+            'Serial': Variant('s', f'35000000{index:07d}'),
+            'SoftwareVersionNumber': Variant('s', '01'),
+            'Type': Variant('s', 'hardware'),
+            'Features': Variant('as', ['sim', 'gprs', 'sms', 'net', 'rat']),
+            'Interfaces': Variant('as', interfaces),
+        })
+
+class FakeSimManager(OfonoPropertiesInterface):
+    def __init__(self, index):
+        super().__init__('org.ofono.SimManager', {
+            'Present': Variant('b', True),
+            'PinRequired': Variant('s', 'none'),
+            'LockedPins': Variant('as', []),
+            'Retries': Variant('a{sy}', {'pin': 3, 'puk': 10}),
+            'CardIdentifier': Variant('s', f'89001010{index:011d}'),
+            'SubscriberIdentity': Variant('s', f'00101{index:010d}'),
+            'MobileCountryCode': Variant('s', '001'),
+            'MobileNetworkCode': Variant('s', '01'),
+            'SubscriberNumbers': Variant('as', [f'+1555{index:07d}']),
+            'ServiceProviderName': Variant('s', 'Fake'),
+            'FixedDialing': Variant('b', False),
+            'BarredDialing': Variant('b', False),
+        })
+
+    @method()
+    def EnterPin(self, pin_type: 's', pin: 's'):
+        pass
+
+    @method()
+    def ResetPin(self, puk_type: 's', puk: 's', pin: 's'):
+        pass
+
+    @method()
+    def ChangePin(self, pin_type: 's', old: 's', new: 's'):
+        pass
+
+    @method()
+    def LockPin(self, pin_type: 's', pin: 's'):
+        pass
+
+    @method()
+    def UnlockPin(self, pin_type: 's', pin: 's'):
+        pass
+
+class FakeNetworkRegistration(OfonoPropertiesInterface):
+    def __init__(self, index):
+        super().__init__('org.ofono.NetworkRegistration', {
+            'Mode': Variant('s', 'auto'),
+            'Status': Variant('s', 'registered'),
+            'LocationAreaCode': Variant('q', 1),
+            'CellId': Variant('u', 1000 + index),
+            'MobileCountryCode': Variant('s', '001'),
+            'MobileNetworkCode': Variant('s', '01'),
+            'Technology': Variant('s', 'lte'),
+            'Name': Variant('s', 'Fake Network'),
+            'Strength': Variant('y', 50),
+        })
+
+    @method()
+    def Register(self):
+        pass
+
+    @method()
+    def GetOperators(self) -> 'a(oa{sv})':
+        return []
+
+    @method()
+    async def Scan(self) -> 'a(oa{sv})':
+        await asyncio.sleep(1)
+        return []
+
+class FakeRadioSettings(OfonoPropertiesInterface):
+    def __init__(self):
+        super().__init__('org.ofono.RadioSettings', {
+            'TechnologyPreference': Variant('s', 'lte'),
+            'AvailableTechnologies': Variant('as', ['gsm', 'umts', 'lte']),
+        })
+
+class FakeContext(OfonoPropertiesInterface):
+    # Time oFono takes to bring a data call up
+    activation_delay = 0.05
+
+    # D-Bus error activation fails with, None to succeed
+    activation_error = None
+
+    def __init__(self, index, context_type='internet', apn='internet'):
+        super().__init__('org.ofono.ConnectionContext', {
+            'Active': Variant('b', False),
+            'AccessPointName': Variant('s', apn),
+            'Type': Variant('s', context_type),
+            'Name': Variant('s', context_type.capitalize()),
+            'Protocol': Variant('s', 'ip'),
+            'Username': Variant('s', ''),
+            'Password': Variant('s', ''),
+            'AuthenticationMethod': Variant('s', 'chap'),
+            'Settings': Variant('a{sv}', {}),
+            'IPv6.Settings': Variant('a{sv}', {}),
+        })
+        self.index = index
+
+    @method()
+    def SetProperty(self, name: 's', value: 'v'):
+        if name != 'Active':
+            return super().SetProperty(name, value)
+
+        if value.value:
+            if self.activation_error is not None:
+                raise DBusError(self.activation_error, 'Activation failed')
+            asyncio.get_running_loop().call_later(self.activation_delay, self.activate)
+        else:
+            self.set('Settings', Variant('a{sv}', {}))
+            self.set('Active', Variant('b', False))
+
+    def activate(self):
+        self.set('Settings', Variant('a{sv}', {
+            'Interface': Variant('s', f'rmnet_data{self.index}'),
+            'Method': Variant('s', 'static'),
+            'Address': Variant('s', f'10.0.{self.index // 250}.{self.index % 250 + 2}'),
+            'Netmask': Variant('s', '255.255.255.0'),
+            'Gateway': Variant('s', f'10.0.{self.index // 250}.1'),
+            'DomainNameServers': Variant('as', ['10.0.0.53']),
+        }))
+        self.set('Active', Variant('b', True))
+
+class FakeConnectionManager(OfonoPropertiesInterface):
+    def __init__(self, fake_modem):
+        super().__init__('org.ofono.ConnectionManager', {
+            'Attached': Variant('b', True),
+            'Bearer': Variant('s', 'lte'),
+            'Suspended': Variant('b', False),
+            'RoamingAllowed': Variant('b', False),
+            'Powered': Variant('b', True),
+        })
+        self.fake_modem = fake_modem
+        self.contexts = {}
+        self.context_i = 1
+
+    def add(self, context_type='internet', apn='internet'):
+        path = f'{self.fake_modem.path}/context{self.context_i}'
+        context = FakeContext(self.fake_modem.index * 16 + self.context_i, context_type, apn)
+        self.context_i += 1
+        self.contexts[path] = context
+        self.fake_modem.bus.export(path, context)
+        return path
+
+    @method()
+    def GetContexts(self) -> 'a(oa{sv})':
+        return [[path, context.props] for path, context in self.contexts.items()]
+
+    @method()
+    def AddContext(self, context_type: 's') -> 'o':
+        path = self.add(context_type, '')
+        self.ContextAdded(path, self.contexts[path].props)
+        return path
+
+    @method()
+    def RemoveContext(self, path: 'o'):
+        if path not in self.contexts:
+            raise DBusError('org.ofono.Error.NotFound', f'{path} not found')
+
+        self.contexts.pop(path)
+        self.fake_modem.bus.unexport(path)
+        self.ContextRemoved(path)
+
+    @method()
+    def DeactivateAll(self):
+        for context in self.contexts.values():
+            context.set('Active', Variant('b', False))
+
+    @signal()
+    def ContextAdded(self, path, props) -> 'oa{sv}':
+        return [path, props]
+
+    @signal()
+    def ContextRemoved(self, path) -> 'o':
+        return path
+
+class FakeMessageManager(OfonoPropertiesInterface):
+    def __init__(self, fake_modem):
+        super().__init__('org.ofono.MessageManager', {
+            'ServiceCenterAddress': Variant('s', '+15550000000'),
+            'UseDeliveryReports': Variant('b', False),
+            'Bearer': Variant('s', 'cs-preferred'),
+            'Alphabet': Variant('s', 'default'),
+        })
+        self.fake_modem = fake_modem
+        self.message_i = 0
+
+    @method()
+    def SendMessage(self, to: 's', text: 's') -> 'o':
+        self.message_i += 1
+        return f'{self.fake_modem.path}/message_{self.message_i}'
+
+    @method()
+    def GetMessages(self) -> 'a(oa{sv})':
+        return []
+
+    @signal()
+    def IncomingMessage(self, text, info) -> 'sa{sv}':
+        return [text, info]
+
+    @signal()
+    def ImmediateMessage(self, text, info) -> 'sa{sv}':
+        return [text, info]
+
+class FakeVoiceCall(OfonoPropertiesInterface):
+    def __init__(self, fake_modem, number, state):
+        super().__init__('org.ofono.VoiceCall', {
+            'LineIdentification': Variant('s', number),
+            'IncomingLine': Variant('s', ''),
+            'Name': Variant('s', ''),
+            'Multiparty': Variant('b', False),
+            'State': Variant('s', state),
+            'Emergency': Variant('b', False),
+            'RemoteHeld': Variant('b', False),
+            'RemoteMultiparty': Variant('b', False),
+        })
+        self.fake_modem = fake_modem
+
+    @method()
+    def Answer(self):
+        self.set('State', Variant('s', 'active'))
+
+    @method()
+    def Hangup(self):
+        self.fake_modem.voice_call_manager.remove(self)
+
+    @method()
+    def Deflect(self, number: 's'):
+        self.fake_modem.voice_call_manager.remove(self)
+
+class FakeVoiceCallManager(OfonoPropertiesInterface):
+    def __init__(self, fake_modem):
+        super().__init__('org.ofono.VoiceCallManager', {
+            'EmergencyNumbers': Variant('as', ['112', '911']),
+        })
+        self.fake_modem = fake_modem
+        self.calls = {}
+        self.call_i = 0
+
+    def add(self, number, state):
+        self.call_i += 1
+        path = f'{self.fake_modem.path}/voicecall{self.call_i:02d}'
+        call = FakeVoiceCall(self.fake_modem, number, state)
+        self.calls[path] = call
+        self.fake_modem.bus.export(path, call)
+        self.CallAdded(path, call.props)
+        return path
+
+    def remove(self, call):
+        for path, value in list(self.calls.items()):
+            if value is call:
+                self.calls.pop(path)
+                self.fake_modem.bus.unexport(path)
+                self.CallRemoved(path)
+
+    @method()
+    def Dial(self, number: 's', hide_callerid: 's') -> 'o':
+        return self.add(number, 'dialing')
+
+    @method()
+    def HangupAll(self):
+        for call in list(self.calls.values()):
+            self.remove(call)
+
+    @method()
+    def GetCalls(self) -> 'a(oa{sv})':
+        return [[path, call.props] for path, call in self.calls.items()]
+
+    @method()
+    def SendTones(self, tones: 's'):
+        pass
+
+    @signal()
+    def CallAdded(self, path, props) -> 'oa{sv}':
+        return [path, props]
+
+    @signal()
+    def CallRemoved(self, path) -> 'o':
+        return path
+
+class FakeNetworkMonitor(ServiceInterface):
+    # Set to False to refuse agents, as older oFono versions do
+    agents = True
+
+    def __init__(self, fake_modem):
+        super().__init__('org.ofono.NetworkMonitor')
+        self.fake_modem = fake_modem
+        self.agent = None
+        self.agent_handle = None
+
+    @method()
+    def GetServingCellInformation(self) -> 'a{sv}':
+        return self.cell_information()
+
+    def cell_information(self):
+        strength = self.fake_modem.network_registration.props['Strength'].value
+        return {
+            'Technology': Variant('s', 'lte'),
+            'ReferenceSignalReceivedPower': Variant('i', -140 + strength),
+            'ReferenceSignalReceivedQuality': Variant('i', -20 + strength // 6),
+            'ReceivedSignalStrength': Variant('y', strength * 31 // 100),
+            'TimingAdvance': Variant('i', 1),
+        }
+
+    @method()
+    def RegisterAgent(self, path: 'o', period: 'u'):
+        if not self.agents:
+            raise DBusError('org.ofono.Error.NotImplemented', 'Not implemented')
+        if self.agent is not None:
+            raise DBusError('org.ofono.Error.InUse', 'Agent already registered')
+
+        self.agent = path
+        self.agent_handle = asyncio.get_running_loop().call_later(period, self.push, period)
+
+    @method()
+    def UnregisterAgent(self, path: 'o'):
+        if self.agent == path:
+            self.agent_handle.cancel()
+            self.agent = None
+
+    def push(self, period):
+        # ofono2mm is the only agent client here
+        self.fake_modem.bus.send(Message(destination='org.freedesktop.ModemManager1', path=self.agent,
+                                         interface='org.ofono.NetworkMonitorAgent',
+                                         member='ServingCellInformationChanged',
+                                         signature='a{sv}', body=[self.cell_information()]))
+        self.agent_handle = asyncio.get_running_loop().call_later(period, self.push, period)
+
+class FakeCell(ServiceInterface):
+    def __init__(self, cell_type, registered, props):
+        super().__init__('org.nemomobile.ofono.Cell')
+        self.cell_type = cell_type
+        self.registered = registered
+        self.props = props
+
+    @method()
+    def GetAll(self) -> 'isba{sv}':
+        return [1, self.cell_type, self.registered, self.props]
+
+    @method()
+    def GetProperties(self) -> 'a{sv}':
+        return self.props
+
+    def set(self, name, value):
+        self.props[name] = value
+        self.PropertyChanged(name, value)
+
+    @signal()
+    def RegisteredChanged(self, registered) -> 'b':
+        return registered
+
+    @signal()
+    def PropertyChanged(self, name, value) -> 'sv':
+        return [name, value]
+
+    @signal()
+    def Removed(self):
+        pass
+
+class FakeCellInfo(ServiceInterface):
+    def __init__(self, fake_modem):
+        super().__init__('org.nemomobile.ofono.CellInfo')
+        self.fake_modem = fake_modem
+        self.cells = {}
+        self.cell_i = 0
+
+    def add(self, cell_type, registered, props, export=True):
+        path = f'{self.fake_modem.path}/cell_{self.cell_i}'
+        self.cell_i += 1
+        self.cells[path] = FakeCell(cell_type, registered, props)
+        if export:
+            self.fake_modem.bus.export(path, self.cells[path])
+            self.CellsAdded([path])
+        return path
+
+    def remove(self, path):
+        cell = self.cells.pop(path)
+        cell.Removed()
+        self.fake_modem.bus.unexport(path)
+        self.CellsRemoved([path])
+
+    @method()
+    def GetCells(self) -> 'ao':
+        return list(self.cells)
+
+    @signal()
+    def CellsAdded(self, paths) -> 'ao':
+        return paths
+
+    @signal()
+    def CellsRemoved(self, paths) -> 'ao':
+        return paths
+
+class FakeNetworkTime(ServiceInterface):
+    def __init__(self):
+        super().__init__('org.ofono.NetworkTime')
+
+    @method()
+    def GetNetworkTime(self) -> 'a{sv}':
+        return {
+            'UTC': Variant('x', int(time.time())),
+            'Timezone': Variant('i', 0),
+            'DST': Variant('u', 0),
+        }
+
+    @signal()
+    def NetworkTimeChanged(self, network_time) -> 'a{sv}':
+        return network_time
+
+class FakeSupplementaryServices(ServiceInterface):
+    def __init__(self):
+        super().__init__('org.ofono.SupplementaryServices')
+
+    @method()
+    def GetProperties(self) -> 'a{sv}':
+        return {'State': Variant('s', 'idle')}
+
+    @method()
+    def Initiate(self, command: 's') -> 'sv':
+        return ['USSD', Variant('s', f'Fake reply to {command}')]
+
+    @method()
+    def Respond(self, reply: 's') -> 's':
+        return reply
+
+    @method()
+    def Cancel(self):
+        pass
+
+class FakeOfonoModem:
+    def __init__(self, bus, index):
+        self.bus = bus
+        self.index = index
+        self.path = f'/ril_{index}'
+        self.sim_manager = FakeSimManager(index)
+        self.network_registration = FakeNetworkRegistration(index)
+        self.connection_manager = FakeConnectionManager(self)
+        self.message_manager = FakeMessageManager(self)
+        self.voice_call_manager = FakeVoiceCallManager(self)
+        self.cell_info = FakeCellInfo(self)
+        self.cell_info.add('lte', True, {
+            'mcc': Variant('i', 1), 'mnc': Variant('i', 1), 'ci': Variant('i', 0x1a2b3c),
+            'pci': Variant('i', 42), 'tac': Variant('i', 0x10), 'earfcn': Variant('i', 1300),
+            'rsrp': Variant('i', 95), 'rsrq': Variant('i', 10), 'timingAdvance': Variant('i', 0x7fffffff),
+        }, export=False)
+        self.cell_info.add('lte', False, {
+            'mcc': Variant('i', 0x7fffffff), 'mnc': Variant('i', 0x7fffffff), 'ci': Variant('i', 0x7fffffff),
+            'pci': Variant('i', 7), 'tac': Variant('i', 0x7fffffff), 'earfcn': Variant('i', 1300),
+            'rsrp': Variant('i', 110), 'rsrq': Variant('i', 14), 'timingAdvance': Variant('i', 0x7fffffff),
+        }, export=False)
+        self.interfaces = [
+            self.sim_manager,
+            self.network_registration,
+            FakeRadioSettings(),
+            self.connection_manager,
+            self.message_manager,
+            self.voice_call_manager,
+            FakeNetworkMonitor(self),
+            self.cell_info,
+            FakeNetworkTime(),
+            FakeSupplementaryServices(),
+        ]
+        self.modem = FakeModem(index, [interface.name for interface in self.interfaces])
+        self.connection_manager.add()
+
+    def export(self):
+        self.bus.export(self.path, self.modem)
+        for interface in self.interfaces:
+            self.bus.export(self.path, interface)
+        for path, cell in self.cell_info.cells.items():
+            self.bus.export(path, cell)
+
+    def unexport(self):
+        for path in list(self.connection_manager.contexts) + list(self.voice_call_manager.calls) + list(self.cell_info.cells):
+            self.bus.unexport(path)
+        self.bus.unexport(self.path)
+
+    def set_strength(self, strength):
+        self.network_registration.set('Strength', Variant('y', strength))
+
+    def incoming_message(self, text, sender='+15551234567'):
+        self.message_manager.IncomingMessage(text, {
+            'Sender': Variant('s', sender),
+            'SentTime': Variant('s', time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())),
+            'LocalSentTime': Variant('s', time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())),
+        })
+
+    def incoming_call(self, number='+15551234567'):
+        return self.voice_call_manager.add(number, 'incoming')
+
+    def end_call(self, path):
+        call = self.voice_call_manager.calls.get(path)
+        if call is not None:
+            self.voice_call_manager.remove(call)
+
+class FakeManager(ServiceInterface):
+    def __init__(self):
+        super().__init__('org.ofono.Manager')
+        self.modems = {}
+
+    @method()
+    def GetModems(self) -> 'a(oa{sv})':
+        return [[path, modem.modem.props] for path, modem in self.modems.items()]
+
+    @signal()
+    def ModemAdded(self, path, props) -> 'oa{sv}':
+        return [path, props]
+
+    @signal()
+    def ModemRemoved(self, path) -> 'o':
+        return path
+
+class FakeOfono:
+    """
+    Owns org.ofono on the given bus and serves fake modems.
+
+    Usage:
+
+    ofono = await FakeOfono(bus_address).start()
+    modem = ofono.add_modem()
+    modem.set_strength(80)
+    """
+
+    def __init__(self, bus_address):
+        self.bus_address = bus_address
+        self.bus = None
+        self.manager = FakeManager()
+        self.modem_i = 0
+
+    async def start(self):
+        self.bus = await MessageBus(bus_address=self.bus_address).connect()
+        self.bus.export('/', self.manager)
+        await self.bus.request_name('org.ofono')
+        return self
+
+    @property
+    def modems(self):
+        return list(self.manager.modems.values())
+
+    def add_modem(self):
+        modem = FakeOfonoModem(self.bus, self.modem_i)
+        self.modem_i += 1
+        modem.export()
+        self.manager.modems[modem.path] = modem
+        self.manager.ModemAdded(modem.path, modem.modem.props)
+        return modem
+
+    def remove_modem(self, path):
+        modem = self.manager.modems.pop(path)
+        modem.unexport()
+        self.manager.ModemRemoved(path)
+
+    async def every(self, rate, duration, fn):
+        # Catch up on missed events instead of sleeping 1/rate each time,
+        # asyncio can't sleep precisely enough for thousands of events/s
+        start = time.monotonic()
+        done = 0
+        while duration is None or time.monotonic() - start < duration:
+            due = int((time.monotonic() - start) * rate)
+            for i in range(done, due):
+                fn(i)
+            done = max(done, due)
+            await asyncio.sleep(max(0.001, (done + 1) / rate - (time.monotonic() - start)))
+        return done
+
+    async def strength_storm(self, rate, duration=None):
+        def change(i):
+            for modem in self.modems:
+                modem.set_strength(20 + (i * 7 + modem.index) % 80)
+        return await self.every(rate, duration, change)
+
+    async def sms_burst(self, rate, duration=None):
+        def receive(i):
+            for modem in self.modems:
+                modem.incoming_message(f'Fake message {i}')
+        return await self.every(rate, duration, receive)
+
+    async def call_churn(self, rate, duration=None):
+        # Each event rings a new call and hangs up the previous one
+        calls = {}
+        def churn(i):
+            for modem in self.modems:
+                if modem.path in calls:
+                    modem.end_call(calls.pop(modem.path))
+                calls[modem.path] = modem.incoming_call(f'+1555{i:07d}')
+        return await self.every(rate, duration, churn)
+
+def spawn_dbus_daemon():
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return daemon, daemon.stdout.readline().decode().strip()
+
+async def run(args):
+    daemon = None
+    address = args.address
+    if address is None:
+        daemon, address = spawn_dbus_daemon()
+        print(address, flush=True)
+
+    ofono = FakeOfono(address)
+    try:
+        await ofono.start()
+        for i in range(args.modems):
+            ofono.add_modem()
+
+        storms = []
+        if args.strength_rate:
+            storms.append(ofono.strength_storm(args.strength_rate, args.duration))
+        if args.sms_rate:
+            storms.append(ofono.sms_burst(args.sms_rate, args.duration))
+        if args.call_rate:
+            storms.append(ofono.call_churn(args.call_rate, args.duration))
+
+        if storms:
+            if args.delay:
+                await asyncio.sleep(args.delay)
+            counts = await asyncio.gather(*storms)
+            print(f'{sum(counts) * args.modems} events sent', file=sys.stderr)
+            if args.duration is not None:
+                return
+
+        await ofono.bus.wait_for_disconnect()
+    finally:
+        if ofono.bus is not None:
+            ofono.bus.disconnect()
+        if daemon is not None:
+            daemon.kill()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Fake oFono service.")
+    parser.add_argument('--address', help='D-Bus address to use, a private dbus-daemon is spawned otherwise.')
+    parser.add_argument('-n', '--modems', type=int, default=1, help='Number of modems.')
+    parser.add_argument('--strength-rate', type=float, default=0, metavar='HZ', help='Signal strength changes per second and per modem.')
+    parser.add_argument('--sms-rate', type=float, default=0, metavar='HZ', help='Incoming SMS per second and per modem.')
+    parser.add_argument('--call-rate', type=float, default=0, metavar='HZ', help='Incoming calls per second and per modem.')
+    parser.add_argument('--delay', type=float, default=5, metavar='SECONDS', help='Wait before starting events.')
+    parser.add_argument('--duration', type=float, metavar='SECONDS', help='Stop after SECONDS of events.')
+    args = parser.parse_args()
+    asyncio.run(run(args))